@@ -2,15 +2,33 @@ import streamlit as st
 from datetime import datetime
 import pandas as pd
 import random
-import string
 import os
 from datetime import date, timedelta
 import io
+import json
+import html
 import tempfile
 from fpdf import FPDF
 import qrcode
 import plotly.express as px
+import plotly.graph_objects as go
 import plotly.io as pio
+from archive import PartitionedArchive, PeriodicJob
+from artifacts import SessionArtifacts, sweep_stale
+from backup import BackupManager
+from blobstore import BlobStore
+from bulk_import import ImportValidationError, iter_chunks, validate_chunk
+from cdc import ChangeFeed
+from changelog import ChangeLog
+from dataset import SessionView
+from excelcache import ExcelCache
+from figcache import FigureCache
+from indexes import ActivityRollups, LockCounters, PostingIndex, SortedIndex, intersect, page_slice
+from schema import apply_schema
+from storage import ConflictError
+from tables import ReferenceTable, TableRegistry, TableSpec
+from timeseries import RESOLUTIONS, lttb, pick_resolution
+from writer import WriteBehindQueue
 pio.kaleido.scope.default_format = "png"
 
 # =============================================================================
@@ -19,6 +37,93 @@ pio.kaleido.scope.default_format = "png"
 LOGO_PATH = "logo1.png"  # ¡Archivo obligatorio en la misma carpeta!
 EXCEL_FILE_LOTO = "candados_data.xlsx"
 EXCEL_FILE_SIMOPS = "simops_data.xlsx"  # Nuevo archivo para almacenar datos de SIMOPS
+DB_FILE_SIMOPS = "simops_data.db"  # Almacenamiento vivo de SIMOPS (Excel queda para importar/exportar)
+DB_FILE_LOTO = "candados_data.db"  # Almacenamiento vivo de LOTO (Excel queda para importar/exportar)
+BLOB_DIR = "blobs"  # QR y PDF adjuntos, guardados por hash de contenido
+BLOB_COMPRESS = True  # Comprimir blobs con zlib cuando reduzca su tamaño
+
+LOTO_COLUMNS = [
+    "NoCandado","Area","TableroEquipo","KKS","TipoBloqueo","LiderAutorizador",
+    "EjecPorNombre","EjecPorCargo","N_PTW","QR_Hash","PDF_Hash","Valor",
+    "Estado","Descripción","Responsable","Fecha","ID","_version"
+]
+# Columnas de bytes de versiones anteriores -> columna de hash que las reemplaza
+LEGACY_BLOB_COLUMNS = {"QR_Bytes": "QR_Hash", "PDF_Adjunto": "PDF_Hash"}
+LOTO_INDEXES = ["NoCandado", "Area", "Estado", "Fecha"]
+# Tipos de la tabla de candados (se aplican al cargar y en cada escritura)
+LOTO_SCHEMA = {
+    "Fecha": "datetime64[ns]",
+    "Valor": "int64",
+    "Estado": "category",
+    "Area": "category",
+    "KKS": "category",
+    "TipoBloqueo": "category",
+    "EjecPorCargo": "category",
+    "_version": "int64",  # versión de la fila para el control de conflictos
+}
+
+ACTIVITY_PAGE_SIZE = 25  # candados por página en "Actividad Reciente"
+ALERT_VALOR = 200  # un candado con Valor mayor que éste cuenta como alerta
+CHART_MAX_POINTS = 400  # puntos por serie que se envían al navegador (el resto se reduce con LTTB)
+# Columnas por las que se puede filtrar el dashboard (cada una con su índice)
+DASHBOARD_FILTERS = {"Area": "Área", "KKS": "KKS", "TableroEquipo": "Tablero o Equipo", "Estado": "Estado"}
+
+# Columnas que usa el dashboard (métricas, gráfico, actividad reciente y filtros)
+DASHBOARD_COLUMNS = ["NoCandado", "Area", "TableroEquipo", "KKS", "Estado", "Fecha", "Valor"]
+# Columnas LOTO que se cargan al arrancar; el resto (hashes de QR/PDF, textos
+# largos) se lee la primera vez que una tarjeta, reporte o descarga lo pide
+LOTO_PRELOAD = DASHBOARD_COLUMNS
+
+SIMOPS_COLUMNS = [
+    "SIMOPS_ID","Descripción","Área","PTWs_Involucrados","Fecha_Inicio",
+    "Fecha_Fin","Encargado","Estado","Riesgos","Acciones_Mitigación","_version"
+]
+SIMOPS_SCHEMA = {"_version": "int64"}
+SIMOPS_INDEXES = ["SIMOPS_ID", "Estado"]
+
+# Itembook de precomisionado: Excel mantenido fuera de la app (encabezado en la fila 2)
+EXCEL_FILE_ITEMBOOK = "itembook_ejemplo.xlsx"
+ITEMBOOK_HEADER_ROW = 1
+# Columna del Excel -> columna que usa la app
+ITEMBOOK_RENAME = {"tag": "ItemID", "SISTEMA": "Proyecto", "servicio": "Descripcion"}
+ITEMBOOK_COLUMNS = ["Proyecto", "ItemID", "Descripcion", "SUBSISTEMA"]
+ITEMBOOK_SCHEMA = {"Proyecto": "category", "SUBSISTEMA": "category"}
+
+# Motor de persistencia LOTO: "sqlite" o "journal" (bitácora + snapshot Excel)
+LOTO_BACKEND = os.environ.get("CANDAPP_LOTO_BACKEND", "sqlite")
+JOURNAL_COMPACT_EVERY = 200  # operaciones entre compactaciones
+JOURNAL_COMPACT_INTERVAL = 60.0  # segundos entre compactaciones
+
+# Archivo de candados inactivos antiguos (fuera del conjunto que cargan las sesiones)
+ARCHIVE_DIR = "archivo"
+ARCHIVE_AFTER_DAYS = 180  # antigüedad mínima (según Fecha) para archivar un candado inactivo
+ARCHIVE_PARTITION = "month"  # "month" o "year"
+ARCHIVE_CHECK_INTERVAL = 6 * 3600  # segundos entre revisiones automáticas
+
+IMPORT_CHUNK_SIZE = 1000  # filas por bloque en la importación masiva
+
+EXCEL_CACHE_MAX_MB = 256  # memoria máxima de la caché de Excel ya parseados
+FIGURE_CACHE_MAX_MB = 32  # memoria máxima de los gráficos ya armados (JSON)
+
+# Respaldos incrementales y restauración a un instante (LOTO y SIMOPS)
+CHANGELOG_FILE = "cambios.db"  # registro de cambios por fila desde el último respaldo
+BACKUP_DIR = "respaldos"
+BACKUP_TABLES = ["candados", "simops"]
+BACKUP_INTERVAL = 15 * 60  # segundos entre respaldos incrementales
+BACKUP_FULL_EVERY = 24 * 3600  # segundos entre respaldos completos
+BACKUP_KEEP_FULL = 7  # respaldos completos que se conservan
+
+# Artefactos generados por sesión (tarjetas, reportes): memoria acotada y el resto a disco
+ARTIFACT_DIR = os.path.join(tempfile.gettempdir(), "candapp-artefactos")
+ARTIFACT_MEMORY_MB = 8  # por sesión, en memoria
+ARTIFACT_SPILL_KB = 256  # artefactos de este tamaño o más van directo a disco
+ARTIFACT_MAX_MB = 64  # por sesión, memoria + disco (se descartan los menos usados)
+ARTIFACT_STALE_HOURS = 24  # carpetas de sesiones abandonadas que se borran al arrancar
+
+# Feed local de cambios para otras herramientas (ver cdc.py)
+CDC_DIR = "cdc"
+CDC_SEGMENT_MB = 16  # tamaño de cada archivo de eventos
+CDC_KEEP_SEGMENTS = 10  # archivos de eventos que se conservan
 
 # -----------------------------------------------------------------------------
 # USUARIOS DEMO (ORIGINAL)
@@ -97,7 +202,7 @@ def generate_loto_card(row) -> bytes:
                 f"No: {row.get('NoCandado','')}",
                 f"Área: {row.get('Area','')}",
                 f"Responsable: {row.get('EjecPorNombre','')}",
-                f"Fecha: {row.get('Fecha','')}"
+                f"Fecha: {format_fecha(row.get('Fecha'))}"
             ]
             
             y = 115  # Posición alineada con el fondo
@@ -125,15 +230,19 @@ def main():
         st.session_state.current_user = None
         st.session_state.role = None
 
-    if "candados_df" not in st.session_state:
-        st.session_state["candados_df"] = load_loto_excel()
+    # Cada sesión sólo guarda una vista sobre el dataset LOTO compartido
+    if "loto_view" not in st.session_state:
+        st.session_state["loto_view"] = SessionView(get_tables().dataset("candados"))
+    get_archive_job()
+    get_backup_job()
 
     # Nuevo: SIMOPS
-    if "simops_df" not in st.session_state:
-        st.session_state["simops_df"] = load_simops_data()
+    if "simops_view" not in st.session_state:
+        st.session_state["simops_view"] = SessionView(get_tables().dataset("simops"))
 
-    if "itembook_df" not in st.session_state:
-        st.session_state["itembook_df"] = generate_itembook()
+    # Cambios guardados por otros procesos: control O(1) y sólo las filas nuevas
+    st.session_state["loto_view"].sync()
+    st.session_state["simops_view"].sync()
 
     # Login:
     if not st.session_state.authenticated:
@@ -144,6 +253,12 @@ def main():
         apply_custom_styles()
         st.image(LOGO_PATH, width=250)
         top_menu()
+        show_persistence_status()
+        show_session_artifacts_status()
+        if st.session_state.role == "admin":
+            show_excel_cache_stats()
+            show_figure_cache_stats()
+            show_backup_panel()
 
 def login():
     """
@@ -194,6 +309,7 @@ def top_menu():
             st.session_state.authenticated = False
             st.session_state.current_user = None
             st.session_state.role = None
+            get_session_artifacts().clear()
             st.success("Sesión cerrada.")
 
 # =============================================================================
@@ -204,7 +320,7 @@ def show_loto_section():
     Sección dedicada a LOTO.
     """
     st.markdown("<h2 style='text-align:center; color:#4dd0e1;'>Sección LOTO</h2>", unsafe_allow_html=True)
-    sub_tabs = st.tabs(["Dashboard","Registrar Candado","Editar/Borrar Candado","Generar Reporte Excel/PDF","Usuarios"])
+    sub_tabs = st.tabs(["Dashboard","Registrar Candado","Editar/Borrar Candado","Generar Reporte Excel/PDF","Usuarios","Importar Inventario"])
     
     with sub_tabs[0]:
         show_dashboard()
@@ -228,49 +344,160 @@ def show_loto_section():
             manage_users()
         else:
             st.error("Solo admin puede administrar usuarios.")
+    with sub_tabs[5]:
+        if st.session_state.role == "admin":
+            bulk_import_locks()
+        else:
+            st.error("Solo admin puede importar inventarios.")
 
 def show_dashboard():
     """
     Muestra un pequeño dashboard con métrica y gráfico de tendencia.
     """
     st.markdown("<h1 style='text-align:center; color:#4dd0e1;'>Lockout-Tagout Dashboard</h1>", unsafe_allow_html=True)
-    df = st.session_state["candados_df"]
+    # Los contadores los mantienen las escrituras: no se recorre la tabla
+    counters = get_lock_counters()
+    rollups = get_activity_rollups()
+    version = rollups.version
     
-    if not df.empty:
+    if counters.snapshot()["total"]:
+        filters = dashboard_filters()
+        rids = None
+        if filters:
+            rids, counters, rollups = filter_locks(filters)
+            version = st.session_state["loto_view"].version
+        totals = counters.snapshot()
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric(label="Total Locks", value=len(df))
+            st.metric(label="Total Locks", value=totals["total"])
         with col2:
-            st.metric(label="Activos", value=(df["Estado"] == "Activo").sum())
+            st.metric(label="Activos", value=totals["active"])
         with col3:
-            st.metric(label="Alertas", value=(df["Valor"] > 200).sum())
+            st.metric(label="Alertas", value=totals["alerts"])
         
-        st.plotly_chart(plot_active_locks(df), use_container_width=True)
+        start, end, resolution = chart_controls(rollups)
+        show_figure(get_figure_cache().get(
+            "candados_activos", version, lambda: plot_active_locks(rollups, start, end, resolution),
+            ventana=(start, end, resolution), **filters))
         st.markdown("<h2 style='color:#4dd0e1;'>Actividad Reciente</h2>", unsafe_allow_html=True)
-        df_sorted = df.sort_values("Fecha", ascending=False)
-        for _, row in df_sorted.iterrows():
-            st.markdown(f"""<div style='background:#1c2b3a; padding:10px; margin-bottom:10px;'>
-                <span style='color:#ffffff;'>No. Candado: {row.get('NoCandado','')} | Área: {row.get('Area','')} | 
-                Estado: {row.get('Estado','')} | Fecha: {row.get('Fecha','')}</span></div>""", 
-                unsafe_allow_html=True)
+        show_activity_feed(rids)
     else:
         st.warning("No hay candados registrados.")
 
-def plot_active_locks(df):
-    """
-    Genera un gráfico de línea con la cantidad de candados activos por fecha.
-    """
-    df_copy = df.copy()
-    df_copy["Fecha"] = pd.to_datetime(df_copy["Fecha"], errors="coerce")
-    df_activos = df_copy[df_copy["Estado"] == "Activo"]
-    if not df_activos.empty:
-        df_count = df_activos.groupby(df_activos["Fecha"].dt.date).size().reset_index(name="count")
+def dashboard_filters():
+    """
+    Filtros del dashboard elegidos por el usuario: columna -> valores
+    elegidos y, si se pidió, "Fecha" -> (desde, hasta) con ``hasta`` excluido.
+    """
+    indexes = get_filter_indexes()
+    filters = {}
+    with st.expander("Filtros"):
+        cols = st.columns(len(DASHBOARD_FILTERS))
+        for col, (column, label) in zip(cols, DASHBOARD_FILTERS.items()):
+            chosen = col.multiselect(label, indexes[column].values(), key=f"filtro_{column}")
+            if chosen:
+                filters[column] = tuple(chosen)
+        if st.checkbox("Filtrar por fecha", key="filtro_por_fecha"):
+            fechas = st.date_input("Rango de fechas", value=(date.today() - timedelta(days=30), date.today()),
+                                   key="filtro_fechas")
+            if fechas:
+                desde, hasta = fechas[0], fechas[-1]
+                filters["Fecha"] = (pd.Timestamp(desde), pd.Timestamp(hasta) + pd.Timedelta(days=1))
+    return filters
+
+def filter_locks(filters):
+    """
+    ``rid`` de los candados que cumplen ``filters`` (ordenados por Fecha),
+    sus métricas y sus series por período. Se resuelve con los índices
+    (rango de fechas y listas de posteo) y se guarda en la sesión hasta que
+    cambien los datos o el filtro.
+    """
+    view = st.session_state["loto_view"]
+    key = (view.version, tuple(sorted(filters.items())))
+    cached = st.session_state.get("dashboard_filter")
+    if cached is not None and cached[0] == key:
+        return cached[1:]
+    indexes = get_filter_indexes()
+    ordered = get_fecha_index().range(*filters.get("Fecha", (None, None)))
+    rids = intersect(ordered, [indexes[c].lookup(v) for c, v in filters.items() if c != "Fecha"])
+    rows = view.rows(rids, ["Estado", "Valor", "Fecha"])
+    counters = LockCounters(alert_threshold=ALERT_VALOR)
+    counters.reset(rows)
+    rollups = ActivityRollups()
+    rollups.reset(rows)
+    st.session_state["dashboard_filter"] = (key, rids, counters, rollups)
+    return rids, counters, rollups
+
+def chart_controls(rollups):
+    """
+    Ventana (zoom) y resolución del gráfico de tendencia. En "Automática" la
+    resolución se elige según el largo de la ventana.
+    """
+    bounds = rollups.bounds()
+    if bounds is None:
+        return None, None, "D"
+    first, last = bounds[0].date(), bounds[1].date()
+    start, end = first, last
+    if first < last:
+        window = st.session_state.get("chart_window")
+        if window is not None and (window[0] < first or window[1] > last):
+            del st.session_state["chart_window"]  # los datos (o el filtro) cambiaron de rango
+        start, end = st.slider("Ventana del gráfico", min_value=first, max_value=last,
+                               value=(first, last), key="chart_window")
+    options = ["Automática"] + [label.capitalize() for label in RESOLUTIONS.values()]
+    chosen = st.radio("Resolución", options, horizontal=True, key="chart_resolution")
+    if chosen == "Automática":
+        resolution = pick_resolution(start, end)
     else:
-        df_count = pd.DataFrame()
-
-    fig = px.line(df_count, x="Fecha", y="count", markers=True, title="Tendencia de Candados Activos")
-    fig.update_layout(plot_bgcolor="#1c2b3a", paper_bgcolor="#0e1a2b", font_color="#ffffff", title_font_color="#4dd0e1")
-    fig.update_traces(line_color="#4dd0e1", marker_color="#4dd0e1")
+        resolution = next(freq for freq, label in RESOLUTIONS.items() if label == chosen.lower())
+    return pd.Timestamp(start), pd.Timestamp(end), resolution
+
+def show_activity_feed(rids=None):
+    """
+    Actividad reciente paginada. El orden por Fecha lo mantiene un índice
+    compartido y sólo se leen y dibujan (en un único bloque) las filas de la
+    página visible, así el costo no depende del largo del historial.
+    ``rids`` limita el listado a esos candados (ya ordenados por Fecha).
+    """
+    index = get_fecha_index()
+    total = len(index) if rids is None else len(rids)
+    pages = max(1, -(-total // ACTIVITY_PAGE_SIZE))
+    if st.session_state.get("activity_page", 1) > pages:
+        st.session_state["activity_page"] = pages
+    page = st.number_input("Página", min_value=1, max_value=pages, step=1, key="activity_page")
+    offset = (page - 1) * ACTIVITY_PAGE_SIZE
+    if rids is None:
+        rids = index.page(offset, ACTIVITY_PAGE_SIZE)
+    else:
+        rids = page_slice(rids, offset, ACTIVITY_PAGE_SIZE)
+    rows = st.session_state["loto_view"].rows(rids, ["NoCandado", "Area", "Estado", "Fecha"])
+    items = "".join(
+        f"""<div style='background:#1c2b3a; padding:10px; margin-bottom:10px;'>
+            <span style='color:#ffffff;'>No. Candado: {html.escape(str(row['NoCandado']))} | Área: {html.escape(str(row['Area']))} | 
+            Estado: {html.escape(str(row['Estado']))} | Fecha: {format_fecha(row['Fecha'])}</span></div>"""
+        for row in rows.to_dict("records")
+    )
+    st.markdown(items, unsafe_allow_html=True)
+    st.caption(f"Página {page} de {pages} ({total} candados)")
+
+def plot_active_locks(rollups, start=None, end=None, resolution="D"):
+    """
+    Genera un gráfico de línea con los candados registrados por período
+    (``resolution``, según su Fecha) entre ``start`` y ``end``, separados por
+    su estado actual, a partir de las series ya agrupadas de ``rollups``. No
+    es la cantidad de candados activos en cada momento: un candado que hoy
+    está inactivo cuenta como inactivo en el período en que se registró.
+    Cada serie se reduce a ``CHART_MAX_POINTS`` puntos con LTTB.
+    """
+    df_count = rollups.frame(resolution, start, end)
+    fig = go.Figure()
+    for state, label, color in (("Activo", "Hoy activos", "#4dd0e1"), ("Inactivo", "Hoy inactivos", "#ff8a65")):
+        keep = lttb(df_count.index.asi8, df_count[state].to_numpy(), CHART_MAX_POINTS)
+        fig.add_trace(go.Scatter(x=df_count.index[keep], y=df_count[state].to_numpy()[keep],
+                                 mode="lines+markers", name=label, line_color=color, marker_color=color))
+    fig.update_layout(title=f"Candados registrados por {RESOLUTIONS[resolution]}, según su estado actual",
+                      xaxis_title="Fecha de registro", yaxis_title="Candados registrados", plot_bgcolor="#1c2b3a", paper_bgcolor="#0e1a2b",
+                      font_color="#ffffff", title_font_color="#4dd0e1")
     return fig
 
 def input_data():
@@ -297,9 +524,10 @@ def input_data():
         submitted = st.form_submit_button("Guardar Registro")
 
         if submitted:
-            pdf_data = bytes(uploaded_file.read()) if uploaded_file else None
+            blobs = get_blob_store()
+            pdf_hash = blobs.put(uploaded_file.read()) if uploaded_file else None
             data_qr = f"NoCandado={no_candado}, Area={area}, Fecha={fecha_reg}"
-            qr_bytes = generate_qr_code(data_qr)
+            qr_hash = blobs.put(generate_qr_code(data_qr))
             
             new_row = {
                 "ID": no_candado,
@@ -317,16 +545,73 @@ def input_data():
                 "Responsable": responsable,
                 "Estado": "Activo" if estado_check else "Inactivo",
                 "Valor": valor,
-                "QR_Bytes": qr_bytes,
-                "PDF_Adjunto": pdf_data
+                "QR_Hash": qr_hash,
+                "PDF_Hash": pdf_hash
             }
             
-            df = st.session_state["candados_df"]
-            df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-            st.session_state["candados_df"] = df
-            save_loto_excel(df)
+            st.session_state["loto_view"].insert(new_row)
             st.success("Registro guardado exitosamente.")
 
+def bulk_import_locks():
+    """
+    Importación masiva de un inventario de candados (Excel o CSV). El archivo
+    se procesa por bloques y todo se guarda en una única transacción.
+    """
+    st.markdown("<h1 style='text-align:center; color:#4dd0e1;'>Importar Inventario de Candados</h1>", unsafe_allow_html=True)
+    st.write("El archivo debe tener una fila de encabezado con los nombres de columna de LOTO "
+             f"(obligatoria: NoCandado; opcionales: {', '.join(c for c in LOTO_COLUMNS[1:] if not c.startswith('_') and not c.endswith('_Hash'))}).")
+    uploaded_file = st.file_uploader("Archivo de inventario", type=["xlsx", "csv"], key="bulk_import_file")
+    chunk_size = st.number_input("Filas por bloque", min_value=100, max_value=50000, value=IMPORT_CHUNK_SIZE, step=100)
+    strict = st.checkbox("Cancelar toda la importación si hay filas inválidas", value=True)
+
+    if uploaded_file is None or not st.button("Importar"):
+        return
+
+    errors = []
+    progreso = st.empty()
+
+    def chunks():
+        leidas = 0
+        for raw in iter_chunks(uploaded_file, uploaded_file.name, chunk_size=int(chunk_size)):
+            valid, chunk_errors = validate_chunk(raw, LOTO_COLUMNS)
+            errors.extend(chunk_errors)
+            if strict and chunk_errors:
+                raise ImportValidationError(errors)
+            leidas += len(raw)
+            progreso.info(f"Procesando... {leidas} filas leídas")
+            yield add_qr_codes(valid)
+
+    try:
+        total = st.session_state["loto_view"].dataset.insert_chunks(chunks())
+    except ImportValidationError as e:
+        st.error(f"Importación cancelada: {e}. No se guardó ningún candado.")
+        st.dataframe(pd.DataFrame(e.errors[:200], columns=["Fila", "Error"]))
+        return
+    except Exception as e:
+        st.error(f"Error al leer el archivo: {e}. No se guardó ningún candado.")
+        return
+    progreso.empty()
+    st.success(f"Se importaron {total} candados.")
+    if errors:
+        st.warning(f"Se omitieron {len(errors)} fila(s) inválida(s).")
+        st.dataframe(pd.DataFrame(errors[:200], columns=["Fila", "Error"]))
+
+def add_qr_codes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Genera en lote los QR de un bloque de candados y guarda sus hashes.
+    Los contenidos repetidos se generan una sola vez.
+    """
+    df = df.copy()
+    payloads = ("NoCandado=" + df["NoCandado"].astype(str)
+                + ", Area=" + df.get("Area", pd.Series("", index=df.index)).fillna("").astype(str)
+                + ", Fecha=" + df["Fecha"].dt.strftime("%Y-%m-%d"))
+    blobs = get_blob_store()
+    hashes = {p: blobs.put(generate_qr_code(p)) for p in payloads.unique()}
+    df["QR_Hash"] = payloads.map(hashes)
+    if "ID" not in df.columns:
+        df["ID"] = df["NoCandado"]
+    return df
+
 def generate_qr_code(data: str) -> bytes:
     """
     Genera un código QR válido y retorna los datos como bytes.
@@ -345,62 +630,89 @@ def edit_or_delete_candado():
     Sección para editar o borrar candados existentes.
     """
     st.markdown("<h1 style='text-align:center; color:#4dd0e1;'>Editar o Borrar Candados</h1>", unsafe_allow_html=True)
-    df = st.session_state["candados_df"]
-    
-    if df.empty:
+    view = st.session_state["loto_view"]
+    labels = view.project(["NoCandado", "Area"])
+
+    if labels.empty:
         st.info("No hay candados para editar/borrar.")
         return
 
-    df_display = df[["NoCandado", "Area", "Estado", "Fecha"]].reset_index(drop=True)
     if "edit_mode" not in st.session_state:
         st.session_state["edit_mode"] = None
-    if "tarjeta_pdf" not in st.session_state:
-        st.session_state["tarjeta_pdf"] = None
     if "tarjeta_idx" not in st.session_state:
         st.session_state["tarjeta_idx"] = None
 
-    select_idx = st.selectbox(
+    # Las opciones y las claves de los botones son los rid, no posiciones:
+    # un borrado en otra sesión corre las posiciones pero no los rid
+    rid = st.selectbox(
         "Elige un candado:",
-        df_display.index, 
-        format_func=lambda i: f"No. {df_display.loc[i, 'NoCandado']} | Área: {df_display.loc[i, 'Area']}"
+        labels.index.tolist(),
+        format_func=lambda r: f"No. {labels.at[r, 'NoCandado']} | Área: {labels.at[r, 'Area']}"
     )
-    row_data = df.iloc[select_idx]
+    no_candado = labels.at[rid, "NoCandado"]
 
     col1, col2, col3 = st.columns([1,1,1])
     with col1:
-        if st.button("Editar", key=f"editar_btn_{select_idx}"):
-            st.session_state["edit_mode"] = select_idx
+        if st.button("Editar", key=f"editar_btn_{rid}"):
+            st.session_state["edit_mode"] = rid
+            view.begin_edit(rid)
     with col2:
-        if st.button("Borrar", key=f"borrar_btn_{select_idx}"):
-            df.drop(df.index[select_idx], inplace=True)
-            st.session_state["candados_df"] = df
-            save_loto_excel(df)
-            st.success("Candado borrado.")
+        if st.button("Borrar", key=f"borrar_btn_{rid}"):
+            if view.delete(rid):
+                st.success("Candado borrado.")
+            else:
+                st.info("Otro usuario ya había borrado este candado.")
+            st.session_state["edit_mode"] = None
+            st.session_state["tarjeta_idx"] = None
+            return
     with col3:
-        if st.button("Generar Tarjeta", key=f"tarjeta_btn_{select_idx}"):
-            pdf_card = generate_loto_card(row_data)
-            st.session_state["tarjeta_pdf"] = pdf_card
-            st.session_state["tarjeta_idx"] = select_idx
+        if st.button("Generar Tarjeta", key=f"tarjeta_btn_{rid}"):
+            # La tarjeta usa la fila completa: recién aquí se lee del motor
+            pdf_card = generate_loto_card(view.rows([rid], LOTO_COLUMNS).iloc[0])
+            get_session_artifacts().put("tarjeta_pdf", pdf_card)
+            st.session_state["tarjeta_idx"] = rid
             st.success("Tarjeta generada.")
 
-    if st.session_state["tarjeta_pdf"] and st.session_state["tarjeta_idx"] == select_idx:
+    tarjeta_pdf = get_session_artifacts().get("tarjeta_pdf")
+    if tarjeta_pdf and st.session_state["tarjeta_idx"] == rid:
         st.download_button(
             "Descargar Tarjeta PDF",
-            st.session_state["tarjeta_pdf"], 
-            file_name=f"tarjeta_{row_data.get('NoCandado','')}.pdf", 
+            tarjeta_pdf, 
+            file_name=f"tarjeta_{no_candado}.pdf", 
             mime="application/pdf"
         )
 
-    if st.session_state["edit_mode"] == select_idx:
-        with st.expander(f"Editando No. Candado: {row_data.get('NoCandado','')}", expanded=True):
-            edit_candado_form(select_idx)
+    # El hash y el adjunto sólo se leen para el candado seleccionado
+    pdf_hash = view.rows([rid], ["PDF_Hash"])["PDF_Hash"]
+    adjunto = get_blob_store().get(pdf_hash.iloc[0]) if len(pdf_hash) else None
+    if adjunto:
+        st.download_button(
+            "Descargar PDF Adjunto",
+            adjunto,
+            file_name=f"adjunto_{no_candado}.pdf",
+            mime="application/pdf"
+        )
+
+    if st.session_state["edit_mode"] == rid:
+        with st.expander(f"Editando No. Candado: {no_candado}", expanded=True):
+            edit_candado_form(rid)
 
 def edit_candado_form(idx):
     """
     Formulario que se despliega al seleccionar un candado para edición.
-    """
-    df = st.session_state["candados_df"]
-    candado = df.loc[idx]
+    ``idx`` es la clave ``rid`` del candado en el motor de almacenamiento.
+    Los valores iniciales son la foto tomada al pulsar "Editar"; si otra sesión
+    cambió el candado entretanto, los cambios se fusionan o se rechazan.
+    """
+    view = st.session_state["loto_view"]
+    candado = view.draft(idx)
+    if candado is None:
+        st.warning("Este candado ya no existe: otro usuario lo borró.")
+        st.session_state["edit_mode"] = None
+        return
+    if idx in view.dirty_rows() and st.button("Descartar cambios sin guardar", key=f"descartar_{idx}"):
+        view.discard(idx)
+        candado = view.draft(idx)
 
     with st.form(f"edit_form_{idx}", clear_on_submit=True):
         no_candado = st.text_input("No. de Candado", value=candado.get("NoCandado", ""))
@@ -412,7 +724,8 @@ def edit_candado_form(idx):
         e_nom = st.text_input("Bloqueo Ejecutado Por - Nombre", value=candado.get("EjecPorNombre",""))
         e_cargo = st.text_input("Bloqueo Ejecutado Por - Cargo", value=candado.get("EjecPorCargo",""))
         n_ptw = st.text_input("N° PTW", value=candado.get("N_PTW",""))
-        new_fecha = st.date_input("Fecha", value=pd.to_datetime(candado.get("Fecha", date.today())).date())
+        fecha_actual = candado.get("Fecha")
+        new_fecha = st.date_input("Fecha", value=fecha_actual.date() if pd.notna(fecha_actual) else date.today())
         new_desc = st.text_area("Descripción", value=candado.get("Descripción",""))
         new_resp = st.text_input("Responsable", value=candado.get("Responsable",""))
         new_estado = st.selectbox("Estado", ["Activo", "Inactivo"], 
@@ -420,27 +733,33 @@ def edit_candado_form(idx):
         new_valor = st.number_input("Valor", min_value=0, max_value=999999, value=int(candado.get("Valor", 0)))
         
         if st.form_submit_button("Guardar Cambios"):
-            df.at[idx, "NoCandado"] = no_candado
-            df.at[idx, "Area"] = area
-            df.at[idx, "TableroEquipo"] = tablero_equipo
-            df.at[idx, "KKS"] = kks
-            df.at[idx, "TipoBloqueo"] = tipo_bloqueo
-            df.at[idx, "LiderAutorizador"] = lider_aut
-            df.at[idx, "EjecPorNombre"] = e_nom
-            df.at[idx, "EjecPorCargo"] = e_cargo
-            df.at[idx, "N_PTW"] = n_ptw
-            df.at[idx, "Fecha"] = str(new_fecha)
-            df.at[idx, "Descripción"] = new_desc
-            df.at[idx, "Responsable"] = new_resp
-            df.at[idx, "Estado"] = new_estado
-            df.at[idx, "Valor"] = new_valor
-            df.at[idx, "ID"] = no_candado
-            df.at[idx, "QR_Bytes"] = generate_qr_code(
-                f"NoCandado={no_candado}, Area={area}, Fecha={new_fecha}"
-            )
-            
-            st.session_state["candados_df"] = df
-            save_loto_excel(df)
+            view.stage(idx, {
+                "NoCandado": no_candado,
+                "Area": area,
+                "TableroEquipo": tablero_equipo,
+                "KKS": kks,
+                "TipoBloqueo": tipo_bloqueo,
+                "LiderAutorizador": lider_aut,
+                "EjecPorNombre": e_nom,
+                "EjecPorCargo": e_cargo,
+                "N_PTW": n_ptw,
+                "Fecha": str(new_fecha),
+                "Descripción": new_desc,
+                "Responsable": new_resp,
+                "Estado": new_estado,
+                "Valor": new_valor,
+                "ID": no_candado,
+                "QR_Hash": get_blob_store().put(generate_qr_code(
+                    f"NoCandado={no_candado}, Area={area}, Fecha={new_fecha}"
+                )),
+            })
+            try:
+                view.commit(idx)
+            except ConflictError as e:
+                view.begin_edit(idx)  # si otro usuario lo borró, descarta la edición
+                st.error(f"Otro usuario modificó este candado mientras lo editabas ({e}). "
+                         "Tus cambios siguen sin guardar: revísalos y vuelve a guardar.")
+                return
             st.success("Cambios guardados.")
             st.session_state["edit_mode"] = None
 
@@ -449,16 +768,36 @@ def generate_reports():
     Genera reportes en Excel o PDF a partir de los candados registrados.
     """
     st.markdown("<h1 style='text-align:center; color:#4dd0e1;'>Generar Reporte Excel / PDF</h1>", unsafe_allow_html=True)
-    df = st.session_state["candados_df"]
+    view = st.session_state["loto_view"]
+    # Para armar la pantalla alcanza con NoCandado; las filas completas se
+    # leen recién al pulsar un botón
+    candados = view.project(["NoCandado"])["NoCandado"]
+    archived = None
+
+    # Los candados archivados sólo se cargan si el reporte pide su rango de fechas
+    if st.checkbox("Incluir candados archivados"):
+        rango = st.date_input("Rango de fechas del archivo",
+                              value=(date.today() - timedelta(days=365), date.today()))
+        if len(rango) == 2:
+            archived = load_archived_locks(*rango)
+            candados = pd.concat([candados, archived["NoCandado"]])
     
-    if df.empty:
+    if candados.empty:
         st.warning("No hay datos para exportar.")
         return
 
+    def report_rows(no_candado=None):
+        """Filas completas del reporte (todas o las de ``no_candado``), leídas sólo para él."""
+        df = view.table() if archived is None else pd.concat([view.table(), archived])
+        return df if no_candado is None else df[df["NoCandado"] == no_candado]
+
     formato = st.radio("Formato:", ["Excel", "PDF"], horizontal=True)
     if formato == "Excel":
+        if st.session_state.role == "admin" and st.button(f"Exportar a {EXCEL_FILE_LOTO}"):
+            get_tables().export("candados")
+            st.success(f"Datos exportados a {EXCEL_FILE_LOTO}.")
         if st.button("Generar Excel"):
-            excel_bytes = generate_excel_file(df)
+            excel_bytes = generate_excel_file(report_rows())
             st.download_button(
                 "Descargar Excel",
                 excel_bytes,
@@ -466,10 +805,9 @@ def generate_reports():
                 "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             )
     else:
-        selected = st.selectbox("Seleccionar:", ["Todos"] + df["NoCandado"].dropna().unique().tolist())
+        selected = st.selectbox("Seleccionar:", ["Todos"] + candados.dropna().unique().tolist())
         if st.button("Generar PDF"):
-            sub_df = df if selected == "Todos" else df[df["NoCandado"] == selected]
-            pdf_bytes = generate_pdf_all(sub_df)
+            pdf_bytes = generate_pdf_all(report_rows(None if selected == "Todos" else selected))
             st.download_button(
                 "Descargar PDF",
                 bytes(pdf_bytes),
@@ -483,7 +821,7 @@ def generate_excel_file(df: pd.DataFrame) -> bytes:
     """
     output = io.BytesIO()
     with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        cols = [c for c in df.columns if c not in ["QR_Bytes", "PDF_Adjunto"]]
+        cols = [c for c in df.columns if c not in ["QR_Hash", "PDF_Hash"] and not c.startswith("_")]
         df[cols].to_excel(writer, index=False, sheet_name="ReporteCandados")
     output.seek(0)
     return output.getvalue()
@@ -534,7 +872,7 @@ class LotoPDF(FPDF):
             self.ln(row_height)
 
         # Espacio para QR o mensaje alternativo
-        qr_data = data.get('QR_Bytes', None)
+        qr_data = get_blob_store().get(data.get('QR_Hash'))
         if isinstance(qr_data, (bytes, bytearray)):
             with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp:
                 tmp.write(qr_data)
@@ -585,7 +923,7 @@ def generate_pdf_all(df: pd.DataFrame) -> bytes:
             ("Líder Autorizador:", row.get('LiderAutorizador', '')),
             ("Ejecutado por:", f"{row.get('EjecPorNombre', '')} ({row.get('EjecPorCargo', '')})"),
             ("N° PTW:", row.get('N_PTW', '')),
-            ("Fecha:", row.get('Fecha', '')),
+            ("Fecha:", format_fecha(row.get('Fecha'))),
             ("Estado:", row.get('Estado', '')),
             ("Valor:", str(row.get('Valor', 0))),
             ("Descripción:", row.get('Descripción', '')),
@@ -595,9 +933,9 @@ def generate_pdf_all(df: pd.DataFrame) -> bytes:
             pdf.cell(col_width, line_height, label, 1, 0, 'L', 1)
             pdf.cell(0, line_height, str(value), 1, 1, 'L', 1)
 
-        # QR Code debajo de las celdas
+        # QR Code debajo de las celdas (se lee del almacén de blobs sólo aquí)
         pdf.ln(10)  # Espacio después de la tabla
-        qr_data = row.get("QR_Bytes")
+        qr_data = get_blob_store().get(row.get("QR_Hash"))
         if isinstance(qr_data, (bytes, bytearray)):  # Validación QR
             with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp:
                 tmp.write(qr_data)
@@ -663,10 +1001,15 @@ def show_precomisionado_section():
 
 def show_item_list():
     """
-    Muestra la lista de items para precomisionado.
+    Muestra la lista de items para precomisionado, filtrable por proyecto y tag.
     """
-    st.write("**Items** (ejemplo) para Precomisionado:")
-    df_items = st.session_state["itembook_df"]
+    items = get_tables().reference("itembook")
+    st.write(f"**Items** para Precomisionado ({len(items.df)} en {EXCEL_FILE_ITEMBOOK}):")
+    proyecto = st.selectbox("Proyecto", ["Todos"] + items.groups("Proyecto"), key="itembook_proyecto")
+    df_items = items.df if proyecto == "Todos" else items.group("Proyecto", proyecto)
+    buscar = st.text_input("Buscar tag", key="itembook_buscar").strip()
+    if buscar:
+        df_items = df_items[df_items["ItemID"].str.contains(buscar, case=False, regex=False)]
     st.dataframe(df_items)
 
 def generate_itr_pdf():
@@ -674,31 +1017,35 @@ def generate_itr_pdf():
     Genera un PDF de ITR basado en un formulario sencillo.
     """
     st.write("Completa el formulario de ITR y genera un PDF similar al ejemplo.")
-    df_items = st.session_state["itembook_df"]
+    items = get_tables().reference("itembook")
     
-    if df_items.empty:
+    if items.df.empty:
         st.warning("No hay items en la base de datos.")
         return
 
-    item_id = st.selectbox("Seleccionar ItemID", df_items["ItemID"].unique())
-    row_item = df_items[df_items["ItemID"] == item_id].iloc[0]
+    proyecto = st.selectbox("Proyecto", items.groups("Proyecto"), key="itr_proyecto")
+    item_id = st.selectbox("Seleccionar ItemID", items.group("Proyecto", proyecto)["ItemID"].unique())
+    row_item = items.get(item_id)
 
     with st.form("itr_form"):
-        equipo = st.text_input("Descripción del Equipo", value=row_item["Descripcion"])
-        subsistema = st.text_input("Sub-sistema", "Tensión segura (ejemplo)")
+        equipo = st.text_input("Descripción del Equipo", value=str(row_item["Descripcion"]))
+        subsistema = st.text_input("Sub-sistema", str(row_item["SUBSISTEMA"]))
         responsable = st.text_input("Responsable", "Ing. Precomisionado")
         comentarios = st.text_area("Comentarios", "Observaciones...")
         submitted = st.form_submit_button("Generar PDF")
 
     if submitted:
         pdf_bytes = generar_pdf_precom(row_item, equipo, subsistema, responsable, comentarios)
-        st.session_state["pdf_bytes"] = pdf_bytes
+        if isinstance(pdf_bytes, str):  # FPDF 1.x devuelve el PDF como texto latin-1
+            pdf_bytes = pdf_bytes.encode("latin1")
+        get_session_artifacts().put("itr_pdf", pdf_bytes)
         st.success("PDF generado con éxito. Descarga a continuación:")
 
-    if "pdf_bytes" in st.session_state and st.session_state["pdf_bytes"] is not None:
+    itr_pdf = get_session_artifacts().get("itr_pdf")
+    if itr_pdf is not None:
         st.download_button(
             "Descargar ITR PDF",
-            st.session_state["pdf_bytes"], 
+            itr_pdf, 
             f"ITR_{item_id}.pdf", 
             "application/pdf"
         )
@@ -749,7 +1096,7 @@ def run_document_form():
         return
 
     try:
-        df_def = pd.read_excel(uploaded_file)
+        df_def = get_excel_cache().read_upload(uploaded_file.getvalue())
     except Exception as e:
         st.error(f"Error al leer el Excel: {e}")
         return
@@ -842,7 +1189,8 @@ def show_simops_overview():
     """
     Muestra un resumen o dashboard para SIMOPS.
     """
-    df = st.session_state["simops_df"]
+    view = st.session_state["simops_view"]
+    df = view.project([c for c in SIMOPS_COLUMNS if not c.startswith("_")])
     if df.empty:
         st.warning("No hay operaciones SIMOPS registradas.")
         return
@@ -851,12 +1199,19 @@ def show_simops_overview():
     st.dataframe(df)
     
     if "Estado" in df.columns:
-        estado_count = df["Estado"].value_counts().reset_index()
-        estado_count.columns = ["Estado", "Cantidad"]
-        fig = px.bar(estado_count, x="Estado", y="Cantidad", title="SIMOPS por Estado")
-        fig.update_layout(plot_bgcolor="#1c2b3a", paper_bgcolor="#0e1a2b", font_color="#ffffff")
-        fig.update_traces(marker_color="#4dd0e1")
-        st.plotly_chart(fig, use_container_width=True)
+        show_figure(get_figure_cache().get(
+            "simops_estado", view.version, lambda: plot_simops_estado(view.project(["Estado"]))))
+
+def plot_simops_estado(df):
+    """
+    Genera un gráfico de barras con la cantidad de operaciones SIMOPS por estado.
+    """
+    estado_count = df["Estado"].value_counts().reset_index()
+    estado_count.columns = ["Estado", "Cantidad"]
+    fig = px.bar(estado_count, x="Estado", y="Cantidad", title="SIMOPS por Estado")
+    fig.update_layout(plot_bgcolor="#1c2b3a", paper_bgcolor="#0e1a2b", font_color="#ffffff")
+    fig.update_traces(marker_color="#4dd0e1")
+    return fig
 
 def register_simops():
     """
@@ -877,7 +1232,6 @@ def register_simops():
         submit_simops = st.form_submit_button("Guardar SIMOPS")
 
     if submit_simops:
-        df = st.session_state["simops_df"]
         new_row = {
             "SIMOPS_ID": simops_id,
             "Descripción": descripcion,
@@ -890,9 +1244,7 @@ def register_simops():
             "Riesgos": riesgos,
             "Acciones_Mitigación": acciones
         }
-        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
-        st.session_state["simops_df"] = df
-        save_simops_data(df)
+        st.session_state["simops_view"].insert(new_row)
         st.success("Operación SIMOPS registrada con éxito.")
 
 def edit_delete_simops():
@@ -900,43 +1252,53 @@ def edit_delete_simops():
     Permite editar o eliminar operaciones SIMOPS existentes.
     """
     st.markdown("### Editar / Borrar SIMOPS")
-    df = st.session_state["simops_df"]
-    if df.empty:
+    view = st.session_state["simops_view"]
+    labels = view.project(["SIMOPS_ID", "Descripción"])
+    if labels.empty:
         st.info("No hay operaciones SIMOPS para editar/borrar.")
         return
     
-    df_display = df[["SIMOPS_ID", "Descripción", "Estado", "Fecha_Inicio", "Fecha_Fin"]].reset_index(drop=True)
     if "edit_simops_mode" not in st.session_state:
         st.session_state["edit_simops_mode"] = None
 
-    select_idx = st.selectbox(
+    rid = st.selectbox(
         "Elige una operación SIMOPS:",
-        df_display.index,
-        format_func=lambda i: f"ID: {df_display.loc[i, 'SIMOPS_ID']} | {df_display.loc[i, 'Descripción']}"
+        labels.index.tolist(),
+        format_func=lambda r: f"ID: {labels.at[r, 'SIMOPS_ID']} | {labels.at[r, 'Descripción']}"
     )
-    row_data = df.iloc[select_idx]
 
     col1, col2 = st.columns(2)
     with col1:
-        if st.button("Editar"):
-            st.session_state["edit_simops_mode"] = select_idx
+        if st.button("Editar", key=f"editar_simops_btn_{rid}"):
+            st.session_state["edit_simops_mode"] = rid
+            view.begin_edit(rid)
     with col2:
-        if st.button("Borrar"):
-            df.drop(df.index[select_idx], inplace=True)
-            st.session_state["simops_df"] = df
-            save_simops_data(df)
-            st.success("Operación SIMOPS eliminada.")
+        if st.button("Borrar", key=f"borrar_simops_btn_{rid}"):
+            if view.delete(rid):
+                st.success("Operación SIMOPS eliminada.")
+            else:
+                st.info("Otro usuario ya había eliminado esta operación.")
+            st.session_state["edit_simops_mode"] = None
+            return
 
-    if st.session_state["edit_simops_mode"] == select_idx:
-        with st.expander(f"Editando SIMOPS ID: {row_data.get('SIMOPS_ID','')}", expanded=True):
-            edit_simops_form(select_idx)
+    if st.session_state["edit_simops_mode"] == rid:
+        with st.expander(f"Editando SIMOPS ID: {labels.at[rid, 'SIMOPS_ID']}", expanded=True):
+            edit_simops_form(rid)
 
 def edit_simops_form(idx):
     """
-    Formulario para editar SIMOPS seleccionada.
+    Formulario para editar SIMOPS seleccionada. ``idx`` es la clave ``rid``
+    de la operación; sólo se persisten los campos que cambiaron.
     """
-    df = st.session_state["simops_df"]
-    simops = df.loc[idx]
+    view = st.session_state["simops_view"]
+    simops = view.draft(idx)
+    if simops is None:
+        st.warning("Esta operación ya no existe: otro usuario la borró.")
+        st.session_state["edit_simops_mode"] = None
+        return
+    if idx in view.dirty_rows() and st.button("Descartar cambios sin guardar", key=f"descartar_simops_{idx}"):
+        view.discard(idx)
+        simops = view.draft(idx)
 
     with st.form(f"edit_simops_form_{idx}", clear_on_submit=True):
         simops_id = st.text_input("ID SIMOPS", value=simops.get("SIMOPS_ID", ""))
@@ -957,19 +1319,25 @@ def edit_simops_form(idx):
         acciones = st.text_area("Acciones / Mitigaciones", value=simops.get("Acciones_Mitigación",""))
 
         if st.form_submit_button("Guardar Cambios"):
-            df.at[idx, "SIMOPS_ID"] = simops_id
-            df.at[idx, "Descripción"] = descripcion
-            df.at[idx, "Área"] = area
-            df.at[idx, "PTWs_Involucrados"] = ptw_involucrados
-            df.at[idx, "Fecha_Inicio"] = str(fecha_inicio)
-            df.at[idx, "Fecha_Fin"] = str(fecha_fin)
-            df.at[idx, "Encargado"] = encargado
-            df.at[idx, "Estado"] = estado
-            df.at[idx, "Riesgos"] = riesgos
-            df.at[idx, "Acciones_Mitigación"] = acciones
-
-            st.session_state["simops_df"] = df
-            save_simops_data(df)
+            view.stage(idx, {
+                "SIMOPS_ID": simops_id,
+                "Descripción": descripcion,
+                "Área": area,
+                "PTWs_Involucrados": ptw_involucrados,
+                "Fecha_Inicio": str(fecha_inicio),
+                "Fecha_Fin": str(fecha_fin),
+                "Encargado": encargado,
+                "Estado": estado,
+                "Riesgos": riesgos,
+                "Acciones_Mitigación": acciones,
+            })
+            try:
+                view.commit(idx)
+            except ConflictError as e:
+                view.begin_edit(idx)  # si otro usuario la borró, descarta la edición
+                st.error(f"Otro usuario modificó esta operación mientras la editabas ({e}). "
+                         "Tus cambios siguen sin guardar: revísalos y vuelve a guardar.")
+                return
             st.success("Cambios guardados.")
             st.session_state["edit_simops_mode"] = None
 
@@ -978,13 +1346,19 @@ def generate_simops_report_pdf():
     Permite generar un reporte PDF de las operaciones SIMOPS.
     """
     st.markdown("### Generar Reporte PDF de SIMOPS")
-    df = st.session_state["simops_df"]
-    if df.empty:
+    view = st.session_state["simops_view"]
+    ids = view.project(["SIMOPS_ID"])["SIMOPS_ID"]
+    if ids.empty:
         st.warning("No hay datos de SIMOPS para exportar.")
         return
 
-    selected = st.selectbox("Seleccionar SIMOPS:", ["Todos"] + df["SIMOPS_ID"].dropna().unique().tolist())
+    if st.session_state.role == "admin" and st.button(f"Exportar a {EXCEL_FILE_SIMOPS}"):
+        get_tables().export("simops")
+        st.success(f"Datos exportados a {EXCEL_FILE_SIMOPS}.")
+
+    selected = st.selectbox("Seleccionar SIMOPS:", ["Todos"] + ids.dropna().unique().tolist())
     if st.button("Generar PDF SIMOPS"):
+        df = view.table()  # filas completas sólo para el PDF, sin dejarlas en memoria
         sub_df = df if selected == "Todos" else df[df["SIMOPS_ID"] == selected]
         try:
             pdf_bytes = generate_pdf_simops(sub_df)
@@ -1068,37 +1442,353 @@ def add_professional_table(pdf, data):
     pdf.set_draw_color(200, 200, 200)
     pdf.line(10, pdf.get_y(), pdf.w - 10, pdf.get_y())
 
-def save_simops_data(df):
-    """Función dummy para guardar datos - implementa según tu necesidad"""
-    # Ejemplo: df.to_excel("simops_data.xlsx", index=False)
-    pass
 # =============================================================================
 # UTILIDADES DE DATOS
 # =============================================================================
-def load_loto_excel():
+@st.cache_resource
+def get_writer():
+    """
+    Devuelve la cola de escritura diferida (un único hilo escritor por proceso).
+    """
+    return WriteBehindQueue()
+
+def show_persistence_status():
     """
-    Carga el archivo Excel de candados LOTO, o lo crea con datos de ejemplo si no existe.
+    Muestra cuántas escrituras faltan persistir a disco y con cuánto retraso,
+    y cuántas filas tienen ediciones de la sesión sin confirmar.
     """
-    if not os.path.exists(EXCEL_FILE_LOTO):
-        df = prepopulate_loto(n=30)
-        df.to_excel(EXCEL_FILE_LOTO, index=False)
+    writer = get_writer()
+    pending, lag = writer.lag()
+    if writer.last_error and writer.last_error_retryable:
+        st.error(f"Error de persistencia (se reintentará): {writer.last_error}")
+    elif writer.last_error:
+        st.error(f"Un cambio no se pudo guardar y se descartó: {writer.last_error}")
+    if pending:
+        st.caption(f"Guardando en disco: {pending} cambio(s) pendiente(s), retraso {lag:.1f} s")
     else:
-        df = pd.read_excel(EXCEL_FILE_LOTO)
-        needed_cols = [
-            "NoCandado","Area","TableroEquipo","KKS","TipoBloqueo","LiderAutorizador",
-            "EjecPorNombre","EjecPorCargo","N_PTW","QR_Bytes","PDF_Adjunto","Valor",
-            "Estado","Descripción","Responsable","Fecha","ID"
-        ]
-        for col in needed_cols:
-            if col not in df.columns:
-                df[col] = ""
-    return df
+        st.caption("Todos los cambios están guardados en disco.")
+    # Ediciones empezadas en esta sesión que todavía no se confirmaron
+    unsaved = len(st.session_state["loto_view"].dirty_rows()) + len(st.session_state["simops_view"].dirty_rows())
+    if unsaved:
+        st.caption(f"Ediciones sin confirmar en esta sesión: {unsaved} fila(s).")
+
+@st.cache_resource
+def get_excel_cache():
+    """
+    Devuelve la caché de Excel ya parseados, compartida por todo el proceso.
+    """
+    return ExcelCache(max_bytes=EXCEL_CACHE_MAX_MB * 1024 * 1024)
+
+def show_excel_cache_stats():
+    """
+    Panel de administración: uso de la caché de Excel (aciertos, fallos y memoria).
+    """
+    cache = get_excel_cache()
+    stats = cache.stats()
+    with st.expander("Caché de archivos Excel"):
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Aciertos", stats["hits"])
+        c2.metric("Fallos", stats["misses"])
+        c3.metric("Tasa de aciertos", f"{stats['hit_rate']:.0%}")
+        c4.metric("Expulsados", stats["evictions"])
+        st.caption(f"{stats['entries']} archivo(s) en caché, "
+                   f"{stats['bytes'] / 1024 / 1024:.1f} de {stats['max_bytes'] / 1024 / 1024:.0f} MB")
+        if st.button("Vaciar caché de Excel"):
+            cache.clear()
+            st.success("Caché vaciada.")
+
+@st.cache_resource
+def get_figure_cache():
+    """
+    Devuelve la caché de gráficos ya armados, compartida por todo el proceso.
+    """
+    return FigureCache(max_bytes=FIGURE_CACHE_MAX_MB * 1024 * 1024)
+
+def show_figure_cache_stats():
+    """
+    Panel de administración: uso de la caché de gráficos del dashboard.
+    """
+    stats = get_figure_cache().stats()
+    with st.expander("Caché de gráficos"):
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Aciertos", stats["hits"])
+        c2.metric("Fallos", stats["misses"])
+        c3.metric("Tasa de aciertos", f"{stats['hit_rate']:.0%}")
+        c4.metric("Expulsados", stats["evictions"])
+        st.caption(f"{stats['entries']} gráfico(s) en caché, "
+                   f"{stats['bytes'] / 1024 / 1024:.1f} de {stats['max_bytes'] / 1024 / 1024:.0f} MB")
+
+def show_figure(fig_json):
+    """
+    Dibuja un gráfico guardado en la caché de figuras (JSON de Plotly).
+    """
+    st.plotly_chart(json.loads(fig_json), use_container_width=True)
+
+def get_session_artifacts():
+    """
+    Devuelve la caché de artefactos (PDF y planillas generados) de la sesión
+    actual. La primera vez por proceso limpia las carpetas que hayan quedado
+    de procesos anteriores.
+    """
+    if "artifacts" not in st.session_state:
+        sweep_artifact_dirs()
+        st.session_state["artifacts"] = SessionArtifacts(
+            ARTIFACT_DIR,
+            memory_bytes=ARTIFACT_MEMORY_MB * 1024 * 1024,
+            spill_bytes=ARTIFACT_SPILL_KB * 1024,
+            max_bytes=ARTIFACT_MAX_MB * 1024 * 1024,
+        )
+    return st.session_state["artifacts"]
+
+def show_session_artifacts_status():
+    """
+    Muestra cuánto ocupan los PDF y planillas generados en esta sesión.
+    """
+    stats = get_session_artifacts().stats()
+    if stats["entries"]:
+        st.caption(f"Archivos generados en esta sesión: {stats['entries']} "
+                   f"({stats['memory_bytes'] / 1024 / 1024:.1f} MB en memoria, "
+                   f"{stats['disk_bytes'] / 1024 / 1024:.1f} MB en disco, "
+                   f"{stats['evictions']} descartado(s)).")
+
+@st.cache_resource
+def sweep_artifact_dirs():
+    """
+    Borra (una vez por proceso) las carpetas de artefactos abandonadas.
+    """
+    return sweep_stale(ARTIFACT_DIR, max_age=ARTIFACT_STALE_HOURS * 3600)
+
+@st.cache_resource
+def get_fecha_index():
+    """
+    Devuelve el índice de candados ordenados por Fecha, compartido por el
+    proceso y mantenido por las escrituras del dataset.
+    """
+    index = SortedIndex("Fecha")
+    get_tables().dataset("candados").add_index(index)
+    return index
 
-def save_loto_excel(df):
+@st.cache_resource
+def get_filter_indexes():
     """
-    Guarda los datos de LOTO en un archivo Excel.
+    Devuelve los índices (valor -> candados) de las columnas filtrables del
+    dashboard, compartidos por el proceso y mantenidos por las escrituras.
     """
-    df.to_excel(EXCEL_FILE_LOTO, index=False)
+    dataset = get_tables().dataset("candados")
+    indexes = {}
+    for column in DASHBOARD_FILTERS:
+        indexes[column] = PostingIndex(column)
+        dataset.add_index(indexes[column])
+    return indexes
+
+@st.cache_resource
+def get_lock_counters():
+    """
+    Devuelve las métricas del dashboard (total, activos y alertas),
+    compartidas por el proceso y mantenidas por las escrituras del dataset.
+    """
+    counters = LockCounters(alert_threshold=ALERT_VALOR)
+    get_tables().dataset("candados").add_index(counters)
+    return counters
+
+@st.cache_resource
+def get_activity_rollups():
+    """
+    Devuelve los candados por día, semana y mes del gráfico de tendencia,
+    compartidos por el proceso y mantenidos por las escrituras del dataset.
+    """
+    rollups = ActivityRollups()
+    get_tables().dataset("candados").add_index(rollups)
+    return rollups
+
+@st.cache_resource
+def get_blob_store():
+    """
+    Devuelve el almacén de blobs (QR y PDF adjuntos) compartido por el proceso.
+    """
+    return BlobStore(BLOB_DIR, compress=BLOB_COMPRESS)
+
+def externalize_blobs(df):
+    """
+    Mueve las antiguas columnas de bytes (QR_Bytes, PDF_Adjunto) al almacén de
+    blobs y deja en su lugar las columnas con el hash (sin pisar los hashes
+    que ya estuvieran cargados).
+    """
+    blobs = get_blob_store()
+    for legacy_col, hash_col in LEGACY_BLOB_COLUMNS.items():
+        if legacy_col in df.columns:
+            hashes = df.pop(legacy_col).map(blobs.put_legacy)
+            if hash_col not in df.columns:
+                df[hash_col] = hashes
+            else:
+                missing = df[hash_col].isna() | (df[hash_col] == "")
+                df[hash_col] = df[hash_col].where(~missing, hashes)
+    return df
+
+@st.cache_resource
+def get_tables():
+    """
+    Devuelve el registro de tablas (LOTO y SIMOPS, más el itembook de sólo
+    lectura), compartido por todo el proceso. Cada tabla se abre y se carga la
+    primera vez que se pide.
+    """
+    return TableRegistry([
+        TableSpec("candados", LOTO_COLUMNS, EXCEL_FILE_LOTO, db_path=DB_FILE_LOTO,
+                  schema=LOTO_SCHEMA, indexes=LOTO_INDEXES, backend=LOTO_BACKEND,
+                  seed=lambda: prepopulate_loto(n=30), on_import=externalize_blobs,
+                  preload=LOTO_PRELOAD, legacy_columns=LEGACY_BLOB_COLUMNS),
+        TableSpec("simops", SIMOPS_COLUMNS, EXCEL_FILE_SIMOPS, db_path=DB_FILE_SIMOPS,
+                  schema=SIMOPS_SCHEMA, indexes=SIMOPS_INDEXES,
+                  seed=lambda: prepopulate_simops(n=5)),
+    ], references=[
+        ReferenceTable("itembook", EXCEL_FILE_ITEMBOOK, key="ItemID",
+                       columns=ITEMBOOK_COLUMNS, group_by=["Proyecto"],
+                       schema=ITEMBOOK_SCHEMA, transform=normalize_itembook,
+                       reader=get_excel_cache().read, header=ITEMBOOK_HEADER_ROW),
+    ], writer=get_writer(), compact_every=JOURNAL_COMPACT_EVERY,
+        compact_interval=JOURNAL_COMPACT_INTERVAL, reader=get_excel_cache().read,
+        changelog=get_changelog(), feed=get_change_feed())
+
+@st.cache_resource
+def get_changelog():
+    """
+    Devuelve el registro de cambios por fila (base de los respaldos incrementales).
+    """
+    return ChangeLog(CHANGELOG_FILE)
+
+@st.cache_resource
+def get_change_feed():
+    """
+    Devuelve el feed local de eventos de cambio (LOTO y SIMOPS).
+    """
+    return ChangeFeed(CDC_DIR, max_bytes=CDC_SEGMENT_MB * 1024 * 1024, keep_segments=CDC_KEEP_SEGMENTS)
+
+@st.cache_resource
+def get_backup_manager():
+    """
+    Devuelve el gestor de respaldos de LOTO y SIMOPS, compartido por el proceso.
+    """
+    tables = get_tables()
+    for name in BACKUP_TABLES:
+        tables.dataset(name)  # asegura la importación inicial antes del primer respaldo
+    sources = {name: (tables.store(name).load, tables.specs[name].columns) for name in BACKUP_TABLES}
+    return BackupManager(BACKUP_DIR, get_changelog(), sources,
+                         full_every=BACKUP_FULL_EVERY, keep_full=BACKUP_KEEP_FULL)
+
+@st.cache_resource
+def get_backup_job():
+    """
+    Arranca (una vez por proceso) los respaldos periódicos en segundo plano.
+    """
+    return PeriodicJob(get_backup_manager().run, BACKUP_INTERVAL)
+
+def show_backup_panel():
+    """
+    Panel de administración: estado de los respaldos y restauración de una
+    tabla a un instante anterior.
+    """
+    manager = get_backup_manager()
+    job = get_backup_job()
+    with st.expander("Respaldos y restauración"):
+        if job.last_error:
+            st.error(f"Último respaldo con error: {job.last_error}")
+        for name in BACKUP_TABLES:
+            info = manager.summary(name)
+            ultimo = info["last"].strftime("%Y-%m-%d %H:%M:%S") if info["last"] is not None else "nunca"
+            st.caption(f"**{name}**: {info['full']} completo(s), {info['segments']} incremental(es), "
+                       f"{info['bytes'] / 1024:.0f} KB, último cambio respaldado: {ultimo}")
+        if st.button("Respaldar ahora"):
+            get_writer().flush()
+            result = manager.run()
+            st.success("Respaldo realizado: " + ", ".join(f"{k}: {v}" for k, v in result.items()))
+
+        st.markdown("**Restaurar a un instante**")
+        name = st.selectbox("Tabla", BACKUP_TABLES, key="restore_table")
+        desde = manager.restorable_since(name)
+        if desde is None:
+            st.info("Todavía no hay respaldos de esta tabla.")
+            return
+        st.caption(f"Se puede restaurar a cualquier instante desde {desde:%Y-%m-%d %H:%M:%S}.")
+        c1, c2 = st.columns(2)
+        dia = c1.date_input("Fecha", value=date.today(), min_value=desde.date(), key="restore_date")
+        hora = c2.time_input("Hora", value=datetime.now().time().replace(microsecond=0), key="restore_time")
+        instante = datetime.combine(dia, hora)
+        if st.button("Vista previa"):
+            try:
+                st.session_state["restore_preview"] = (name, instante, manager.restore(name, instante))
+            except ValueError as e:
+                st.session_state["restore_preview"] = None
+                st.warning(str(e))
+        preview = st.session_state.get("restore_preview")
+        if not preview or preview[:2] != (name, instante):
+            return
+        restored = preview[2]
+        dataset = get_tables().dataset(name)
+        st.write(f"A las {instante:%Y-%m-%d %H:%M:%S} la tabla tenía {len(restored)} filas "
+                 f"(ahora tiene {len(dataset)}).")
+        st.dataframe(restored.head(50))
+        confirm = st.checkbox("Entiendo que se reemplazará la tabla completa", key="restore_confirm")
+        if st.button("Restaurar", disabled=not confirm):
+            dataset.replace(restored)
+            st.session_state["restore_preview"] = None
+            st.success(f"Tabla {name} restaurada al {instante:%Y-%m-%d %H:%M:%S}.")
+
+@st.cache_resource
+def get_loto_archive():
+    """
+    Devuelve el archivo particionado de candados inactivos antiguos.
+    """
+    return PartitionedArchive(ARCHIVE_DIR, "candados", LOTO_COLUMNS, granularity=ARCHIVE_PARTITION)
+
+def archive_inactive_locks(max_age_days=ARCHIVE_AFTER_DAYS):
+    """
+    Mueve al archivo los candados "Inactivo" cuya Fecha supera ``max_age_days``.
+    Primero se escriben en su partición y después se borran del conjunto activo.
+    Devuelve la cantidad de candados archivados.
+    """
+    dataset = get_tables().dataset("candados")
+    dataset.sync()  # ediciones de otros procesos
+    df = dataset.project(["Estado", "Fecha", "_version"])
+    cutoff = pd.Timestamp(date.today() - timedelta(days=max_age_days))
+
+    def archivable(rows):
+        return (rows["Estado"] == "Inactivo") & (rows["Fecha"] < cutoff)
+
+    old = df[archivable(df)]
+    if old.empty:
+        return 0
+    seen = old["_version"]
+
+    def unchanged(rows):
+        # Un candado reactivado o editado desde la lectura de arriba se deja
+        return archivable(rows) & (rows["_version"] == seen.reindex(rows.index))
+
+    # Las filas completas se leen, se revisan, se archivan y se borran con el
+    # lock del dataset tomado, y sólo para los candidatos
+    archived = dataset.delete_many(old.index, check=unchanged,
+                                   before_delete=get_loto_archive().archive)
+    return len(archived)
+
+@st.cache_resource
+def get_archive_job():
+    """
+    Arranca (una vez por proceso) la revisión periódica del archivo.
+    """
+    return PeriodicJob(archive_inactive_locks, ARCHIVE_CHECK_INTERVAL)
+
+def load_archived_locks(desde, hasta):
+    """
+    Carga del archivo los candados con Fecha entre ``desde`` y ``hasta``.
+    """
+    return apply_schema(get_loto_archive().load_range(desde, hasta), LOTO_SCHEMA)
+
+def format_fecha(value) -> str:
+    """
+    Formatea una fecha de la tabla (datetime64) como "YYYY-MM-DD".
+    """
+    if value is None or pd.isna(value):
+        return ""
+    return pd.Timestamp(value).strftime("%Y-%m-%d")
 
 def prepopulate_loto(n=30):
     """
@@ -1120,7 +1810,7 @@ def prepopulate_loto(n=30):
         fecha_rand = today - timedelta(days=days_back)
         estado = random.choice(["Activo", "Inactivo"])
         qr_str = f"NoCandado={candado_id}, Area={area}, Fecha={fecha_rand}"
-        qr_bytes = generate_qr_code(qr_str) if qr_str else None
+        qr_hash = get_blob_store().put(generate_qr_code(qr_str))
 
         rows.append({
             "ID": candado_id,
@@ -1138,50 +1828,29 @@ def prepopulate_loto(n=30):
             "Responsable": lider,
             "Estado": estado,
             "Valor": random.randint(0, 300),
-            "QR_Bytes": qr_bytes if isinstance(qr_bytes, bytes) else b"",  # Validación QR
-            "PDF_Adjunto": None
+            "QR_Hash": qr_hash,
+            "PDF_Hash": None
         })
     return pd.DataFrame(rows)
 
-def generate_itembook():
+def normalize_itembook(df):
     """
-    Genera datos de ejemplo para la sección de Precomisionado.
+    Adapta el Excel del itembook a las columnas de la app (ItemID, Proyecto,
+    Descripcion). Descarta las filas sin tag y conserva el resto de columnas.
     """
-    proyectos = ["Proyecto A"] * 20 + ["Proyecto B"] * 20
-    rows = []
-    for i in range(40):
-        item_id = f"ITM-{i+1:03d}"
-        desc = "Item Ejemplo " + "".join(random.choices(string.ascii_uppercase, k=2))
-        rows.append({"Proyecto": proyectos[i], "ItemID": item_id, "Descripcion": desc})
-    return pd.DataFrame(rows)
+    df = df.rename(columns=ITEMBOOK_RENAME)
+    for col in ITEMBOOK_COLUMNS:
+        if col not in df.columns:
+            df[col] = ""
+    df = df[df["ItemID"].notna()]
+    df["ItemID"] = df["ItemID"].astype(str).str.strip()
+    df["Proyecto"] = df["Proyecto"].astype(str).str.strip()
+    df[["Descripcion", "SUBSISTEMA"]] = df[["Descripcion", "SUBSISTEMA"]].fillna("")
+    return df
 
 # =============================================================================
 # NUEVAS UTILIDADES PARA SIMOPS
 # =============================================================================
-def load_simops_data():
-    """
-    Carga los datos de SIMOPS desde un archivo Excel, o genera datos de ejemplo si no existe.
-    """
-    if not os.path.exists(EXCEL_FILE_SIMOPS):
-        df = prepopulate_simops(n=5)
-        df.to_excel(EXCEL_FILE_SIMOPS, index=False)
-    else:
-        df = pd.read_excel(EXCEL_FILE_SIMOPS)
-        needed_cols = [
-            "SIMOPS_ID","Descripción","Área","PTWs_Involucrados","Fecha_Inicio",
-            "Fecha_Fin","Encargado","Estado","Riesgos","Acciones_Mitigación"
-        ]
-        for col in needed_cols:
-            if col not in df.columns:
-                df[col] = ""
-    return df
-
-def save_simops_data(df):
-    """
-    Guarda los datos de SIMOPS en un archivo Excel.
-    """
-    df.to_excel(EXCEL_FILE_SIMOPS, index=False)
-
 def prepopulate_simops(n=5):
     """
     Genera datos de ejemplo para SIMOPS.
@@ -15,6 +15,9 @@ import plotly.express as px
 import plotly.io as pio
 pio.kaleido.scope.default_format = "png"  # Para exportar a PNG con Plotly
 
+# Caché de proceso para los Excel ya parseados (ver excelcache.py)
+from excelcache import ExcelCache
+
 # --------------------------------------------------------------------------------
 # USUARIOS (demo)
 # --------------------------------------------------------------------------------
@@ -29,6 +32,14 @@ users_data = {
 # --------------------------------------------------------------------------------
 LOGO_PATH = "logo1.png"
 EXCEL_FILE_LOTO = "candados_data.xlsx"
+EXCEL_CACHE_MAX_MB = 64  # memoria máxima de la caché de Excel ya parseados
+
+@st.cache_resource
+def get_excel_cache():
+    """
+    Devuelve la caché de Excel ya parseados, compartida por todo el proceso.
+    """
+    return ExcelCache(max_bytes=EXCEL_CACHE_MAX_MB * 1024 * 1024)
 
 # --------------------------------------------------------------------------------
 # MAIN
@@ -318,7 +329,7 @@ def registrar_candado_dinamico():
 
     # Leemos la definición
     try:
-        df_form_def = pd.read_excel(form_excel)
+        df_form_def = get_excel_cache().read_upload(form_excel.getvalue())
     except Exception as e:
         st.error(f"Error leyendo el Excel: {e}")
         return
@@ -662,7 +673,7 @@ def run_document_form():
 
     # Intentamos leer el Excel
     try:
-        df_def = pd.read_excel(uploaded_file)
+        df_def = get_excel_cache().read_upload(uploaded_file.getvalue())
     except Exception as e:
         st.error(f"Error al leer el Excel: {e}")
         return
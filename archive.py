@@ -0,0 +1,113 @@
+"""
+Archivo particionado por tiempo para filas que ya no forman parte del
+conjunto "caliente" (p. ej. candados inactivos antiguos).
+
+Cada partición (un mes o un año) es una base SQLite propia dentro de la
+carpeta del archivo. Las particiones sólo se abren cuando un reporte o una
+búsqueda pide un rango de fechas que las cubre, así que el historial puede
+crecer sin que crezcan la carga inicial ni la memoria de las sesiones.
+"""
+import glob
+import os
+import threading
+import time
+
+import pandas as pd
+
+from storage import SQLiteTable
+
+
+class PartitionedArchive:
+    """
+    Archivo de una tabla partido por ``granularity`` (``"month"`` o ``"year"``)
+    según la columna de fecha ``date_column``. Conserva el ``rid`` original
+    de cada fila.
+    """
+
+    def __init__(self, root, table, columns, date_column="Fecha", granularity="month"):
+        if granularity not in ("month", "year"):
+            raise ValueError(f"Granularidad de archivo no soportada: {granularity}")
+        self.root = root
+        self.table = table
+        self.columns = list(columns)
+        self.date_column = date_column
+        self.freq = "M" if granularity == "month" else "Y"
+        self._tables = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{self.table}_{key}.db")
+
+    def _partition(self, key: str) -> SQLiteTable:
+        with self._lock:
+            if key not in self._tables:
+                self._tables[key] = SQLiteTable(
+                    self._path(key), self.table, self.columns, indexes=[self.date_column]
+                )
+            return self._tables[key]
+
+    def partitions(self) -> list:
+        """Claves de las particiones existentes (``"2024-05"`` o ``"2024"``), ordenadas."""
+        prefix = f"{self.table}_"
+        keys = []
+        for path in glob.glob(os.path.join(self.root, f"{prefix}*.db")):
+            keys.append(os.path.basename(path)[len(prefix):-len(".db")])
+        return sorted(keys)
+
+    def archive(self, df: pd.DataFrame) -> int:
+        """
+        Guarda las filas de ``df`` (indexado por ``rid``) en sus particiones.
+        Es idempotente: volver a archivar una fila la reemplaza.
+        """
+        fechas = pd.to_datetime(df[self.date_column], errors="coerce")
+        periods = fechas.dt.to_period(self.freq).astype(str)
+        for key, rows in df.groupby(periods):
+            self._partition(key).insert_many(rows, keep_rid=True)
+        return len(df)
+
+    def load_range(self, start, end) -> pd.DataFrame:
+        """
+        Devuelve las filas archivadas con fecha entre ``start`` y ``end``
+        (inclusive). Sólo abre las particiones que se solapan con el rango.
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        frames = []
+        for key in self.partitions():
+            if key == "NaT":
+                continue
+            period = pd.Period(key, freq=self.freq)
+            if period.end_time < start or period.start_time > end:
+                continue
+            df = self._partition(key).load()
+            fechas = pd.to_datetime(df[self.date_column], errors="coerce")
+            frames.append(df[(fechas >= start) & (fechas <= end)])
+        if not frames:
+            return pd.DataFrame(columns=self.columns)
+        return pd.concat(frames)
+
+
+class PeriodicJob:
+    """
+    Ejecuta ``fn`` en un hilo en segundo plano cada ``interval`` segundos
+    (la primera vez, al arrancar). Los errores se guardan en ``last_error``.
+    """
+
+    def __init__(self, fn, interval):
+        self.fn = fn
+        self.interval = interval
+        self.last_run = None
+        self.last_result = None
+        self.last_error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.last_result = self.fn()
+                self.last_error = None
+            except Exception as exc:
+                self.last_error = str(exc)
+            self.last_run = time.time()
+            time.sleep(self.interval)
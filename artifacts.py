@@ -0,0 +1,169 @@
+"""
+Artefactos generados por sesión (tarjetas y reportes PDF, planillas).
+
+Guardar los ``bytes`` directamente en ``st.session_state`` los mantiene en
+memoria mientras dure la sesión, y a lo largo de un turno eso suma cientos de
+MB por proceso. ``SessionArtifacts`` los guarda con un presupuesto: los
+grandes (y los que no entran en memoria) se vuelcan a archivos temporales,
+los menos usados se descartan al superar el total y la carpeta de la sesión
+se borra cuando la sesión termina (cuando Streamlit descarta su estado) o al
+cerrar el proceso.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+DIR_PREFIX = "sesion-"
+
+
+def sweep_stale(root, max_age=24 * 3600) -> int:
+    """
+    Borra las carpetas de sesión de ``root`` sin cambios hace más de
+    ``max_age`` segundos (restos de procesos que terminaron mal). Devuelve
+    cuántas borró.
+    """
+    if not os.path.isdir(root):
+        return 0
+    removed = 0
+    cutoff = time.time() - max_age
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if name.startswith(DIR_PREFIX) and os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+class SessionArtifacts:
+    """
+    Caché LRU de ``bytes`` de una sesión.
+
+    Los artefactos de ``spill_bytes`` o más van directo a disco; los demás
+    quedan en memoria mientras no superen ``memory_bytes`` en total (si no,
+    se vuelcan a disco los menos usados). Si memoria más disco superan
+    ``max_bytes`` se descartan los menos usados: quien los pida de nuevo
+    recibe ``None`` y debe regenerarlos.
+    """
+
+    def __init__(self, root=None, memory_bytes=16 * 1024 * 1024, spill_bytes=256 * 1024,
+                 max_bytes=128 * 1024 * 1024):
+        self.root = root or os.path.join(tempfile.gettempdir(), "candapp-artefactos")
+        self.memory_bytes = memory_bytes
+        self.spill_bytes = spill_bytes
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._entries = OrderedDict()  # clave -> (bytes o None, ruta o None, tamaño)
+        self._memory = 0
+        self._total = 0
+        self._dir = None
+        self._lock = threading.Lock()
+        self._finalizer = None
+
+    def put(self, key, data: bytes) -> None:
+        """Guarda ``data`` con clave ``key`` (reemplaza la anterior)."""
+        data = bytes(data)
+        with self._lock:
+            self._remove(key)
+            size = len(data)
+            if size > self.max_bytes:
+                return  # no entra ni sola: no se guarda
+            if size >= self.spill_bytes:
+                self._entries[key] = (None, self._spill(data), size)
+            else:
+                self._entries[key] = (data, None, size)
+                self._memory += size
+            self._total += size
+            self._enforce()
+
+    def get(self, key):
+        """``bytes`` guardados con ``key`` o ``None`` si no existen (o se descartaron)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            data, path, _ = entry
+            if data is not None:
+                return data
+        try:
+            with open(path, "rb") as fh:
+                return fh.read()
+        except FileNotFoundError:
+            return None
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def discard(self, key) -> None:
+        """Descarta el artefacto ``key`` si existe."""
+        with self._lock:
+            self._remove(key)
+
+    def clear(self) -> None:
+        """Descarta todo y borra la carpeta de la sesión."""
+        with self._lock:
+            self._entries.clear()
+            self._memory = self._total = 0
+            if self._finalizer is not None:
+                self._finalizer()  # borra la carpeta (una sola vez)
+                self._finalizer = None
+                self._dir = None
+
+    def stats(self) -> dict:
+        """Ocupación actual en memoria y en disco."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "memory_bytes": self._memory,
+                "disk_bytes": self._total - self._memory,
+                "evictions": self.evictions,
+            }
+
+    def _folder(self) -> str:
+        if self._dir is None or not os.path.isdir(self._dir):
+            # (la carpeta pudo haberla borrado sweep_stale en una sesión muy larga)
+            if self._finalizer is not None:
+                self._finalizer.detach()
+            os.makedirs(self.root, exist_ok=True)
+            self._dir = tempfile.mkdtemp(prefix=DIR_PREFIX, dir=self.root)
+            # Cuando la sesión termina su estado se descarta y con él esta caché
+            self._finalizer = weakref.finalize(self, shutil.rmtree, self._dir, True)
+        return self._dir
+
+    def _spill(self, data: bytes) -> str:
+        fd, path = tempfile.mkstemp(dir=self._folder())
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        return path
+
+    def _remove(self, key) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        data, path, size = entry
+        self._total -= size
+        if data is not None:
+            self._memory -= size
+        if path is not None:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _enforce(self) -> None:
+        # Primero se vuelca a disco lo menos usado; después se descarta
+        for key in list(self._entries):
+            if self._memory <= self.memory_bytes:
+                break
+            data, path, size = self._entries[key]
+            if data is not None:
+                self._entries[key] = (None, self._spill(data), size)
+                self._memory -= size
+        while self._total > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
@@ -0,0 +1,223 @@
+"""
+Respaldos incrementales y restauración a un instante (point-in-time).
+
+Por cada dataset se guarda, dentro de ``root/<dataset>/``:
+
+- respaldos completos (``base-*.jsonl.gz``): todas las filas, tomados cada
+  ``full_every`` segundos;
+- segmentos incrementales (``seg-*.jsonl.gz``): las entradas del
+  :class:`~changelog.ChangeLog` desde el respaldo anterior, que sólo ocupan
+  lo que cambió;
+- ``manifest.json`` con la secuencia y la hora de cada archivo.
+
+Restaurar a un instante ``T`` es cargar el último completo anterior a ``T``
+y reaplicar en orden los cambios (segmentos y registro vivo) hasta ``T``.
+"""
+import glob
+import gzip
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+from changelog import decode_row, encode_row
+
+
+class BackupManager:
+    """
+    Respaldo de los datasets de ``sources`` (``nombre -> (load, columns)``,
+    donde ``load()`` devuelve la tabla persistida indexada por ``rid``).
+    Se conservan los últimos ``keep_full`` respaldos completos y los
+    segmentos posteriores al más antiguo de ellos.
+    """
+
+    def __init__(self, root, changelog, sources, full_every=24 * 3600, keep_full=7):
+        self.root = root
+        self.changelog = changelog
+        self.sources = dict(sources)
+        self.full_every = full_every
+        self.keep_full = keep_full
+        self.last_run = None
+        self._lock = threading.Lock()
+        for name in self.sources:
+            os.makedirs(os.path.join(root, name), exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Respaldo
+    # ------------------------------------------------------------------
+    def run(self) -> dict:
+        """Respalda todos los datasets; devuelve ``nombre -> entradas respaldadas``."""
+        result = {name: self.backup(name) for name in self.sources}
+        self.last_run = time.time()
+        return result
+
+    def backup(self, name) -> int:
+        """
+        Respaldo incremental de ``name`` (o completo si no hay ninguno o el
+        último tiene más de ``full_every`` segundos). Devuelve la cantidad de
+        entradas (o filas, si fue completo) guardadas.
+        """
+        with self._lock:
+            manifest = self._manifest(name)
+            bases = manifest["bases"]
+            if not bases or time.time() - bases[-1]["ts"] >= self.full_every:
+                return self._full(name, manifest)
+            return self._segment(name, manifest)
+
+    def full(self, name) -> int:
+        """Fuerza un respaldo completo de ``name``."""
+        with self._lock:
+            return self._full(name, self._manifest(name))
+
+    def _segment(self, name, manifest) -> int:
+        entries = self.changelog.since(name, self._last_seq(manifest))
+        if not entries:
+            return 0
+        first, last = entries[0]["seq"], entries[-1]["seq"]
+        filename = f"seg-{first:012d}-{last:012d}.jsonl.gz"
+        self._write_lines(name, filename, (
+            {"seq": e["seq"], "ts": e["ts"], "op": e["op"], "rid": e["rid"], "row": encode_row(e["row"])}
+            for e in entries
+        ))
+        manifest["segments"].append({
+            "file": filename, "from_seq": first, "to_seq": last,
+            "first_ts": entries[0]["ts"], "last_ts": entries[-1]["ts"],
+        })
+        self._save_manifest(name, manifest)
+        self.changelog.prune(name, last)
+        return len(entries)
+
+    def _full(self, name, manifest) -> int:
+        # Primero se guardan los cambios pendientes, así el registro puede
+        # podarse sin perder instantes restaurables.
+        self._segment(name, manifest)
+        seq = self.changelog.last_seq(name)  # antes de leer: reaplicar de más es inocuo
+        load, _ = self.sources[name]
+        df = load()
+        ts = time.time()
+        filename = f"base-{seq:012d}-{int(ts)}.jsonl.gz"
+        self._write_lines(name, filename, (
+            {"rid": int(rid), "row": encode_row(row)}
+            for rid, row in zip(df.index, df.to_dict("records"))
+        ))
+        manifest["bases"].append({"file": filename, "seq": seq, "ts": ts, "rows": len(df)})
+        self._apply_retention(name, manifest)
+        self._save_manifest(name, manifest)
+        self.changelog.prune(name, seq)
+        return len(df)
+
+    def _apply_retention(self, name, manifest) -> None:
+        bases = manifest["bases"]
+        if len(bases) <= self.keep_full:
+            return
+        dropped, manifest["bases"] = bases[:-self.keep_full], bases[-self.keep_full:]
+        oldest_seq = manifest["bases"][0]["seq"]
+        kept = [s for s in manifest["segments"] if s["to_seq"] > oldest_seq]
+        dropped += [s for s in manifest["segments"] if s["to_seq"] <= oldest_seq]
+        manifest["segments"] = kept
+        for entry in dropped:
+            path = os.path.join(self.root, name, entry["file"])
+            if os.path.exists(path):
+                os.remove(path)
+
+    # ------------------------------------------------------------------
+    # Restauración
+    # ------------------------------------------------------------------
+    def restorable_since(self, name):
+        """Primer instante restaurable de ``name`` (``pd.Timestamp``) o ``None``."""
+        bases = self._manifest(name)["bases"]
+        if not bases:
+            return None
+        return pd.Timestamp.fromtimestamp(bases[0]["ts"])
+
+    def restore(self, name, when) -> pd.DataFrame:
+        """
+        Devuelve ``name`` tal como estaba en el instante ``when`` (hora
+        local), indexado por ``rid``. No modifica el dataset: el llamador
+        decide si lo reemplaza.
+        """
+        until = when if isinstance(when, (int, float)) else pd.Timestamp(when).to_pydatetime().timestamp()
+        manifest = self._manifest(name)
+        candidates = [b for b in manifest["bases"] if b["ts"] <= until]
+        if not candidates:
+            raise ValueError(f"No hay un respaldo completo de '{name}' anterior a {when}")
+        base = candidates[-1]
+        rows = {}
+        for record in self._read_lines(name, base["file"]):
+            rows[record["rid"]] = decode_row(record["row"])
+
+        seq = base["seq"]
+        for segment in manifest["segments"]:
+            if segment["to_seq"] <= seq or segment["first_ts"] > until:
+                continue
+            for record in self._read_lines(name, segment["file"]):
+                if record["seq"] > seq and record["ts"] <= until:
+                    self._replay(rows, record["op"], record["rid"], decode_row(record["row"]))
+                    seq = record["seq"]
+        for entry in self.changelog.since(name, max(seq, self._last_seq(manifest)), until=until):
+            self._replay(rows, entry["op"], entry["rid"], entry["row"])
+
+        _, columns = self.sources[name]
+        rids = sorted(rows)
+        return pd.DataFrame.from_records([rows[r] for r in rids], index=rids, columns=columns)
+
+    @staticmethod
+    def _replay(rows, op, rid, row) -> None:
+        if op == "delete":
+            rows.pop(rid, None)
+        else:
+            rows.setdefault(rid, {}).update(row or {})
+
+    # ------------------------------------------------------------------
+    # Archivos
+    # ------------------------------------------------------------------
+    def summary(self, name) -> dict:
+        """Cantidad y tamaño de los respaldos de ``name`` y hora del último."""
+        manifest = self._manifest(name)
+        files = glob.glob(os.path.join(self.root, name, "*.jsonl.gz"))
+        times = [b["ts"] for b in manifest["bases"]] + [s["last_ts"] for s in manifest["segments"]]
+        return {
+            "full": len(manifest["bases"]),
+            "segments": len(manifest["segments"]),
+            "bytes": sum(os.path.getsize(f) for f in files),
+            "last": pd.Timestamp.fromtimestamp(max(times)) if times else None,
+        }
+
+    @staticmethod
+    def _last_seq(manifest) -> int:
+        seqs = [b["seq"] for b in manifest["bases"]] + [s["to_seq"] for s in manifest["segments"]]
+        return max(seqs, default=0)
+
+    def _manifest_path(self, name) -> str:
+        return os.path.join(self.root, name, "manifest.json")
+
+    def _manifest(self, name) -> dict:
+        path = self._manifest_path(name)
+        if not os.path.exists(path):
+            return {"bases": [], "segments": []}
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+
+    def _save_manifest(self, name, manifest) -> None:
+        path = self._manifest_path(name)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh, indent=1)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+
+    def _write_lines(self, name, filename, records) -> None:
+        path = os.path.join(self.root, name, filename)
+        tmp = path + ".tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as fh:
+            for record in records:
+                fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp, path)
+
+    def _read_lines(self, name, filename):
+        with gzip.open(os.path.join(self.root, name, filename), "rt", encoding="utf-8") as fh:
+            for line in fh:
+                yield json.loads(line)
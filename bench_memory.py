@@ -0,0 +1,148 @@
+"""
+Benchmark de memoria: copias de la tabla en los caminos calientes frente a
+proyecciones sin copia y altas sobre ``FrameBuffer``.
+
+Para una tabla LOTO sintética de 50k filas simula lo que hace cada rerun del
+dashboard y de "Editar o Borrar Candados" más una tanda de altas, con el
+código anterior (``df.copy()``, ``df[[...]]`` y ``pd.concat`` de una fila
+por alta) y con el actual (``project`` y ``FrameBuffer.append``). Cada
+escenario corre en un proceso propio y se informa el pico de RSS.
+
+Uso: python bench_memory.py [--rows 50000] [--inserts 500]
+"""
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import sys
+import tempfile
+
+import pandas as pd
+
+from bench_snapshot import synthetic_loto
+from dataset import FrameBuffer
+from schema import apply_schema
+
+SCHEMA = {
+    "Fecha": "datetime64[ns]",
+    "Valor": "int64",
+    "Estado": "category",
+    "Area": "category",
+    "KKS": "category",
+    "EjecPorCargo": "category",
+}
+DASHBOARD_COLUMNS = ["NoCandado", "Area", "Estado", "Fecha", "Valor"]
+RERUNS = 5
+
+
+def reset_peak() -> None:
+    """Reinicia el pico de RSS del proceso (Linux); en otros sistemas no hace nada."""
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KiB; macOS, bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def concat_rows(df: pd.DataFrame, new: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    """
+    Alta como la hacía el código anterior: ``pd.concat`` de la tabla con la
+    fila nueva (las categorías se unifican antes para no perder el dtype).
+    """
+    new = apply_schema(new.reindex(columns=df.columns), schema)
+    for col, dtype in schema.items():
+        if dtype == "category" and col in df.columns:
+            categories = df[col].cat.categories
+            missing = [v for v in pd.unique(new[col].dropna()) if v not in categories]
+            if missing:
+                df[col] = df[col].cat.add_categories(missing)
+            new[col] = new[col].astype(df[col].dtype)
+    return pd.concat([df, new])
+
+
+def new_row(df: pd.DataFrame, i: int) -> dict:
+    row = df.iloc[i % len(df)].to_dict()
+    row["NoCandado"] = f"NEW-{i:06d}"
+    return row
+
+
+def run_before(df: pd.DataFrame, inserts: int) -> None:
+    for _ in range(RERUNS):
+        # dashboard: copia completa para el gráfico y orden de la tabla entera
+        df_plot = df.copy()
+        df_plot["Fecha"] = pd.to_datetime(df_plot["Fecha"])
+        activos = df_plot[df_plot["Estado"] == "Activo"]
+        activos.groupby(activos["Fecha"].dt.date).size()
+        df.sort_values("Fecha", ascending=False).head(20)
+        # editar/borrar: copia de las columnas del selector
+        df_display = df[["NoCandado", "Area", "Estado", "Fecha"]].reset_index(drop=True)
+        df_display.loc[0, "NoCandado"]
+    for i in range(inserts):
+        one = pd.DataFrame([new_row(df, i)], index=[len(df) + 1])
+        df = concat_rows(df, one, SCHEMA)
+
+
+def run_after(buf: FrameBuffer, inserts: int) -> None:
+    for _ in range(RERUNS):
+        view = buf.project(DASHBOARD_COLUMNS)
+        activos = view[view["Estado"] == "Activo"]
+        activos.groupby(activos["Fecha"].dt.date).size()
+        view.sort_values("Fecha", ascending=False).head(20)
+        labels = buf.project(["NoCandado", "Area"])
+        labels.iat[0, 0]
+    for i in range(inserts):
+        one = pd.DataFrame([new_row(buf.view, i)], index=[len(buf) + 1]).reindex(columns=buf.columns)
+        buf.append(apply_schema(one, SCHEMA))
+
+
+def scenario(name, path, inserts, out) -> None:
+    data = pd.read_pickle(path)
+    if name != "antes":
+        data = FrameBuffer(data)  # se arma una vez al iniciar el proceso, no por rerun
+    reset_peak()
+    base = peak_rss_mb()
+    (run_before if name == "antes" else run_after)(data, inserts)
+    out.put((name, base, peak_rss_mb()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pico de RSS de los caminos calientes.")
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--inserts", type=int, default=500)
+    args = parser.parse_args()
+
+    df = apply_schema(synthetic_loto(args.rows), SCHEMA)
+    df.index = range(1, len(df) + 1)
+    size_mb = df.memory_usage(index=True, deep=True).sum() / (1024 * 1024)
+
+    ctx = mp.get_context("spawn")  # procesos limpios: el pico no hereda memoria del padre
+    out = ctx.Queue()
+    print(f"{args.rows} filas ({size_mb:.1f} MB en memoria), {RERUNS} reruns, {args.inserts} altas")
+    print(f"{'escenario':>10} | {'tras cargar (MB)':>16} | {'pico (MB)':>9} | {'extra (MB)':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "candados.pkl")
+        df.to_pickle(path)
+        del df
+        for name in ("antes", "después"):
+            proc = ctx.Process(target=scenario, args=(name, path, args.inserts, out))
+            proc.start()
+            _, base, peak = out.get()
+            proc.join()
+            print(f"{name:>10} | {base:>16.1f} | {peak:>9.1f} | {peak - base:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark de carga: pd.read_excel frente al snapshot columnar (memory-map).
+
+Genera tablas LOTO sintéticas de 1k, 10k y 100k filas en una carpeta temporal
+y mide el tiempo de lectura de cada formato.
+
+Uso: python bench_snapshot.py
+"""
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+from snapshot import read_snapshot, write_snapshot
+
+SIZES = [1_000, 10_000, 100_000]
+
+
+def synthetic_loto(n: int) -> pd.DataFrame:
+    """Tabla de candados sintética con las columnas de la app."""
+    today = date.today()
+    rows = []
+    for i in range(n):
+        rows.append({
+            "NoCandado": f"BAN-{i:06d}",
+            "Area": random.choice(["SHELTER LV", "Sala Compresores", "Tanques", "Area Baterías"]),
+            "TableroEquipo": random.choice(["UPS", "UPS DISTRIBUTION BOARD", "Q74", "Q43"]),
+            "KKS": random.choice(["Q73", "Q74", "Q43", "Q99"]),
+            "TipoBloqueo": f"CANDADO {i}",
+            "LiderAutorizador": random.choice(["Monsu Ariel", "Avecilla Miguel"]),
+            "EjecPorNombre": random.choice(["Perez Martin", "Sanchez Pedro"]),
+            "EjecPorCargo": random.choice(["Supervisor", "Operador", "Técnico"]),
+            "N_PTW": str(random.randint(1, 999)),
+            "QR_Hash": f"{random.getrandbits(256):064x}",
+            "PDF_Hash": None,
+            "Valor": random.randint(0, 300),
+            "Estado": random.choice(["Activo", "Inactivo"]),
+            "Descripción": f"Descripción {i}",
+            "Responsable": "Monsu Ariel",
+            "Fecha": str(today - timedelta(days=random.randint(0, 3650))),
+            "ID": f"BAN-{i:06d}",
+        })
+    return pd.DataFrame(rows)
+
+
+def timed(fn, repeat=3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'filas':>8} | {'read_excel (s)':>14} | {'snapshot (s)':>12} | {'mejora':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in SIZES:
+            path = os.path.join(tmp, f"candados_{n}.xlsx")
+            df = synthetic_loto(n)
+            df.to_excel(path, index=False)
+            write_snapshot(df, path)
+            t_excel = timed(lambda: pd.read_excel(path), repeat=1 if n >= 100_000 else 3)
+            t_snap = timed(lambda: read_snapshot(path))
+            print(f"{n:>8} | {t_excel:>14.3f} | {t_snap:>12.4f} | {t_excel / t_snap:>6.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Almacén de blobs direccionado por contenido.
+
+Los bytes (QR en PNG, PDF adjuntos) se guardan en disco bajo su hash SHA-256,
+de modo que las tablas sólo guardan el hash. Contenidos idénticos se guardan
+una única vez y, opcionalmente, se comprimen con zlib.
+"""
+import ast
+import hashlib
+import os
+import tempfile
+import zlib
+
+
+class BlobStore:
+    """
+    Guarda y recupera blobs por su hash SHA-256.
+
+    Los archivos se reparten en subcarpetas por los dos primeros caracteres del
+    hash. Con ``compress=True`` se guarda la versión zlib (sufijo ``.z``) sólo
+    si realmente ocupa menos que el original.
+    """
+
+    def __init__(self, root, compress=False, level=6):
+        self.root = root
+        self.compress = compress
+        self.level = level
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def put(self, data) -> str:
+        """
+        Guarda ``data`` y devuelve su hash. Si el contenido ya existe no se
+        vuelve a escribir.
+        """
+        data = bytes(data)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        if os.path.exists(path) or os.path.exists(path + ".z"):
+            return digest
+        payload, suffix = data, ""
+        if self.compress:
+            packed = zlib.compress(data, self.level)
+            if len(packed) < len(data):
+                payload, suffix = packed, ".z"
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(payload)
+        os.replace(tmp_path, path + suffix)
+        return digest
+
+    def get(self, digest):
+        """
+        Devuelve los bytes del blob ``digest``, o ``None`` si no existe
+        (o si ``digest`` está vacío).
+        """
+        if not isinstance(digest, str) or not digest:
+            return None
+        path = self._path(digest)
+        if os.path.exists(path):
+            with open(path, "rb") as fh:
+                return fh.read()
+        if os.path.exists(path + ".z"):
+            with open(path + ".z", "rb") as fh:
+                return zlib.decompress(fh.read())
+        return None
+
+    def put_legacy(self, value):
+        """
+        Migra un valor de las antiguas columnas de bytes: acepta bytes o su
+        representación en texto (``"b'...'"``, como quedaban en el Excel).
+        Devuelve el hash o ``None`` si no hay contenido.
+        """
+        if isinstance(value, str) and value.startswith(("b'", 'b"')):
+            try:
+                value = ast.literal_eval(value)
+            except (ValueError, SyntaxError):
+                return None
+        if isinstance(value, (bytes, bytearray)) and value:
+            return self.put(value)
+        return None
@@ -0,0 +1,129 @@
+"""
+Importación masiva de inventarios de candados desde Excel o CSV.
+
+El archivo se lee por bloques (openpyxl en modo read-only o ``read_csv`` con
+``chunksize``) y cada bloque se valida con operaciones vectorizadas, así la
+memoria depende del tamaño de bloque y no del tamaño del archivo.
+"""
+import codecs
+import os
+
+import pandas as pd
+from openpyxl import load_workbook
+
+ESTADOS_VALIDOS = ("Activo", "Inactivo")
+# UTF-8 (con o sin BOM) y, si no, lo que guarda Excel en Windows en español
+CSV_ENCODINGS = ("utf-8-sig", "cp1252", "latin-1")
+
+
+class ImportValidationError(Exception):
+    """El archivo tiene filas inválidas y se pidió importar todo o nada."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__(f"{len(self.errors)} fila(s) inválida(s)")
+
+
+def iter_chunks(file, filename: str, chunk_size=1000):
+    """
+    Recorre ``file`` (ruta o archivo subido) en DataFrames de hasta
+    ``chunk_size`` filas. El índice de cada bloque es el número de fila de
+    datos (0 = primera fila bajo el encabezado).
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == ".csv":
+        encoding = csv_encoding(file)
+        yield from pd.read_csv(file, chunksize=chunk_size, dtype=object, encoding=encoding)
+        return
+
+    wb = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(c).strip() if c is not None else f"col_{i}" for i, c in enumerate(header)]
+        buffer, start = [], 0
+        for values in rows:
+            buffer.append(values)
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame(buffer, columns=columns, index=range(start, start + len(buffer)))
+                start += len(buffer)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns, index=range(start, start + len(buffer)))
+    finally:
+        wb.close()
+
+
+def csv_encoding(file, block_size=1 << 20) -> str:
+    """
+    Primera codificación de ``CSV_ENCODINGS`` que decodifica ``file`` (ruta o
+    archivo con ``seek``) completo. Se lee por bloques con un decodificador
+    incremental, así no hace falta tener el archivo en memoria.
+    """
+    for encoding in CSV_ENCODINGS:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        fh = open(file, "rb") if isinstance(file, (str, os.PathLike)) else file
+        try:
+            fh.seek(0)
+            while True:
+                block = fh.read(block_size)
+                decoder.decode(block, final=not block)
+                if not block:
+                    return encoding
+        except UnicodeDecodeError:
+            continue
+        finally:
+            if fh is file:
+                fh.seek(0)
+            else:
+                fh.close()
+    return CSV_ENCODINGS[-1]
+
+
+def validate_chunk(df: pd.DataFrame, columns, required=("NoCandado",)):
+    """
+    Valida un bloque contra las columnas LOTO. Devuelve ``(validas, errores)``:
+    las filas válidas ya normalizadas (sólo columnas conocidas, Estado por
+    defecto "Activo", Fecha por defecto hoy) y una lista de
+    ``(fila_excel, mensaje)``.
+    """
+    missing = [c for c in required if c not in df.columns]
+    if missing:
+        raise ImportValidationError([(1, f"Faltan columnas obligatorias: {', '.join(missing)}")])
+
+    df = df.reindex(columns=[c for c in columns if c in df.columns])
+    problems = pd.Series("", index=df.index)
+
+    def flag(mask, message):
+        nonlocal problems
+        problems = problems.mask(mask & (problems == ""), message)
+
+    for col in required:
+        text = df[col].astype("string").str.strip()
+        flag(text.isna() | (text == ""), f"{col} vacío")
+
+    if "Fecha" in df.columns:
+        fechas = pd.to_datetime(df["Fecha"], errors="coerce")
+        flag(df["Fecha"].notna() & fechas.isna(), "Fecha inválida")
+        df["Fecha"] = fechas.fillna(pd.Timestamp.today().normalize())
+    else:
+        df["Fecha"] = pd.Timestamp.today().normalize()
+
+    if "Valor" in df.columns:
+        valores = pd.to_numeric(df["Valor"], errors="coerce")
+        flag((df["Valor"].notna() & valores.isna()) | (valores < 0), "Valor inválido")
+        df["Valor"] = valores.fillna(0)
+
+    if "Estado" in df.columns:
+        estado = df["Estado"].fillna("Activo").astype(str).str.strip().str.capitalize()
+        flag(~estado.isin(ESTADOS_VALIDOS), "Estado debe ser Activo o Inactivo")
+        df["Estado"] = estado
+    else:
+        df["Estado"] = "Activo"
+
+    bad = problems != ""
+    # +2: una fila por el encabezado y otra porque Excel numera desde 1
+    errors = list(zip((df.index[bad] + 2).tolist(), problems[bad].tolist()))
+    return df[~bad], errors
@@ -0,0 +1,187 @@
+"""
+Feed local de cambios (change data capture) de LOTO y SIMOPS.
+
+Cada alta, edición o borrado que persiste un ``SharedDataset`` se publica
+como un evento JSON de una línea en archivos de sólo anexado dentro de
+``root``. Otras herramientas locales (impresión del relevo de turno,
+tablero de candados) leen sólo los eventos nuevos desde su cursor en lugar
+de releer el libro completo.
+
+Un evento es ``{"ts", "table", "op", "rid", "data"}`` con ``op`` ``"insert"``
+(``data`` = fila completa), ``"update"`` (sólo las columnas cambiadas) o
+``"delete"`` (sin ``data``). El cursor es un texto ``"segmento:offset"``
+que el consumidor guarda para retomar donde quedó.
+
+Uso como consumidor::
+
+    python cdc.py --cursor-file relevo.cursor
+"""
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+
+from storage import _encode_journal_value, file_lock
+
+OPS = {"insert": "insert", "upsert": "update", "delete": "delete"}
+
+
+class ChangeFeed:
+    """
+    Feed de eventos en segmentos ``<prefix>-NNNNNN.jsonl``. Al superar
+    ``max_bytes`` se abre un segmento nuevo y se conservan los últimos
+    ``keep_segments``. Varios procesos pueden publicar a la vez (anexado
+    bajo ``file_lock``).
+    """
+
+    def __init__(self, root, prefix="eventos", max_bytes=16 * 1024 * 1024, keep_segments=10):
+        self.root = root
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.keep_segments = keep_segments
+        self._lock = threading.Lock()
+        self._lock_path = os.path.join(root, prefix)
+        os.makedirs(root, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Publicación
+    # ------------------------------------------------------------------
+    def record_many(self, dataset, entries) -> None:
+        """
+        Publica cambios ``(op, rid, row)`` de ``dataset`` (misma interfaz que
+        ``ChangeLog.record_many``).
+        """
+        now = round(time.time(), 3)
+        lines = []
+        for op, rid, row in entries:
+            event = {"ts": now, "table": dataset, "op": OPS.get(op, op), "rid": int(rid)}
+            if row is not None and op != "delete":
+                event["data"] = {c: _encode_journal_value(v) for c, v in row.items()}
+            lines.append(json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n")
+        if not lines:
+            return
+        payload = "".join(lines).encode("utf-8")
+        with self._lock, file_lock(self._lock_path):
+            segments = self._segments()
+            current = segments[-1] if segments else 1
+            path = self._path(current)
+            if os.path.exists(path) and os.path.getsize(path) >= self.max_bytes:
+                current += 1
+                path = self._path(current)
+                segments.append(current)
+                for old in segments[:-self.keep_segments]:
+                    os.remove(self._path(old))
+            # Un único write en modo anexado: los lectores nunca ven un evento a medias
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, payload)
+            finally:
+                os.close(fd)
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+    def start_cursor(self) -> str:
+        """Cursor al primer evento disponible."""
+        segments = self._segments()
+        return f"{segments[0] if segments else 1}:0"
+
+    def end_cursor(self) -> str:
+        """Cursor al final del feed (sólo eventos futuros)."""
+        segments = self._segments()
+        if not segments:
+            return "1:0"
+        return f"{segments[-1]}:{os.path.getsize(self._path(segments[-1]))}"
+
+    def read(self, cursor=None, limit=1000):
+        """
+        Devuelve ``(eventos, cursor)``: hasta ``limit`` eventos desde
+        ``cursor`` (por defecto, desde el principio) y el cursor para la
+        próxima lectura. Si el segmento del cursor ya se descartó se sigue
+        desde el más antiguo disponible.
+        """
+        segment, offset = self._parse(cursor or self.start_cursor())
+        segments = self._segments()
+        if segments and segment < segments[0]:
+            segment, offset = segments[0], 0
+        events = []
+        while len(events) < limit:
+            path = self._path(segment)
+            if os.path.exists(path):
+                with open(path, "rb") as fh:
+                    fh.seek(offset)
+                    for line in fh:
+                        if not line.endswith(b"\n"):
+                            break  # evento todavía escribiéndose
+                        offset += len(line)
+                        events.append(json.loads(line))
+                        if len(events) >= limit:
+                            break
+            newer = [s for s in segments if s > segment]
+            if len(events) >= limit or not newer:
+                break
+            segment, offset = newer[0], 0
+        return events, f"{segment}:{offset}"
+
+    def tail(self, cursor=None, interval=1.0):
+        """Genera ``(evento, cursor)`` indefinidamente, esperando eventos nuevos."""
+        cursor = cursor or self.start_cursor()
+        while True:
+            events, new_cursor = self.read(cursor)
+            if not events:
+                time.sleep(interval)
+                continue
+            # Dentro de un lote se informa el cursor del inicio del lote: quien
+            # retome desde ahí vuelve a recibir esos eventos (al menos una vez).
+            for event in events[:-1]:
+                yield event, cursor
+            cursor = new_cursor
+            yield events[-1], cursor
+
+    def _segments(self) -> list:
+        pattern = os.path.join(self.root, f"{self.prefix}-*.jsonl")
+        numbers = []
+        for path in glob.glob(pattern):
+            stem = os.path.basename(path)[len(self.prefix) + 1:-len(".jsonl")]
+            if stem.isdigit():
+                numbers.append(int(stem))
+        return sorted(numbers)
+
+    def _path(self, segment) -> str:
+        return os.path.join(self.root, f"{self.prefix}-{segment:06d}.jsonl")
+
+    @staticmethod
+    def _parse(cursor):
+        segment, offset = str(cursor).split(":")
+        return int(segment), int(offset)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sigue el feed de cambios de CandApp.")
+    parser.add_argument("--root", default="cdc", help="carpeta del feed")
+    parser.add_argument("--cursor-file", help="archivo donde se guarda el cursor para retomar")
+    parser.add_argument("--table", help="mostrar sólo los eventos de esta tabla")
+    parser.add_argument("--from-end", action="store_true",
+                        help="sin cursor guardado, empezar por los eventos nuevos")
+    args = parser.parse_args()
+
+    feed = ChangeFeed(args.root)
+    cursor = None
+    if args.cursor_file and os.path.exists(args.cursor_file):
+        with open(args.cursor_file, encoding="utf-8") as fh:
+            cursor = fh.read().strip() or None
+    if cursor is None and args.from_end:
+        cursor = feed.end_cursor()
+
+    for event, cursor in feed.tail(cursor):
+        if args.table is None or event["table"] == args.table:
+            print(json.dumps(event, ensure_ascii=False), flush=True)
+        if args.cursor_file:
+            with open(args.cursor_file, "w", encoding="utf-8") as fh:
+                fh.write(cursor)
+
+
+if __name__ == "__main__":
+    main()
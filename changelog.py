@@ -0,0 +1,111 @@
+"""
+Registro de cambios por fila de los datasets de CandApp.
+
+Cada alta, edición o borrado que llega al motor de almacenamiento se anota
+aquí con un número de secuencia creciente y la hora en que se aplicó. Los
+respaldos incrementales (:mod:`backup`) copian sólo las entradas nuevas desde
+el último respaldo y la restauración a un instante reaplica las entradas
+hasta esa hora sobre el último respaldo completo anterior.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+from storage import _decode_journal_value, _encode_journal_value
+
+
+def encode_row(row) -> str:
+    """Serializa una fila (dict) a JSON (fechas como texto, bytes en base64)."""
+    if row is None:
+        return None
+    return json.dumps({c: _encode_journal_value(v) for c, v in row.items()}, ensure_ascii=False)
+
+
+def decode_row(text):
+    """Operación inversa de :func:`encode_row`."""
+    if text is None:
+        return None
+    return {c: _decode_journal_value(v) for c, v in json.loads(text).items()}
+
+
+class ChangeLog:
+    """
+    Registro de cambios en una base SQLite propia (``db_path``), compartido
+    por todos los datasets (cada entrada lleva el nombre de su dataset).
+
+    Una entrada es ``{"seq", "ts", "dataset", "op", "rid", "row"}`` con
+    ``op`` ``"insert"`` (fila completa), ``"upsert"`` (``row`` trae sólo las
+    columnas escritas) o ``"delete"``.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "ts REAL NOT NULL, dataset TEXT NOT NULL, op TEXT NOT NULL, "
+                "rid INTEGER NOT NULL, row TEXT)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_changes_dataset_seq ON changes (dataset, seq)"
+            )
+
+    def record(self, dataset, op, rid, row=None) -> None:
+        """Anota un cambio de la fila ``rid`` de ``dataset``."""
+        self.record_many(dataset, [(op, rid, row)])
+
+    def record_many(self, dataset, entries) -> None:
+        """Anota varios cambios ``(op, rid, row)`` en una única transacción."""
+        now = time.time()
+        params = [(now, dataset, op, int(rid), encode_row(row)) for op, rid, row in entries]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO changes (ts, dataset, op, rid, row) VALUES (?, ?, ?, ?, ?)", params
+            )
+
+    def since(self, dataset, seq=0, until=None, limit=None) -> list:
+        """
+        Entradas de ``dataset`` con secuencia mayor que ``seq`` (y hora hasta
+        ``until``, en segundos epoch, si se indica), en orden.
+        """
+        sql = "SELECT seq, ts, op, rid, row FROM changes WHERE dataset=? AND seq>?"
+        params = [dataset, int(seq)]
+        if until is not None:
+            sql += " AND ts<=?"
+            params.append(float(until))
+        sql += " ORDER BY seq"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {"seq": s, "ts": ts, "dataset": dataset, "op": op, "rid": rid, "row": decode_row(row)}
+            for s, ts, op, rid, row in rows
+        ]
+
+    def last_seq(self, dataset=None) -> int:
+        """Última secuencia anotada (de ``dataset`` o de todo el registro)."""
+        with self._lock:
+            if dataset is None:
+                cur = self._conn.execute("SELECT MAX(seq) FROM changes")
+            else:
+                cur = self._conn.execute("SELECT MAX(seq) FROM changes WHERE dataset=?", (dataset,))
+            value = cur.fetchone()[0]
+        if value is None:
+            # Sin entradas: AUTOINCREMENT igual recuerda la última secuencia usada
+            with self._lock:
+                cur = self._conn.execute("SELECT seq FROM sqlite_sequence WHERE name='changes'")
+                row = cur.fetchone()
+            return int(row[0]) if row else 0
+        return int(value)
+
+    def prune(self, dataset, upto_seq) -> None:
+        """Descarta las entradas de ``dataset`` con secuencia hasta ``upto_seq``."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM changes WHERE dataset=? AND seq<=?", (dataset, int(upto_seq)))
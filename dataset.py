@@ -0,0 +1,804 @@
+"""
+Conjuntos de datos compartidos por todo el proceso de Streamlit.
+
+En lugar de que cada sesión cargue y guarde su propia copia del DataFrame,
+el proceso mantiene un único ``SharedDataset`` versionado. Las escrituras se
+serializan a través de un único escritor que persiste en el motor de
+almacenamiento e incrementa la versión; cada sesión sólo guarda una
+``SessionView`` con la referencia al dataset y sus ediciones sin confirmar.
+"""
+import threading
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from schema import apply_schema, coerce_row
+from storage import VERSION_COLUMN, ConflictError
+
+
+def _same(a, b) -> bool:
+    """Compara dos valores de celda tratando NaN/None/NaT como iguales."""
+    a_na = a is None or (not isinstance(a, (list, dict)) and pd.isna(a))
+    b_na = b is None or (not isinstance(b, (list, dict)) and pd.isna(b))
+    if a_na or b_na:
+        return a_na and b_na
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return False
+
+
+def merge_row_ops(old, new):
+    """
+    Fusiona dos operaciones pendientes sobre la misma fila: un borrado gana
+    siempre y dos escrituras se combinan columna a columna. (Las ediciones no
+    se encolan: antes de escribirlas se persiste el alta pendiente.)
+    """
+    if old[0] == "delete" or new[0] == "delete":
+        return new
+    merged = dict(old[1])
+    merged.update(new[1])
+    return ("insert" if old[0] == "insert" else "upsert", merged)
+
+
+def _blank(dtype, capacity):
+    """Arreglo de ``capacity`` posiciones vacías (NaN/NaT/None) de ``dtype``."""
+    if dtype.kind == "M":
+        return np.full(capacity, np.datetime64("NaT"), dtype=dtype)
+    if dtype.kind == "f":
+        return np.full(capacity, np.nan, dtype=dtype)
+    if dtype.kind == "O":
+        return np.full(capacity, None, dtype=object)
+    return np.zeros(capacity, dtype=dtype)
+
+
+def _grow(arr, capacity, n):
+    """Copia las primeras ``n`` posiciones de ``arr`` en un arreglo de ``capacity``."""
+    if isinstance(arr, pd.Categorical):
+        codes = np.full(capacity, -1, dtype=arr.codes.dtype)
+        codes[:n] = arr.codes[:n]
+        return pd.Categorical.from_codes(codes, dtype=arr.dtype)
+    new = _blank(arr.dtype, capacity)
+    new[:n] = arr[:n]
+    return new
+
+
+def _column_array(series: pd.Series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.array
+    if isinstance(series.dtype, np.dtype):
+        return series.to_numpy()
+    return series.to_numpy(dtype=object)  # otros dtypes de extensión: como texto
+
+
+class FrameBuffer:
+    """
+    Tabla en memoria con lugar libre al final, para que una alta no copie
+    la tabla entera.
+
+    Cada columna vive en un arreglo con más capacidad que filas; al llenarse
+    se duplica, así el costo de agregar filas queda amortizado. ``view`` es
+    un DataFrame (indexado por ``rid``) sobre las primeras ``n`` posiciones
+    de esos arreglos, sin copiarlas, y se rehace en cada cambio. Las
+    ediciones escriben en el lugar; los borrados reconstruyen los arreglos
+    (una copia) en lugar de correr filas que otra sesión puede estar mirando.
+    """
+
+    MIN_CAPACITY = 64
+
+    def __init__(self, df: pd.DataFrame):
+        self.columns = list(df.columns)
+        self._load(df)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _load(self, df: pd.DataFrame) -> None:
+        n = len(df)
+        capacity = max(self.MIN_CAPACITY, n + n // 2)
+        self._n = n
+        self._rids = _grow(df.index.to_numpy(dtype="int64"), capacity, n)
+        self._sorted = bool((np.diff(self._rids[:n]) > 0).all())
+        self._arrays = {c: _grow(_column_array(df[c]), capacity, n) for c in self.columns}
+        self._refresh()
+
+    def _refresh(self) -> None:
+        n = self._n
+        self.view = pd.DataFrame(
+            {c: self._arrays[c][:n] for c in self.columns},
+            index=pd.Index(self._rids[:n], copy=False),
+            columns=self.columns,
+            copy=False,
+        )
+
+    def _reserve(self, extra: int) -> None:
+        capacity = len(self._rids)
+        needed = self._n + extra
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2)
+        self._rids = _grow(self._rids, capacity, self._n)
+        self._arrays = {c: _grow(a, capacity, self._n) for c, a in self._arrays.items()}
+
+    def _write(self, col, where, values: pd.Series) -> None:
+        """Escribe ``values`` en las posiciones ``where`` (slice o arreglo) de ``col``."""
+        arr = self._arrays[col]
+        if isinstance(arr, pd.Categorical):
+            values = values.to_numpy(dtype=object)
+            missing = [v for v in pd.unique(values[pd.notna(values)]) if v not in arr.categories]
+            if missing:
+                arr = self._arrays[col] = arr.add_categories(missing)
+            arr[where] = values
+            return
+        if values.dtype != arr.dtype:
+            try:
+                values = values.astype(arr.dtype)
+            except (TypeError, ValueError):
+                # Valor que no entra en el tipo de la columna: se pasa a texto
+                arr = self._arrays[col] = pd.Series(arr, copy=False).astype(object).to_numpy()
+        arr[where] = values.to_numpy(dtype=arr.dtype)
+
+    def append(self, df: pd.DataFrame) -> None:
+        """Agrega las filas de ``df`` (indexado por ``rid``, mismas columnas)."""
+        k = len(df)
+        if not k:
+            return
+        self._reserve(k)
+        start = self._n
+        new = df.index.to_numpy(dtype="int64")
+        if self._sorted:
+            self._sorted = bool((np.diff(new) > 0).all()) and (start == 0 or new[0] > self._rids[start - 1])
+        self._rids[start:start + k] = new
+        for col in self.columns:
+            self._write(col, slice(start, start + k), df[col].reset_index(drop=True))
+        self._n += k
+        self._refresh()
+
+    def set(self, rid, changes: dict) -> None:
+        """Escribe en el lugar las celdas ``changes`` de la fila ``rid``."""
+        pos = self.positions([rid])[0]
+        if pos < 0:
+            raise KeyError(rid)
+        for col, value in changes.items():
+            if col in self._arrays:
+                self._write(col, [pos], pd.Series([value]))
+        self._refresh()
+
+    def update(self, df: pd.DataFrame) -> None:
+        """Reescribe en el lugar las filas de ``df`` (indexado por ``rid``, todas existentes)."""
+        if df.empty:
+            return
+        positions = self.positions(df.index)
+        for col in self.columns:
+            if col in df.columns:
+                self._write(col, positions, df[col].reset_index(drop=True))
+        self._refresh()
+
+    def add_columns(self, df: pd.DataFrame, order=None) -> None:
+        """
+        Agrega las columnas de ``df`` (indexado por ``rid``; las filas que
+        falten quedan vacías). ``order`` fija el orden final de las columnas.
+        """
+        df = df.reindex(self.view.index)
+        capacity = len(self._rids)
+        for col in df.columns:
+            self._arrays[col] = _grow(_column_array(df[col]), capacity, self._n)
+        if order is None:
+            self.columns += [c for c in df.columns if c not in self.columns]
+        else:
+            self.columns = [c for c in order if c in self._arrays]
+        self._refresh()
+
+    def positions(self, rids) -> np.ndarray:
+        """
+        Posición de cada ``rid`` (-1 si no existe). Mientras los ``rid`` estén
+        en orden (lo habitual: se asignan crecientes) es una búsqueda binaria
+        y no hace falta la tabla hash del índice completo.
+        """
+        rids = np.asarray(rids, dtype="int64")
+        if not self._sorted:
+            return self.view.index.get_indexer(rids)
+        current = self._rids[:self._n]
+        pos = np.searchsorted(current, rids)
+        found = pos < len(current)
+        found[found] = current[pos[found]] == rids[found]
+        return np.where(found, pos, -1)
+
+    def take(self, rids, columns=None) -> pd.DataFrame:
+        """Copia de las filas ``rids`` existentes (y sólo ``columns``), en ese orden."""
+        pos = self.positions(rids)
+        pos = pos[pos >= 0]
+        columns = self.columns if columns is None else list(columns)
+        n = self._n
+        return pd.DataFrame(
+            {c: self._arrays[c][:n][pos] for c in columns},
+            index=pd.Index(self._rids[pos]),
+            columns=columns,
+        )
+
+    def drop(self, rids) -> None:
+        """Quita las filas ``rids`` (``KeyError`` si alguna no existe)."""
+        rids = list(rids)
+        positions = self.positions(rids)
+        if (positions < 0).any():
+            raise KeyError([r for r, p in zip(rids, positions) if p < 0])
+        keep = np.ones(self._n, dtype=bool)
+        keep[positions] = False
+        self._load(self.view[keep])
+
+    def project(self, columns) -> pd.DataFrame:
+        """DataFrame con sólo ``columns``, sobre los mismos arreglos (sin copiar)."""
+        view = self.view
+        return pd.DataFrame({c: view[c] for c in columns}, columns=list(columns), copy=False)
+
+
+class SharedDataset:
+    """
+    DataFrame de sólo lectura compartido entre sesiones, con versión.
+
+    ``df`` debe tratarse como inmutable desde la UI: todas las mutaciones
+    pasan por :meth:`insert`, :meth:`update` y :meth:`delete`, que persisten
+    la fila en ``store`` y luego actualizan la copia en memoria respetando
+    los tipos de ``schema`` (ver :mod:`schema`). La copia en memoria es un
+    :class:`FrameBuffer`: una alta no copia la tabla y :meth:`project` da
+    columnas sueltas sin duplicarlas.
+
+    Con ``writer`` (una ``WriteBehindQueue``) la persistencia se encola y la
+    escritura vuelve en cuanto se actualizó la memoria. Los ``rid`` de las
+    filas nuevas los reserva el motor (``store.reserve_rids``) antes de
+    encolar la fila, así otro proceso que escriba en la misma base nunca
+    recibe el mismo ``rid``.
+
+    :meth:`update` recibe la fila tal como la vio el usuario (``base``) y
+    persiste sólo las celdas que realmente cambiaron; si otra sesión cambió
+    la fila entretanto, fusiona los cambios que no se pisan o lanza
+    ``ConflictError``. Si la tabla tiene la columna ``_version``, cada
+    escritura incrementa además la versión de la fila. Las ediciones no
+    pasan por la cola: se escriben en el acto con ``store.update``, que
+    compara la ``_version`` guardada, así un conflicto con otro proceso (o
+    una fila que otro proceso borró) se informa antes de confirmar al usuario.
+
+    ``columns`` es la lista completa de columnas de la tabla; ``df`` puede
+    traer sólo algunas y el resto se lee del motor la primera vez que se
+    piden (:meth:`project`, :meth:`ensure_columns` o :attr:`df`, que las
+    necesita todas). Así el arranque y la memoria dependen de las columnas
+    que realmente usan las pantallas abiertas.
+
+    Con ``changelog`` (un ``ChangeLog``) cada cambio se anota en cuanto el
+    motor lo persistió, para los respaldos incrementales; con ``feed`` (un
+    ``cdc.ChangeFeed``) se publica además como evento para otras herramientas.
+
+    Si otro proceso escribe en el mismo motor, :meth:`sync` trae sólo las
+    filas que cambiaron desde la secuencia ``seq`` del motor (la que tenía al
+    leer ``df``; por defecto, la actual).
+
+    Los índices derivados registrados con :meth:`add_index` (ver
+    :mod:`indexes`) se mantienen en cada escritura: reciben las versiones
+    anteriores de las filas que cambiaron (``removed``) y las nuevas
+    (``added``), nunca la tabla completa.
+    """
+
+    SYNC_MAX_ROWS = 5000  # más filas cambiadas que esto: se relee la tabla
+
+    def __init__(self, store, df: pd.DataFrame, schema=None, writer=None, name="dataset",
+                 changelog=None, feed=None, columns=None, seq=None):
+        self.store = store
+        self.columns = list(df.columns) if columns is None else list(columns)
+        self.schema = schema or {}
+        self.writer = writer
+        self.name = name
+        self.changelog = changelog
+        self.feed = feed
+        self.last_log_error = None
+        self.version = 0
+        self._buf = FrameBuffer(df)
+        self._write_lock = threading.Lock()
+        self._store_seq = store.change_seq() if seq is None else seq
+        self._store_stamp = None
+        self._indexes = []
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """
+        Tabla completa vigente (referencia compartida, no modificar). Carga
+        las columnas que falten: donde alcance con algunas, usar :meth:`project`.
+        """
+        self.ensure_columns(self.columns)
+        return self._buf.view
+
+    @property
+    def loaded_columns(self) -> list:
+        """Columnas que ya están en memoria."""
+        return list(self._buf.columns)
+
+    def project(self, columns) -> pd.DataFrame:
+        """
+        Sólo las columnas ``columns`` de :attr:`df`, sin copiar los datos
+        (misma advertencia: no modificar). Es lo que deben usar los tableros
+        y selectores que no necesitan la tabla completa.
+        """
+        self.ensure_columns(columns)
+        return self._buf.project(columns)
+
+    def __len__(self) -> int:
+        return len(self._buf)
+
+    def rows(self, rids, columns) -> pd.DataFrame:
+        """
+        Copia de las filas ``rids`` (sólo ``columns``), en ese orden; ignora
+        las que no existen. Las columnas que todavía no están en memoria se
+        leen del motor sólo para esas filas, sin cargarlas enteras.
+        """
+        columns = list(columns)
+        if all(c in self._buf.columns for c in columns):
+            return self._buf.take(rids, columns)
+        with self._write_lock:
+            df = self._buf.take(rids, [c for c in columns if c in self._buf.columns])
+            return self._with_columns(df, columns)[columns]
+
+    def table(self, columns=None) -> pd.DataFrame:
+        """
+        Tabla con ``columns`` (todas por defecto) para un reporte o una
+        exportación. Las columnas que no están en memoria se leen del motor
+        sólo para esta copia y no quedan cargadas; si no falta ninguna es una
+        proyección compartida (no modificar).
+        """
+        columns = self.columns if columns is None else list(columns)
+        loaded = [c for c in columns if c in self._buf.columns]
+        if len(loaded) == len(columns):
+            return self._buf.project(columns)
+        with self._write_lock:
+            if self.writer is not None:
+                self.writer.flush()
+            df = self._buf.project(loaded)
+            extra = apply_schema(self.store.load([c for c in columns if c not in loaded]), self.schema)
+        return df.join(extra, how="inner")[columns]
+
+    def _with_columns(self, df: pd.DataFrame, columns) -> pd.DataFrame:
+        """
+        ``df`` (filas del buffer) más las ``columns`` que no están en memoria,
+        leídas del motor sólo para esas filas; se quitan las que el motor ya
+        no tiene. Con el lock de escritura tomado.
+        """
+        missing = [c for c in columns if c not in df.columns]
+        if not missing:
+            return df
+        # Un alta que siga en la cola todavía no está en el motor
+        if self.writer is not None:
+            for rid in df.index:
+                self.writer.flush_key((self.name, rid))
+        extra = apply_schema(self.store.load_rows(df.index, missing), self.schema)
+        return df.join(extra, how="inner")
+
+    def add_index(self, index) -> None:
+        """
+        Registra un índice derivado: un objeto con ``columns``, ``reset(df)``
+        y ``apply(removed, added)`` (DataFrames indexados por ``rid`` o
+        ``None``). Se llama con el lock de escritura tomado.
+        """
+        self.ensure_columns(index.columns)
+        with self._write_lock:
+            index.reset(self._buf.project(index.columns))
+            self._indexes.append(index)
+
+    def _notify(self, removed=None, added=None) -> None:
+        for index in self._indexes:
+            index.apply(removed, added)
+
+    def _reset_indexes(self) -> None:
+        for index in self._indexes:
+            index.reset(self._buf.project(index.columns))
+
+    def ensure_columns(self, columns) -> None:
+        """Lee del motor las columnas de ``columns`` que todavía no estén en memoria."""
+        if all(c in self._buf.columns for c in columns):
+            return
+        with self._write_lock:
+            missing = [c for c in self.columns if c in columns and c not in self._buf.columns]
+            if not missing:
+                return
+            # El motor tiene que estar al día con la memoria antes de leerlo
+            if self.writer is not None:
+                self.writer.flush()
+            extra = apply_schema(self.store.load(missing), self.schema)
+            self._buf.add_columns(extra, order=self.columns)
+
+    def sync(self) -> bool:
+        """
+        Incorpora lo que otros procesos escribieron en el motor. El control
+        es O(1) (``store.data_version()``) y sólo si se movió se leen las
+        filas cambiadas. Devuelve ``True`` si el dataset cambió.
+        """
+        stamp = self.store.data_version()
+        if stamp == self._store_stamp:
+            return False
+        with self._write_lock:
+            if stamp == self._store_stamp:
+                return False
+            # Lo propio que siga en la cola iría detrás de lo que se lea ahora
+            if self.writer is not None:
+                self.writer.flush()
+            changes = self.store.changes_since(self._store_seq, limit=self.SYNC_MAX_ROWS)
+            self._store_stamp = stamp
+            if changes is None:
+                seq = self.store.change_seq()
+                self._buf = FrameBuffer(apply_schema(self.store.load(self._buf.columns), self.schema))
+                self._reset_indexes()
+            else:
+                rids, seq = changes
+                if not rids:
+                    self._store_seq = seq
+                    return False
+                self._apply_rows(rids, apply_schema(self.store.load_rows(rids, self._buf.columns),
+                                                    self.schema))
+            self._store_seq = seq
+            self.version += 1
+            return True
+
+    def _apply_rows(self, rids, rows: pd.DataFrame) -> None:
+        """Lleva a memoria las filas ``rids`` tal como están en ``rows`` (ausente = borrada)."""
+        present = self._buf.positions(rids) >= 0
+        gone = [r for r, p in zip(rids, present) if p and r not in rows.index]
+        if gone:
+            removed = self._buf.take(gone)
+            self._buf.drop(gone)
+            self._notify(removed=removed)
+        known = self._buf.positions(rows.index) >= 0
+        if known.any():
+            before = self._buf.take(rows.index[known])
+            self._buf.update(rows[known])
+            self._notify(before, self._buf.take(rows.index[known]))
+        if not known.all():
+            self._buf.append(rows[~known])
+            self._notify(added=rows[~known])
+
+    def _reload_rows(self, rids) -> None:
+        """Vuelve a leer del motor las filas ``rids`` (con el lock de escritura tomado)."""
+        self._apply_rows(rids, apply_schema(self.store.load_rows(rids, self._buf.columns), self.schema))
+        self.version += 1
+
+    def insert(self, row: dict):
+        """Persiste una fila nueva y devuelve su ``rid``."""
+        row = coerce_row(row, self.schema)
+        if VERSION_COLUMN in self.columns:
+            row[VERSION_COLUMN] = 1
+        with self._write_lock:
+            rid = self.store.reserve_rids(1)
+            self._persist(rid, ("insert", row))
+            new = apply_schema(pd.DataFrame([row], index=[rid]).reindex(columns=self.columns), self.schema)
+            self._buf.append(new)
+            self._notify(added=new)
+            self.version += 1
+            return rid
+
+    def insert_chunks(self, chunks) -> int:
+        """
+        Alta masiva: persiste una secuencia de DataFrames de filas nuevas de
+        forma atómica (sin pasar por la cola diferida) y devuelve la cantidad
+        de filas.
+
+        Cada bloque se tipa, recibe sus ``rid``, se escribe en el motor (que
+        lo deja aparte hasta el final, ver ``store.insert_chunks``) y se
+        agrega a ``df`` en cuanto llega, así la memoria queda en torno a un
+        bloque. El lock de escritura se toma sólo para agregar cada bloque:
+        lo que haga el generador (QR, progreso en pantalla) no frena las
+        escrituras de otras sesiones. Si el generador o el motor fallan no se
+        guarda nada y las filas ya agregadas se quitan de ``df``.
+        """
+        added = []  # (primer rid, cantidad) de cada bloque
+
+        def typed():
+            for chunk in chunks:
+                if chunk.empty:
+                    continue
+                chunk = apply_schema(chunk.reindex(columns=self.columns), self.schema)
+                if VERSION_COLUMN in chunk.columns:
+                    chunk[VERSION_COLUMN] = 1
+                first = self.store.reserve_rids(len(chunk))
+                chunk.index = range(first, first + len(chunk))
+                with self._write_lock:
+                    self._buf.append(chunk)
+                    self._notify(added=chunk)
+                    self.version += 1
+                added.append((first, len(chunk)))
+                yield chunk
+
+        try:
+            total = self.store.insert_chunks(typed())
+        except Exception:
+            with self._write_lock:
+                rids = [r for first, n in added for r in range(first, first + n)]
+                rids = [r for r, p in zip(rids, self._buf.positions(rids)) if p >= 0]
+                if rids:
+                    removed = self._buf.take(rids) if self._indexes else None
+                    self._buf.drop(rids)
+                    self._notify(removed=removed)
+                    self.version += 1
+            raise
+        # La bitácora de cambios se anota recién con todo guardado, bloque a bloque
+        if self.changelog is not None or self.feed is not None:
+            for first, n in added:
+                rows = apply_schema(self.store.load_rows(range(first, first + n)), self.schema)
+                self._log([("insert", rid, row) for rid, row in zip(rows.index, rows.to_dict("records"))])
+        return total
+
+    def update(self, rid, changes: dict, base=None) -> None:
+        """
+        Persiste los cambios de la fila ``rid``. ``base`` es la fila (dict)
+        sobre la que el usuario editó; sin ella se escriben todas las columnas
+        de ``changes`` y sólo se controla la ``_version`` contra el motor.
+        Ante un conflicto la fila se relee del motor antes de lanzar
+        ``ConflictError``.
+        """
+        changes = coerce_row(changes, self.schema)
+        with self._write_lock:
+            before = self._buf.take([rid])
+            if before.empty:
+                raise ConflictError(rid)
+            # Las columnas editadas que no están en memoria se leen sólo para
+            # esta fila: una edición no carga la columna entera
+            needed = [c for c in self.columns if c in changes or c == VERSION_COLUMN]
+            current = self._with_columns(before, needed)
+            if current.empty:
+                self._reload_rows([rid])
+                raise ConflictError(rid)
+            current = current.iloc[0]
+            if base is not None:
+                changes = self._merge(rid, current, base, changes)
+                if not changes:
+                    return
+            version = None
+            if VERSION_COLUMN in self.columns:
+                version = int(current[VERSION_COLUMN])
+                changes[VERSION_COLUMN] = version + 1
+            # Lo que siga en la cola para esta fila (p. ej. su alta) va antes
+            if self.writer is not None:
+                self.writer.flush_key((self.name, rid))
+            try:
+                self.store.update(rid, changes, version=version)
+            except ConflictError:
+                self._reload_rows([rid])
+                raise
+            self._log([("upsert", rid, changes)])
+            self._buf.set(rid, changes)
+            if self._indexes:
+                self._notify(before, self._buf.take([rid]))
+            self.version += 1
+
+    @staticmethod
+    def _merge(rid, current, base, changes: dict) -> dict:
+        """
+        Fusión a tres bandas: se aplican sólo las columnas que el usuario
+        cambió respecto de ``base``; si alguna también la cambió otra sesión
+        (con otro valor) es un conflicto.
+        """
+        edited = {c: v for c, v in changes.items() if not _same(v, base.get(c))}
+        conflicts = [
+            c for c, v in edited.items()
+            if not _same(current.get(c), base.get(c)) and not _same(current.get(c), v)
+        ]
+        if conflicts:
+            raise ConflictError(rid, conflicts)
+        return edited
+
+    def delete(self, rid) -> bool:
+        """
+        Borra la fila ``rid``. Devuelve ``False`` (sin escribir nada) si la
+        fila ya no está, p. ej. porque otra sesión la borró antes.
+        """
+        with self._write_lock:
+            if self._buf.positions([rid])[0] < 0:
+                return False
+            self._persist(rid, ("delete", None))
+            removed = self._buf.take([rid]) if self._indexes else None
+            self._buf.drop([rid])
+            self._notify(removed=removed)
+            self.version += 1
+            return True
+
+    def delete_many(self, rids, check=None, before_delete=None) -> list:
+        """
+        Borra varias filas de una vez (una sola versión nueva del dataset) y
+        devuelve los ``rid`` borrados. Todo ocurre con el lock de escritura
+        tomado: se saltean las filas que ya no están y, con ``check`` (recibe
+        las filas completas y devuelve una máscara booleana), las que ya no
+        cumplen la condición, p. ej. porque otra sesión las editó. Con
+        ``before_delete`` se reciben esas filas completas antes de borrarlas
+        (p. ej. para archivarlas); si falla no se borra nada.
+        """
+        rids = list(rids)
+        if not rids:
+            return []
+        with self._write_lock:
+            rows = self._buf.take(rids)
+            if check is not None or before_delete is not None:
+                rows = self._with_columns(rows, self.columns)[self.columns]
+            if check is not None and not rows.empty:
+                rows = rows[np.asarray(check(rows), dtype=bool)]
+            if rows.empty:
+                return []
+            if before_delete is not None:
+                before_delete(rows)
+            rids = rows.index.tolist()
+            if self.writer is None:
+                self.store.delete_many(rids)
+                self._log([("delete", rid, None) for rid in rids])
+            else:
+                for rid in rids:
+                    self._persist(rid, ("delete", None))
+            removed = rows[self._buf.columns] if self._indexes else None
+            self._buf.drop(rids)
+            self._notify(removed=removed)
+            self.version += 1
+            return rids
+
+    def replace(self, df: pd.DataFrame) -> None:
+        """
+        Reemplaza la tabla completa por ``df`` (indexado por ``rid``), p. ej.
+        al restaurar un respaldo. Primero se persisten las escrituras
+        pendientes para que ninguna pise la tabla restaurada.
+        """
+        df = apply_schema(df.reindex(columns=self.columns), self.schema)
+        with self._write_lock:
+            if self.writer is not None:
+                self.writer.flush()
+            self.store.replace_all(df)
+            removed = self._buf.view.index.difference(df.index)
+            self._log([("delete", rid, None) for rid in removed]
+                      + [("insert", rid, row) for rid, row in zip(df.index, df.to_dict("records"))])
+            self._buf = FrameBuffer(df)
+            self._reset_indexes()
+            self.version += 1
+
+    def _log(self, entries) -> None:
+        if not entries:
+            return
+        for sink in (self.changelog, self.feed):
+            if sink is None:
+                continue
+            try:
+                sink.record_many(self.name, entries)
+            except Exception as exc:  # el cambio ya está persistido: no se reintenta
+                self.last_log_error = f"{type(sink).__name__}: {exc}"
+
+    def _persist(self, rid, op) -> None:
+        if self.writer is None:
+            self._apply_op(rid, op)
+        else:
+            self.writer.submit((self.name, rid), op, partial(self._apply_op, rid), merge_row_ops)
+
+    def _apply_op(self, rid, op) -> None:
+        kind, data = op
+        if kind == "delete":
+            self.store.delete(rid)
+        else:
+            self.store.insert(data, rid=rid)
+        self._log([(kind, rid, data)])
+
+
+class SessionView:
+    """
+    Vista de una sesión sobre un ``SharedDataset``.
+
+    Guarda sólo la referencia al dataset compartido y las ediciones propias
+    aún no confirmadas, así la memoria por sesión no crece con el tamaño de
+    la tabla. ``bases`` guarda la fila tal como estaba al empezar a editarla;
+    ``pending`` registra sólo las celdas sucias (distintas de la base) por
+    fila, de modo que confirmar una edición de una celda cuesta una escritura
+    de una celda, no de la tabla.
+    """
+
+    def __init__(self, dataset: SharedDataset):
+        self.dataset = dataset
+        self.pending = {}
+        self.bases = {}
+
+    @property
+    def df(self) -> pd.DataFrame:
+        return self.dataset.df
+
+    @property
+    def version(self) -> int:
+        return self.dataset.version
+
+    def project(self, columns) -> pd.DataFrame:
+        return self.dataset.project(columns)
+
+    def rows(self, rids, columns) -> pd.DataFrame:
+        return self.dataset.rows(rids, columns)
+
+    def table(self, columns=None) -> pd.DataFrame:
+        return self.dataset.table(columns)
+
+    def sync(self) -> bool:
+        """Trae los cambios de otros procesos (ver :meth:`SharedDataset.sync`)."""
+        return self.dataset.sync()
+
+    def insert(self, row: dict):
+        return self.dataset.insert(row)
+
+    def delete(self, rid) -> bool:
+        self.discard(rid)
+        return self.dataset.delete(rid)
+
+    def begin_edit(self, rid):
+        """
+        Toma (o renueva) la foto de la fila ``rid`` sobre la que se edita.
+        Si la fila ya no existe descarta lo que hubiera de ella y devuelve
+        ``None``.
+        """
+        row = self.dataset.rows([rid], self.dataset.columns)
+        if row.empty:
+            self.discard(rid)
+            return None
+        self.bases[rid] = base = row.iloc[0].to_dict()
+        # Lo que siga sin confirmar se conserva si todavía difiere de la foto nueva
+        if rid in self.pending:
+            dirty = {c: v for c, v in self.pending[rid].items() if not _same(v, base.get(c))}
+            if dirty:
+                self.pending[rid] = dirty
+            else:
+                del self.pending[rid]
+        return base
+
+    def base(self, rid):
+        """Foto de la fila en edición (la toma si todavía no existe; ``None`` si la fila no existe)."""
+        if rid not in self.bases:
+            return self.begin_edit(rid)
+        return self.bases[rid]
+
+    def draft(self, rid):
+        """
+        Fila en edición con los cambios sin confirmar encima de la foto
+        (``None`` si la fila no existe): lo que el formulario debe mostrar,
+        también después de un conflicto.
+        """
+        base = self.base(rid)
+        if base is None:
+            return None
+        return {**base, **self.pending.get(rid, {})}
+
+    def stage(self, rid, changes: dict) -> None:
+        """
+        Acumula cambios de la fila ``rid`` sin persistirlos todavía. Sólo se
+        marcan como sucias las celdas que difieren de la base.
+        """
+        base = self.base(rid)
+        if base is None:
+            raise ConflictError(rid)
+        changes = coerce_row(changes, self.dataset.schema)
+        dirty = self.pending.setdefault(rid, {})
+        for col, value in changes.items():
+            if _same(value, base.get(col)):
+                dirty.pop(col, None)
+            else:
+                dirty[col] = value
+        if not dirty:
+            del self.pending[rid]
+
+    def dirty_rows(self) -> list:
+        """Claves de las filas con cambios sin confirmar."""
+        return list(self.pending)
+
+    def discard(self, rid=None) -> None:
+        """Descarta las ediciones pendientes de ``rid`` (o todas)."""
+        if rid is None:
+            self.pending.clear()
+            self.bases.clear()
+        else:
+            self.pending.pop(rid, None)
+            self.bases.pop(rid, None)
+
+    def commit(self, rid=None) -> None:
+        """
+        Confirma las ediciones pendientes de ``rid`` (o todas). Si una falla
+        (``ConflictError``) sus cambios quedan pendientes para reintentar.
+        """
+        rids = list(self.pending) if rid is None else [rid]
+        for key in rids:
+            changes = self.pending.get(key)
+            if changes:
+                self.dataset.update(key, changes, base=self.bases.get(key))
+            self.pending.pop(key, None)
+            self.bases.pop(key, None)
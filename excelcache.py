@@ -0,0 +1,104 @@
+"""
+Caché de proceso para las lecturas de Excel.
+
+Parsear un .xlsx es lo más caro de cada carga y Streamlit vuelve a ejecutar
+el script en cada interacción: sin caché, un formulario subido se re-parsea
+en cada clic. ``ExcelCache`` guarda los DataFrames ya parseados, con clave
+ruta + mtime/tamaño (archivos en disco) o hash del contenido (archivos
+subidos), los expulsa por LRU al superar ``max_bytes`` y cuenta aciertos y
+fallos para mostrarlos en el panel de administración.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from snapshot import read_excel_snapshot
+
+
+def _frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class ExcelCache:
+    """
+    Caché LRU de DataFrames leídos de Excel, con tope de memoria.
+
+    Los DataFrames devueltos se comparten entre sesiones y no deben
+    modificarse (quien necesite cambiarlos debe copiarlos antes). Un
+    DataFrame más grande que ``max_bytes`` se devuelve sin guardarse.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # clave -> (df, bytes)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def read(self, path, **read_kwargs) -> pd.DataFrame:
+        """
+        Lee el Excel ``path`` (a través de su snapshot columnar). La entrada
+        se invalida sola cuando cambia el mtime o el tamaño del archivo.
+        """
+        st = os.stat(path)
+        key = ("file", os.path.abspath(path), st.st_mtime_ns, st.st_size, self._kwargs_key(read_kwargs))
+        return self._get(key, lambda: read_excel_snapshot(path, **read_kwargs))
+
+    def read_upload(self, data: bytes, **read_kwargs) -> pd.DataFrame:
+        """Lee un Excel subido (``bytes``); la clave es el SHA-256 del contenido."""
+        digest = hashlib.sha256(data).hexdigest()
+        key = ("upload", digest, self._kwargs_key(read_kwargs))
+        return self._get(key, lambda: pd.read_excel(io.BytesIO(data), **read_kwargs))
+
+    def stats(self) -> dict:
+        """Contadores de uso y ocupación actual."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def clear(self) -> None:
+        """Vacía la caché (los contadores se conservan)."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    @staticmethod
+    def _kwargs_key(read_kwargs) -> tuple:
+        return tuple(sorted((k, repr(v)) for k, v in read_kwargs.items()))
+
+    def _get(self, key, load) -> pd.DataFrame:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        # Se parsea fuera del lock para no frenar las lecturas de otros archivos.
+        df = load()
+        size = _frame_bytes(df)
+        if size > self.max_bytes:
+            return df
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (df, size)
+                self._size += size
+                while self._size > self.max_bytes:
+                    _, (_, old_size) = self._entries.popitem(last=False)
+                    self._size -= old_size
+                    self.evictions += 1
+            return self._entries[key][0]
@@ -0,0 +1,76 @@
+"""
+Caché de proceso para los gráficos del dashboard.
+
+Streamlit vuelve a ejecutar el script en cada interacción y cada gráfico
+repetía su agrupación y armaba la figura de Plotly aunque los datos no
+hubieran cambiado. ``FigureCache`` guarda la figura ya serializada (JSON)
+con clave nombre + filtros y la asocia a la versión de los datos de la que
+salió: mientras esa versión no cambie se devuelve tal cual y cualquier
+escritura (que sube la versión) la deja vieja, así que no hace falta
+invalidar a mano. El total se limita por LRU.
+"""
+import threading
+from collections import OrderedDict
+
+
+class FigureCache:
+    """
+    Caché LRU de figuras serializadas, con tope de memoria.
+
+    Cada nombre + filtros guarda una sola figura, la de la última versión
+    pedida. Una figura más grande que ``max_bytes`` se devuelve sin guardarse.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # (nombre, filtros) -> (versión, json)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, name, version, build, **params) -> str:
+        """
+        JSON de la figura ``name`` para ``params`` en la versión ``version``
+        de los datos. Si no está (o es de otra versión) se llama ``build()``,
+        que debe devolver la figura de Plotly.
+        """
+        key = (name, tuple(sorted(params.items())))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        # Se arma sin el lock: otra sesión puede estar leyendo otros gráficos
+        fig_json = build().to_json()
+        with self._lock:
+            self._discard(key)
+            if len(fig_json) <= self.max_bytes:
+                self._entries[key] = (version, fig_json)
+                self._size += len(fig_json)
+                while self._size > self.max_bytes:
+                    self._discard(next(iter(self._entries)))
+                    self.evictions += 1
+        return fig_json
+
+    def stats(self) -> dict:
+        """Contadores de uso y ocupación actual."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def _discard(self, key) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1])
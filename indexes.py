@@ -0,0 +1,301 @@
+"""
+Índices derivados de un ``SharedDataset``.
+
+Se registran con ``SharedDataset.add_index`` y se mantienen en cada
+escritura con sólo las filas que cambiaron (``apply(removed, added)``), así
+las pantallas consultan estructuras ya ordenadas o agrupadas en lugar de
+recorrer la tabla en cada rerun. Todos los índices son compartidos por las
+sesiones del proceso y seguros entre hilos.
+"""
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+
+def page_slice(items, offset, limit, descending=True) -> list:
+    """Página ``[offset, offset + limit)`` de ``items`` (ordenados de menor a mayor)."""
+    if descending:
+        stop = max(len(items) - offset, 0)
+        return items[max(stop - limit, 0):stop][::-1]
+    return items[offset:offset + limit]
+
+
+def intersect(rids, sets) -> list:
+    """``rids`` (en su orden) que están en todos los conjuntos de ``sets``."""
+    if not sets:
+        return list(rids)
+    keep = set.intersection(*sorted(sets, key=len))  # el más chico descarta antes
+    return [rid for rid in rids if rid in keep]
+
+
+def sort_keys(series: pd.Series) -> list:
+    """
+    Valores de ``series`` como claves ordenables: las fechas pasan a enteros
+    (ns) y NaT queda como la menor de todas.
+    """
+    if series.dtype.kind == "M":
+        return series.to_numpy(dtype="datetime64[ns]").view("int64").tolist()
+    return series.tolist()
+
+
+class SortedIndex:
+    """
+    ``rid`` ordenados por el valor de ``column`` (y por ``rid`` a igual
+    valor). Pensado para fechas o números: altas y bajas cuestan una
+    búsqueda binaria y un corrimiento de la lista, y leer una página o un
+    rango cuesta lo que mide la página o el rango.
+    """
+
+    BULK = 64  # desde tantas filas juntas conviene reordenar todo
+
+    def __init__(self, column):
+        self.column = column
+        self.columns = [column]
+        self.version = 0
+        self._keys = []  # (valor, rid) ordenados
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def reset(self, df: pd.DataFrame) -> None:
+        keys = sorted(zip(sort_keys(df[self.column]), df.index.tolist()))
+        with self._lock:
+            self._keys = keys
+            self.version += 1
+
+    def apply(self, removed, added) -> None:
+        with self._lock:
+            if removed is not None:
+                for key in zip(sort_keys(removed[self.column]), removed.index.tolist()):
+                    i = bisect_left(self._keys, key)
+                    if i < len(self._keys) and self._keys[i] == key:
+                        del self._keys[i]
+            if added is not None:
+                keys = list(zip(sort_keys(added[self.column]), added.index.tolist()))
+                if len(keys) >= self.BULK:
+                    self._keys = sorted(self._keys + keys)
+                else:
+                    for key in keys:
+                        insort(self._keys, key)
+            self.version += 1
+
+    def page(self, offset, limit, descending=True) -> list:
+        """``rid`` de la página ``[offset, offset + limit)`` en el orden pedido."""
+        with self._lock:
+            chunk = page_slice(self._keys, offset, limit, descending)
+        return [rid for _, rid in chunk]
+
+    def range(self, low=None, high=None) -> list:
+        """
+        ``rid`` con ``low <= valor < high`` de menor a mayor (sin límite si
+        es ``None``). Con un límite dado las fechas vacías (NaT) quedan fuera.
+        """
+        with self._lock:
+            start = 0 if low is None else bisect_left(self._keys, (self._key(low),))
+            stop = len(self._keys) if high is None else bisect_left(self._keys, (self._key(high),))
+            chunk = self._keys[start:stop]
+        return [rid for _, rid in chunk]
+
+    @staticmethod
+    def _key(value):
+        if isinstance(value, (date, np.datetime64)):
+            return pd.Timestamp(value).value
+        return value
+
+
+class PostingIndex:
+    """
+    ``rid`` por valor de ``column`` (listas de posteo) para filtrar por
+    igualdad sin recorrer la tabla. Las filas sin valor no se indexan.
+    """
+
+    def __init__(self, column):
+        self.column = column
+        self.columns = [column]
+        self.version = 0
+        self._postings = {}  # valor -> set de rid
+        self._lock = threading.Lock()
+
+    def reset(self, df: pd.DataFrame) -> None:
+        rids = df.index.to_numpy()
+        groups = df.groupby(self.column, observed=True, sort=False).indices
+        postings = {value: set(rids[pos].tolist()) for value, pos in groups.items()}
+        with self._lock:
+            self._postings = postings
+            self.version += 1
+
+    def apply(self, removed, added) -> None:
+        with self._lock:
+            if removed is not None:
+                for value, rid in zip(removed[self.column].tolist(), removed.index.tolist()):
+                    rids = self._postings.get(value)
+                    if rids is not None:
+                        rids.discard(rid)
+                        if not rids:
+                            del self._postings[value]
+            if added is not None:
+                for value, rid in zip(added[self.column].tolist(), added.index.tolist()):
+                    if not pd.isna(value):
+                        self._postings.setdefault(value, set()).add(rid)
+            self.version += 1
+
+    def values(self) -> list:
+        """Valores con al menos una fila, ordenados."""
+        with self._lock:
+            return sorted(self._postings, key=str)
+
+    def lookup(self, values) -> set:
+        """``rid`` cuyo valor está en ``values`` (conjunto nuevo)."""
+        with self._lock:
+            found = set()
+            for value in values:
+                found |= self._postings.get(value, set())
+            return found
+
+
+class LockCounters:
+    """
+    Métricas del dashboard LOTO: total de candados, activos y alertas
+    (``Valor`` mayor que ``alert_threshold``). Cada escritura suma o resta
+    sólo las filas que cambiaron, así leerlas no depende del tamaño de la
+    tabla.
+    """
+
+    def __init__(self, alert_threshold=200, active_state="Activo"):
+        self.alert_threshold = alert_threshold
+        self.active_state = active_state
+        self.columns = ["Estado", "Valor"]
+        self.version = 0
+        self.total = self.active = self.alerts = 0
+        self._lock = threading.Lock()
+
+    def reset(self, df: pd.DataFrame) -> None:
+        with self._lock:
+            self.total = self.active = self.alerts = 0
+            self._tally(df, 1)
+            self.version += 1
+
+    def apply(self, removed, added) -> None:
+        with self._lock:
+            if removed is not None:
+                self._tally(removed, -1)
+            if added is not None:
+                self._tally(added, 1)
+            self.version += 1
+
+    def snapshot(self) -> dict:
+        """Totales actuales: ``total``, ``active`` y ``alerts``."""
+        with self._lock:
+            return {"total": self.total, "active": self.active, "alerts": self.alerts}
+
+    def _tally(self, df: pd.DataFrame, sign: int) -> None:
+        if df.empty:
+            return
+        self.total += sign * len(df)
+        self.active += sign * int((df["Estado"] == self.active_state).sum())
+        self.alerts += sign * int((df["Valor"] > self.alert_threshold).sum())
+
+
+class ActivityRollups:
+    """
+    Candados por período y estado en tres resoluciones (``"D"`` día,
+    ``"W"`` semana desde el lunes, ``"M"`` mes). Cada candado cuenta en el
+    período de su ``Fecha`` con su ``Estado`` actual; cada escritura mueve
+    sólo las filas que cambiaron, así cualquier resolución está lista sin
+    agrupar la tabla. Como el estado es el actual, un cambio de estado
+    reescribe el período de registro del candado: no son los candados
+    activos en cada momento (la tabla no guarda cuándo se desactivó cada uno).
+    """
+
+    FREQS = ("D", "W", "M")
+
+    def __init__(self, states=("Activo", "Inactivo")):
+        self.states = list(states)
+        self.columns = ["Estado", "Fecha"]
+        self.version = 0
+        self._counts = {freq: Counter() for freq in self.FREQS}  # (inicio del período, estado) -> n
+        self._frames = {}  # resolución -> tabla ya armada (hasta el próximo cambio)
+        self._lock = threading.Lock()
+
+    def reset(self, df: pd.DataFrame) -> None:
+        with self._lock:
+            self._counts = {freq: Counter() for freq in self.FREQS}
+            self._tally(df, 1)
+            self._changed()
+
+    def apply(self, removed, added) -> None:
+        with self._lock:
+            if removed is not None:
+                self._tally(removed, -1)
+            if added is not None:
+                self._tally(added, 1)
+            self._changed()
+
+    def bounds(self):
+        """Primer y último día con candados, o ``None`` si no hay ninguno."""
+        with self._lock:
+            days = self._counts["D"]
+            if not days:
+                return None
+            first = min(day for day, _ in days)
+            last = max(day for day, _ in days)
+            return first, last
+
+    def frame(self, freq, start=None, end=None) -> pd.DataFrame:
+        """
+        Candados por período (índice ``Fecha`` con el inicio de cada uno) y
+        una columna por estado, entre ``start`` y ``end`` inclusive. No
+        modificar: se comparte hasta el próximo cambio.
+        """
+        with self._lock:
+            frame = self._frames.get(freq)
+            if frame is None:
+                counts = pd.Series(self._counts[freq], dtype="int64")
+                if counts.empty:
+                    frame = pd.DataFrame(columns=self.states, dtype="int64")
+                else:
+                    frame = counts.unstack(fill_value=0).reindex(columns=self.states, fill_value=0)
+                frame.index = pd.DatetimeIndex(frame.index, name="Fecha")
+                frame = frame.sort_index()
+                self._frames[freq] = frame
+        if start is not None:
+            start = self._period(pd.Timestamp(start).normalize(), freq)  # incluye el período de start
+        if start is not None or end is not None:
+            frame = frame.loc[start:end]
+        return frame
+
+    @staticmethod
+    def _period(day: pd.Timestamp, freq: str) -> pd.Timestamp:
+        if freq == "W":
+            return day - pd.Timedelta(days=day.weekday())
+        if freq == "M":
+            return day.replace(day=1)
+        return day
+
+    def _changed(self) -> None:
+        self._frames = {}
+        self.version += 1
+
+    def _tally(self, df: pd.DataFrame, sign: int) -> None:
+        df = df[df["Estado"].isin(self.states) & df["Fecha"].notna()]
+        if df.empty:
+            return
+        # Se agrupa la tabla por día una sola vez; semanas y meses salen de los días
+        days = pd.DataFrame({"D": df["Fecha"].dt.normalize(), "state": df["Estado"].astype(object)})
+        days = days.value_counts().reset_index(name="n")
+        days["W"] = days["D"] - pd.to_timedelta(days["D"].dt.weekday, unit="D")
+        days["M"] = days["D"].dt.to_period("M").dt.start_time
+        for freq in self.FREQS:
+            counts = self._counts[freq]
+            grouped = days.groupby([freq, "state"], sort=False)["n"].sum()
+            for key, n in zip(grouped.index.tolist(), grouped.tolist()):
+                left = counts[key] + sign * n
+                if left > 0:
+                    counts[key] = left
+                else:
+                    del counts[key]
@@ -0,0 +1,48 @@
+"""
+Esquemas de tipos para las tablas de CandApp.
+
+Un esquema es un dict ``columna -> dtype`` con los valores ``"datetime64[ns]"``,
+``"int64"`` o ``"category"``; las columnas que no aparecen quedan como texto
+(object). Se aplica una sola vez al cargar y se respeta en cada escritura,
+así los dashboards no vuelven a parsear fechas y las columnas repetitivas
+ocupan mucha menos memoria.
+"""
+import pandas as pd
+
+
+def coerce_series(series: pd.Series, dtype: str) -> pd.Series:
+    """Convierte una serie al ``dtype`` declarado."""
+    if dtype == "datetime64[ns]":
+        return pd.to_datetime(series, errors="coerce")
+    if dtype == "int64":
+        return pd.to_numeric(series, errors="coerce").fillna(0).astype("int64")
+    if dtype == "category":
+        return series.astype("category")
+    return series
+
+
+def coerce_value(value, dtype: str):
+    """Convierte un valor suelto (de un formulario) al ``dtype`` declarado."""
+    if dtype == "datetime64[ns]":
+        return pd.to_datetime(value, errors="coerce")
+    if dtype == "int64":
+        value = pd.to_numeric(value, errors="coerce")
+        return 0 if pd.isna(value) else int(value)
+    return value
+
+
+def apply_schema(df: pd.DataFrame, schema: dict) -> pd.DataFrame:
+    """Aplica ``schema`` a las columnas presentes de ``df`` (en el lugar)."""
+    for col, dtype in schema.items():
+        if col in df.columns:
+            df[col] = coerce_series(df[col], dtype)
+    return df
+
+
+def coerce_row(row: dict, schema: dict) -> dict:
+    """Devuelve una copia de ``row`` con los valores convertidos según ``schema``."""
+    return {
+        col: coerce_value(value, schema[col]) if col in schema else value
+        for col, value in row.items()
+    }
+
@@ -0,0 +1,93 @@
+"""
+Snapshots columnares (Arrow IPC / Feather) de los archivos Excel.
+
+Leer un .xlsx obliga a openpyxl a parsear todo el XML en cada carga. Junto a
+cada Excel se mantiene un snapshot ``.arrow`` sin comprimir que se abre con
+memory-map; se usa mientras sea más nuevo que el Excel y se reconstruye
+cuando queda desactualizado. Cada combinación de opciones de lectura
+(``header=``, ``sheet_name=``...) tiene su propio snapshot, porque da otra
+tabla. Si pyarrow no está disponible se lee el Excel como siempre.
+"""
+import hashlib
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - pyarrow viene con streamlit
+    pa = None
+    feather = None
+
+
+def snapshot_path(xlsx_path: str, read_kwargs=None) -> str:
+    """Ruta del snapshot columnar de ``xlsx_path`` leído con ``read_kwargs``."""
+    base = os.path.splitext(xlsx_path)[0]
+    if read_kwargs:
+        options = repr(sorted((k, repr(v)) for k, v in read_kwargs.items()))
+        base += "." + hashlib.sha1(options.encode("utf-8")).hexdigest()[:12]
+    return base + ".arrow"
+
+
+def is_fresh(xlsx_path: str, read_kwargs=None) -> bool:
+    """Indica si existe un snapshot al menos tan nuevo como el Excel."""
+    snap = snapshot_path(xlsx_path, read_kwargs)
+    if feather is None or not os.path.exists(snap):
+        return False
+    if not os.path.exists(xlsx_path):
+        return True
+    return os.path.getmtime(snap) >= os.path.getmtime(xlsx_path)
+
+
+def _arrow_safe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Arrow exige un tipo por columna: las columnas object con tipos mezclados
+    (p. ej. N_PTW con números y textos) se pasan a texto.
+    """
+    fixed = None
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            if fixed is None:
+                fixed = df.copy()
+            fixed[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df if fixed is None else fixed
+
+
+def write_snapshot(df: pd.DataFrame, xlsx_path: str, read_kwargs=None) -> None:
+    """
+    Escribe el snapshot columnar de ``df`` (``xlsx_path`` leído con
+    ``read_kwargs``) junto al Excel (escritura atómica). No hace nada si
+    pyarrow no está disponible.
+    """
+    if feather is None:
+        return
+    snap = snapshot_path(xlsx_path, read_kwargs)
+    tmp = snap + ".tmp"
+    feather.write_feather(_arrow_safe(df.reset_index(drop=True)), tmp, compression="uncompressed")
+    os.replace(tmp, snap)
+
+
+def read_snapshot(xlsx_path: str, read_kwargs=None) -> pd.DataFrame:
+    """Lee el snapshot de ``xlsx_path`` (con ``read_kwargs``) con memory-map."""
+    table = feather.read_table(snapshot_path(xlsx_path, read_kwargs), memory_map=True)
+    return table.to_pandas()
+
+
+def read_excel_snapshot(xlsx_path: str, **read_kwargs) -> pd.DataFrame:
+    """
+    Sustituto de ``pd.read_excel``: usa el snapshot si está al día y, si no,
+    lee el Excel y reconstruye el snapshot para la próxima carga.
+    """
+    if is_fresh(xlsx_path, read_kwargs):
+        return read_snapshot(xlsx_path, read_kwargs)
+    df = pd.read_excel(xlsx_path, **read_kwargs)
+    try:
+        write_snapshot(df, xlsx_path, read_kwargs)
+    except (OSError, ValueError, TypeError):
+        pass  # el snapshot es sólo una optimización
+    return df
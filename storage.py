@@ -0,0 +1,744 @@
+"""
+Motores de almacenamiento para CandApp.
+
+- ``SQLiteTable``: base SQLite en modo WAL; cada alta, edición o borrado se
+  persiste como una operación por fila y Excel queda como formato de
+  importación/exportación.
+- ``JournalTable``: bitácora de mutaciones de sólo anexado (con fsync) sobre
+  un snapshot Excel (más su snapshot columnar) que un compactador en segundo
+  plano reescribe cada N operaciones o T segundos.
+
+Ambos motores exponen la misma interfaz (``is_empty``, ``load``,
+``reserve_rids``, ``insert``, ``update``, ``delete``, ``delete_many``,
+``insert_many``, ``insert_chunks``, ``replace_all``, ``export_excel``,
+``extra_columns`` y ``drop_columns`` para migrar columnas viejas, más
+``data_version``, ``change_seq``, ``changes_since`` y ``load_rows`` para
+seguir los cambios de otros procesos). Los ``rid`` de las filas nuevas los
+reparte el motor (``reserve_rids``), así dos procesos nunca usan el mismo.
+``update`` nunca crea filas: si la fila ya no existe, o si se le pasa la
+``_version`` leída y la guardada es otra, lanza ``ConflictError`` (otro
+proceso escribió antes) sin escribir nada.
+
+Los Excel se escriben siempre a un temporal que luego se renombra, bajo un
+bloqueo de archivo consultivo (``file_lock``).
+"""
+import atexit
+import base64
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import pandas as pd
+
+from snapshot import read_excel_snapshot, write_snapshot
+VERSION_COLUMN = "_version"
+
+
+class ConflictError(Exception):
+    """
+    Otra sesión o proceso modificó la fila desde que se leyó. ``columns``
+    lista las columnas en conflicto (vacía si la fila ya no existe).
+    """
+
+    retryable = False  # la cola de escritura no debe reintentarla
+
+    def __init__(self, rid, columns=()):
+        self.rid = rid
+        self.columns = list(columns)
+        detail = ", ".join(self.columns) if self.columns else "la fila fue borrada o reescrita"
+        super().__init__(f"Conflicto de edición en la fila {rid}: {detail}")
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Bloqueo de archivo consultivo sobre ``path`` (usa ``path + ".lock"``).
+    Serializa las escrituras de varios procesos sobre el mismo archivo.
+    """
+    with open(path + ".lock", "a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def atomic_write_excel(df: pd.DataFrame, path, **to_excel_kwargs) -> None:
+    """
+    Escribe ``df`` en ``path`` de forma atómica (temporal + rename) y bajo
+    ``file_lock``, así ningún lector ve un archivo a medio escribir.
+    """
+    tmp_path = path + ".tmp.xlsx"
+    with file_lock(path):
+        df.to_excel(tmp_path, **to_excel_kwargs)
+        os.replace(tmp_path, path)
+
+
+def _quote(name: str) -> str:
+    """Cita un identificador SQL (las columnas pueden llevar tildes)."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _to_sql_value(value):
+    """
+    Convierte un valor de pandas/numpy a un tipo que sqlite3 sabe guardar.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value)
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if isinstance(value, pd.Timestamp):
+        # Las fechas sin hora se guardan como "YYYY-MM-DD", igual que antes
+        if value == value.normalize():
+            return value.strftime("%Y-%m-%d")
+        return value.isoformat()
+    if hasattr(value, "item"):  # escalares numpy
+        return value.item()
+    if isinstance(value, (str, int, float)):
+        return value
+    return str(value)
+
+
+class SQLiteTable:
+    """
+    Tabla de una base SQLite con altas, ediciones y borrados por fila.
+
+    Cada fila tiene una clave interna ``rid`` que se usa como índice del
+    DataFrame devuelto por :meth:`load`, de modo que las ediciones de la UI
+    pueden persistirse sin reescribir la tabla completa.
+
+    Con ``track_changes=True`` unos triggers anotan el ``rid`` de cada fila
+    escrita o borrada (por cualquier proceso) en la tabla ``<tabla>__cambios``,
+    de la que se conservan las últimas ``CHANGE_HISTORY`` entradas; así otro
+    proceso puede traer sólo las filas que cambiaron (:meth:`changes_since`).
+    """
+
+    CHANGE_HISTORY = 10_000
+
+    def __init__(self, db_path, table, columns, indexes=(), track_changes=False):
+        self.db_path = db_path
+        self.table = table
+        self.columns = list(columns)
+        self.track_changes = track_changes
+        self._changes = f"{table}__cambios"
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create(indexes)
+
+    def _create(self, indexes):
+        cols_sql = ", ".join(_quote(c) for c in self.columns)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {_quote(self.table)} "
+                f"(rid INTEGER PRIMARY KEY AUTOINCREMENT, {cols_sql})"
+            )
+            # Columnas nuevas en tablas creadas por versiones anteriores
+            existing = {r[1] for r in self._conn.execute(f"PRAGMA table_info({_quote(self.table)})")}
+            for col in self.columns:
+                if col not in existing:
+                    self._conn.execute(f"ALTER TABLE {_quote(self.table)} ADD COLUMN {_quote(col)}")
+            # Contador de rid (AUTOINCREMENT) desde el que reparte reserve_rids
+            self._conn.execute(
+                f"INSERT INTO sqlite_sequence (name, seq) "
+                f"SELECT ?, COALESCE(MAX(rid), 0) FROM {_quote(self.table)} "
+                f"WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)",
+                (self.table, self.table),
+            )
+            for col in indexes:
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {_quote(f'idx_{self.table}_{col}')} "
+                    f"ON {_quote(self.table)} ({_quote(col)})"
+                )
+            if self.track_changes:
+                self._create_change_tracking()
+
+    def _create_change_tracking(self):
+        table, changes = _quote(self.table), _quote(self._changes)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {changes} "
+            f"(seq INTEGER PRIMARY KEY AUTOINCREMENT, rid INTEGER NOT NULL)"
+        )
+        for event, ref in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            self._conn.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {_quote(f'{self._changes}_{event.lower()}')} "
+                f"AFTER {event} ON {table} BEGIN "
+                f"INSERT INTO {changes} (rid) VALUES ({ref}.rid); END"
+            )
+        # Poda dentro de la misma transacción cada 1000 entradas
+        self._conn.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {_quote(f'{self._changes}_poda')} "
+            f"AFTER INSERT ON {changes} WHEN NEW.seq % 1000 = 0 BEGIN "
+            f"DELETE FROM {changes} WHERE seq <= NEW.seq - {int(self.CHANGE_HISTORY)}; END"
+        )
+
+    def is_empty(self) -> bool:
+        """Indica si la tabla no tiene filas."""
+        with self._lock:
+            cur = self._conn.execute(f"SELECT 1 FROM {_quote(self.table)} LIMIT 1")
+            return cur.fetchone() is None
+
+    def extra_columns(self) -> list:
+        """
+        Columnas de la tabla que no están en ``columns`` (dejadas por
+        versiones anteriores). Se pueden leer con :meth:`load`.
+        """
+        with self._lock:
+            existing = [r[1] for r in self._conn.execute(f"PRAGMA table_info({_quote(self.table)})")]
+        return [c for c in existing if c != "rid" and c not in self.columns]
+
+    def drop_columns(self, columns) -> None:
+        """Borra las columnas ``columns`` (de :meth:`extra_columns`)."""
+        with self._lock, self._conn:
+            for col in columns:
+                try:
+                    self._conn.execute(f"ALTER TABLE {_quote(self.table)} DROP COLUMN {_quote(col)}")
+                except sqlite3.OperationalError:  # SQLite < 3.35: al menos se vacía
+                    self._conn.execute(f"UPDATE {_quote(self.table)} SET {_quote(col)} = NULL")
+
+    def load(self, columns=None) -> pd.DataFrame:
+        """
+        Devuelve la tabla completa (o sólo ``columns``) como DataFrame
+        indexado por ``rid``.
+        """
+        columns = self.columns if columns is None else list(columns)
+        cols_sql = "".join(f", {_quote(c)}" for c in columns)
+        with self._lock:
+            cur = self._conn.execute(
+                f"SELECT rid{cols_sql} FROM {_quote(self.table)} ORDER BY rid"
+            )
+            rows = cur.fetchall()
+        df = pd.DataFrame.from_records(rows, columns=["rid"] + columns)
+        df = df.set_index("rid")
+        df.index.name = None
+        return df
+
+    def reserve_rids(self, count=1) -> int:
+        """
+        Reserva ``count`` claves ``rid`` consecutivas para filas nuevas y
+        devuelve la primera. El contador vive en la base (``sqlite_sequence``)
+        y se avanza en una transacción de escritura, así que otro proceso
+        nunca recibe las mismas.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE sqlite_sequence SET seq = seq + ? WHERE name = ?", (int(count), self.table)
+            )
+            last = self._conn.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = ?", (self.table,)
+            ).fetchone()[0]
+        return int(last) - int(count) + 1
+
+    def insert(self, row: dict, rid=None) -> int:
+        """
+        Inserta una fila nueva y devuelve su ``rid``. ``rid`` (de
+        :meth:`reserve_rids`) fija la clave; si ya existe una fila con esa
+        clave se lanza ``sqlite3.IntegrityError`` en lugar de pisarla.
+        """
+        cols = [c for c in self.columns if c in row]
+        values = [_to_sql_value(row[c]) for c in cols]
+        if rid is not None:
+            cols, values = ["rid"] + cols, [int(rid)] + values
+        cols_sql = ", ".join(_quote(c) for c in cols)
+        marks = ", ".join("?" for _ in cols)
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                f"INSERT INTO {_quote(self.table)} ({cols_sql}) VALUES ({marks})", values
+            )
+            return cur.lastrowid
+
+    def update(self, rid, row: dict, version=None) -> None:
+        """
+        Escribe las columnas de ``row`` en la fila ``rid``. Con ``version``
+        sólo se escribe si la ``_version`` guardada sigue siendo ésa. Si no,
+        o si la fila ya no existe, lanza ``ConflictError`` y no escribe nada.
+        """
+        cols = [c for c in self.columns if c in row]
+        sets = ", ".join(f"{_quote(c)}=?" for c in cols) or "rid=rid"
+        params = [_to_sql_value(row[c]) for c in cols] + [int(rid)]
+        where = "rid=?"
+        if version is not None:
+            where += f" AND CAST(COALESCE({_quote(VERSION_COLUMN)}, 0) AS INTEGER)=?"
+            params.append(int(version))
+        with self._lock, self._conn:
+            cur = self._conn.execute(f"UPDATE {_quote(self.table)} SET {sets} WHERE {where}", params)
+            if cur.rowcount == 0:
+                raise ConflictError(rid)
+
+    def delete(self, rid) -> None:
+        """Borra la fila ``rid``."""
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {_quote(self.table)} WHERE rid=?", (int(rid),))
+
+    def insert_many(self, df: pd.DataFrame, keep_rid=False) -> None:
+        """
+        Inserta todas las filas de ``df`` en una única transacción.
+        Las columnas que falten en ``df`` se guardan vacías. Con
+        ``keep_rid=True`` el índice de ``df`` se usa como ``rid`` (y una fila
+        con el mismo ``rid`` se reemplaza).
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(self._insert_sql(keep_rid), self._records(df, keep_rid))
+
+    def insert_chunks(self, chunks) -> int:
+        """
+        Inserta una secuencia de DataFrames (indexados por ``rid``, de
+        :meth:`reserve_rids`) de forma atómica. Cada bloque se escribe en una
+        tabla temporal de esta conexión en cuanto llega, así en memoria queda
+        sólo el bloque en curso y la tabla no se bloquea mientras se generan;
+        al final todos pasan a la tabla en una única transacción. Si un
+        bloque falla (o el generador, o un ``rid`` que ya existe) no queda
+        ninguno guardado. Devuelve la cantidad de filas insertadas.
+        """
+        staging = "temp." + _quote(f"{self.table}__alta_{uuid.uuid4().hex}")
+        cols_sql = ", ".join(_quote(c) for c in ["rid"] + self.columns)
+        marks = ", ".join("?" for _ in range(len(self.columns) + 1))
+        total = 0
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"CREATE TABLE {staging} AS SELECT {cols_sql} FROM {_quote(self.table)} WHERE 0"
+            )
+        try:
+            for df in chunks:
+                with self._lock, self._conn:
+                    self._conn.executemany(
+                        f"INSERT INTO {staging} ({cols_sql}) VALUES ({marks})", self._records(df, True)
+                    )
+                total += len(df)
+            with self._lock, self._conn:
+                self._conn.execute(
+                    f"INSERT INTO {_quote(self.table)} ({cols_sql}) "
+                    f"SELECT {cols_sql} FROM {staging} ORDER BY rid"
+                )
+        finally:
+            with self._lock, self._conn:
+                self._conn.execute(f"DROP TABLE IF EXISTS {staging}")
+        return total
+
+    def _insert_sql(self, keep_rid, replace=True) -> str:
+        cols = (["rid"] if keep_rid else []) + self.columns
+        cols_sql = ", ".join(_quote(c) for c in cols)
+        marks = ", ".join("?" for _ in cols)
+        verb = "INSERT OR REPLACE" if keep_rid and replace else "INSERT"
+        return f"{verb} INTO {_quote(self.table)} ({cols_sql}) VALUES ({marks})"
+
+    def _records(self, df, keep_rid):
+        return (
+            ([int(rid)] if keep_rid else []) + [_to_sql_value(row.get(c, "")) for c in self.columns]
+            for rid, row in zip(df.index, df.to_dict("records"))
+        )
+
+    def delete_many(self, rids) -> None:
+        """Borra varias filas en una única transacción."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"DELETE FROM {_quote(self.table)} WHERE rid=?", [(int(r),) for r in rids]
+            )
+
+    def replace_all(self, df: pd.DataFrame) -> None:
+        """Reemplaza el contenido completo por ``df`` (indexado por ``rid``) en una transacción."""
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {_quote(self.table)}")
+            self._conn.executemany(self._insert_sql(True), self._records(df, True))
+
+    def export_excel(self, path) -> None:
+        """Exporta la tabla completa a un archivo Excel."""
+        atomic_write_excel(self.load(), path, index=False)
+
+    # ------------------------------------------------------------------
+    # Cambios de otros procesos
+    # ------------------------------------------------------------------
+    def data_version(self) -> int:
+        """
+        Contador O(1) de SQLite que cambia cuando otra conexión (otro
+        proceso) confirma una escritura en la base; las escrituras propias
+        no lo mueven.
+        """
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def change_seq(self) -> int:
+        """Última secuencia anotada en la tabla de cambios (0 si no hay)."""
+        if not self.track_changes:
+            return 0
+        with self._lock:
+            value = self._conn.execute(f"SELECT MAX(seq) FROM {_quote(self._changes)}").fetchone()[0]
+        return int(value or 0)
+
+    def changes_since(self, seq, limit=None):
+        """
+        Devuelve ``(rids, seq_nueva)``: las filas escritas o borradas después
+        de la secuencia ``seq``. Devuelve ``None`` si esas entradas ya se
+        podaron o si son más de ``limit`` filas: conviene releer la tabla.
+        """
+        if not self.track_changes:
+            return [], seq
+        changes = _quote(self._changes)
+        with self._lock:
+            first, last = self._conn.execute(f"SELECT MIN(seq), MAX(seq) FROM {changes}").fetchone()
+            if last is None or last <= seq:
+                return [], seq
+            if first > seq + 1:
+                return None
+            sql = f"SELECT DISTINCT rid FROM {changes} WHERE seq > ? AND seq <= ?"
+            params = [int(seq), int(last)]
+            if limit is not None:
+                sql += " LIMIT ?"
+                params.append(int(limit) + 1)
+            rids = [r[0] for r in self._conn.execute(sql, params)]
+        if limit is not None and len(rids) > limit:
+            return None
+        return rids, int(last)
+
+    def load_rows(self, rids, columns=None) -> pd.DataFrame:
+        """Filas ``rids`` que todavía existen (o sólo sus ``columns``), indexadas por ``rid``."""
+        columns = self.columns if columns is None else list(columns)
+        cols_sql = "".join(f", {_quote(c)}" for c in columns)
+        rids = [int(r) for r in rids]
+        rows = []
+        with self._lock:
+            for start in range(0, len(rids), 500):  # límite de parámetros de SQLite
+                batch = rids[start:start + 500]
+                marks = ", ".join("?" for _ in batch)
+                rows += self._conn.execute(
+                    f"SELECT rid{cols_sql} FROM {_quote(self.table)} WHERE rid IN ({marks}) ORDER BY rid",
+                    batch,
+                ).fetchall()
+        df = pd.DataFrame.from_records(rows, columns=["rid"] + columns)
+        df = df.set_index("rid")
+        df.index.name = None
+        return df
+
+
+def _encode_journal_value(value):
+    """Serializa un valor para la bitácora (los bytes van en base64)."""
+    value = _to_sql_value(value)
+    if isinstance(value, bytes):
+        return {"__b64__": base64.b64encode(value).decode("ascii")}
+    return value
+
+
+def _decode_journal_value(value):
+    """Operación inversa de :func:`_encode_journal_value`."""
+    if isinstance(value, dict) and "__b64__" in value:
+        return base64.b64decode(value["__b64__"])
+    return value
+
+
+class JournalTable:
+    """
+    Tabla respaldada por un snapshot Excel más una bitácora de mutaciones.
+
+    Cada alta, edición o borrado se anexa como una línea JSON y se hace fsync,
+    así que escribir cuesta O(1) sin importar el tamaño de la tabla. Un hilo
+    compactador vuelca el estado al snapshot cada ``compact_every``
+    operaciones o ``compact_interval`` segundos. Al arrancar se carga el
+    último snapshot y se reaplica la cola de la bitácora, lo que da
+    recuperación ante caídas.
+    """
+
+    RID_COLUMN = "_rid"
+
+    def __init__(self, snapshot_path, columns, compact_every=200, compact_interval=60.0):
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path + ".journal"
+        self.columns = list(columns)
+        self.compact_every = compact_every
+        self.compact_interval = compact_interval
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._rows = {}
+        self._extra = []  # columnas del snapshot que no están en ``columns``
+        self._next_rid = 1
+        self._pending_ops = 0
+        self._wakeup = threading.Event()
+        self._recover()
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._compactor = threading.Thread(target=self._compact_loop, daemon=True)
+        self._compactor.start()
+        atexit.register(self.compact)
+
+    # ------------------------------------------------------------------
+    # Recuperación
+    # ------------------------------------------------------------------
+    def _recover(self):
+        if os.path.exists(self.snapshot_path):
+            df = read_excel_snapshot(self.snapshot_path)
+            if self.RID_COLUMN in df.columns:
+                rids = df.pop(self.RID_COLUMN).astype(int).tolist()
+            else:
+                rids = list(range(1, len(df) + 1))
+            # Las columnas de versiones anteriores se conservan hasta drop_columns
+            self._extra = [c for c in df.columns if c not in self.columns]
+            for rid, row in zip(rids, df.to_dict("records")):
+                self._rows[rid] = {c: row.get(c, "") for c in self.columns + self._extra}
+            self._next_rid = max(rids, default=0) + 1
+        # ".old" existe si una compactación se interrumpió a mitad de camino
+        for path in (self.journal_path + ".old", self.journal_path):
+            if os.path.exists(path):
+                self._replay(path)
+
+    def _replay(self, path):
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # última línea truncada por una caída
+                self._apply(record)
+                self._pending_ops += 1
+
+    def _apply(self, record):
+        rid = record["rid"]
+        if record["op"] == "delete":
+            self._rows.pop(rid, None)
+        else:
+            row = self._rows.setdefault(rid, {c: "" for c in self.columns})
+            row.update({k: _decode_journal_value(v) for k, v in record["row"].items()})
+        self._next_rid = max(self._next_rid, rid + 1)
+
+    # ------------------------------------------------------------------
+    # Interfaz común con SQLiteTable
+    # ------------------------------------------------------------------
+    def is_empty(self) -> bool:
+        """Indica si la tabla no tiene filas."""
+        with self._lock:
+            return not self._rows
+
+    def extra_columns(self) -> list:
+        """
+        Columnas del snapshot que no están en ``columns`` (dejadas por
+        versiones anteriores). Se pueden leer con :meth:`load`.
+        """
+        return list(self._extra)
+
+    def drop_columns(self, columns) -> None:
+        """Quita las columnas ``columns`` y reescribe el snapshot sin ellas."""
+        with self._lock:
+            for row in self._rows.values():
+                for col in columns:
+                    row.pop(col, None)
+            self._extra = [c for c in self._extra if c not in columns]
+            self._pending_ops += 1
+        self.compact()
+
+    def load(self, columns=None) -> pd.DataFrame:
+        """Devuelve el estado actual (o sólo ``columns``) indexado por ``rid``."""
+        columns = self.columns if columns is None else list(columns)
+        with self._lock:
+            rids = sorted(self._rows)
+            records = [[self._rows[r].get(c) for c in columns] for r in rids]
+        return pd.DataFrame.from_records(records, index=rids, columns=columns)
+
+    def reserve_rids(self, count=1) -> int:
+        """Reserva ``count`` claves ``rid`` consecutivas y devuelve la primera."""
+        with self._lock:
+            first = self._next_rid
+            self._next_rid += int(count)
+            return first
+
+    def insert(self, row: dict, rid=None) -> int:
+        """Anexa un alta (con ``rid`` de :meth:`reserve_rids` o uno nuevo) y devuelve el ``rid``."""
+        with self._lock:
+            if rid is None:
+                rid = self.reserve_rids()
+            elif int(rid) in self._rows:
+                raise ValueError(f"Ya existe una fila con rid {rid}")
+            self._append(self._upsert_record(rid, row))
+            return int(rid)
+
+    def update(self, rid, row: dict, version=None) -> None:
+        """
+        Anexa la edición de la fila ``rid`` (mismo control de ``version`` y
+        de fila inexistente que :meth:`SQLiteTable.update`).
+        """
+        with self._lock:
+            current = self._rows.get(int(rid))
+            if current is None:
+                raise ConflictError(rid)
+            if version is not None and int(_to_sql_value(current.get(VERSION_COLUMN)) or 0) != int(version):
+                raise ConflictError(rid)
+            self._append(self._upsert_record(rid, row))
+
+    def _upsert_record(self, rid, row: dict) -> dict:
+        return {
+            "op": "upsert",
+            "rid": int(rid),
+            "row": {c: _encode_journal_value(row[c]) for c in self.columns if c in row},
+        }
+
+    def delete(self, rid) -> None:
+        """Anexa el borrado de la fila ``rid``."""
+        with self._lock:
+            self._append({"op": "delete", "rid": int(rid)})
+
+    def delete_many(self, rids) -> None:
+        """Anexa el borrado de varias filas con un único fsync."""
+        with self._lock:
+            self._append_many([{"op": "delete", "rid": int(r)} for r in rids])
+
+    def insert_many(self, df: pd.DataFrame, keep_rid=False) -> None:
+        """Carga ``df`` completo y lo deja directamente en el snapshot."""
+        with self._lock:
+            for rid, row in zip(df.index, df.to_dict("records")):
+                self._apply({"op": "upsert", "rid": int(rid) if keep_rid else self._next_rid,
+                             "row": {c: row.get(c, "") for c in self.columns}})
+            self._pending_ops += 1
+        self.compact()
+
+    def insert_chunks(self, chunks) -> int:
+        """
+        Anexa una secuencia de DataFrames (indexados por ``rid``) a la
+        bitácora. Cada bloque se escribe en una bitácora temporal en cuanto
+        llega (en memoria queda sólo el bloque en curso) y al terminar se
+        copia a la bitácora con un único fsync: si un bloque falla no queda
+        ninguno. Devuelve la cantidad de filas.
+        """
+        folder = os.path.dirname(os.path.abspath(self.journal_path))
+        fd, path = tempfile.mkstemp(prefix=os.path.basename(self.journal_path) + ".", suffix=".alta",
+                                    dir=folder)
+        total = 0
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as staging:
+                for df in chunks:
+                    for rid, row in zip(df.index, df.to_dict("records")):
+                        record = {"op": "upsert", "rid": int(rid),
+                                  "row": {c: _encode_journal_value(row.get(c, "")) for c in self.columns}}
+                        staging.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    total += len(df)
+            with self._lock, open(path, encoding="utf-8") as staging:
+                shutil.copyfileobj(staging, self._journal)
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+                staging.seek(0)
+                for line in staging:
+                    self._apply(json.loads(line))
+                self._pending_ops += total
+                if self._pending_ops >= self.compact_every:
+                    self._wakeup.set()
+        finally:
+            os.remove(path)
+        return total
+
+    def replace_all(self, df: pd.DataFrame) -> None:
+        """
+        Reemplaza el contenido completo por ``df`` (indexado por ``rid``):
+        se anexan el borrado de todas las filas y el alta de las nuevas con
+        un único fsync.
+        """
+        with self._lock:
+            records = [{"op": "delete", "rid": rid} for rid in self._rows]
+            records.extend(
+                {"op": "upsert", "rid": int(rid),
+                 "row": {c: _encode_journal_value(row.get(c, "")) for c in self.columns}}
+                for rid, row in zip(df.index, df.to_dict("records"))
+            )
+            self._append_many(records)
+
+    def export_excel(self, path) -> None:
+        """Exporta la tabla completa a un archivo Excel."""
+        atomic_write_excel(self.load(), path, index=False)
+
+    # La bitácora la escribe un solo proceso: no hay cambios ajenos que seguir
+    def data_version(self) -> int:
+        return 0
+
+    def change_seq(self) -> int:
+        return 0
+
+    def changes_since(self, seq, limit=None):
+        return [], seq
+
+    def load_rows(self, rids, columns=None) -> pd.DataFrame:
+        """Filas ``rids`` que todavía existen (o sólo sus ``columns``), indexadas por ``rid``."""
+        columns = self.columns if columns is None else list(columns)
+        with self._lock:
+            found = [int(r) for r in sorted(rids) if int(r) in self._rows]
+            records = [[self._rows[r].get(c) for c in columns] for r in found]
+        return pd.DataFrame.from_records(records, index=found, columns=columns)
+
+    # ------------------------------------------------------------------
+    # Bitácora y compactación
+    # ------------------------------------------------------------------
+    def _append(self, record):
+        self._append_many([record])
+
+    def _append_many(self, records):
+        for record in records:
+            self._journal.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        for record in records:
+            self._apply(record)
+        self._pending_ops += len(records)
+        if self._pending_ops >= self.compact_every:
+            self._wakeup.set()
+
+    def _rotate_journal(self):
+        old_path = self.journal_path + ".old"
+        if not os.path.exists(self.journal_path):
+            return
+        if os.path.exists(old_path):
+            # Queda una bitácora ".old" de una compactación interrumpida:
+            # se le anexa la actual para no perder ninguna de las dos.
+            with open(self.journal_path, encoding="utf-8") as src, \
+                    open(old_path, "a", encoding="utf-8") as dst:
+                dst.write(src.read())
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.remove(self.journal_path)
+        else:
+            os.replace(self.journal_path, old_path)
+
+    def _compact_loop(self):
+        while True:
+            self._wakeup.wait(self.compact_interval)
+            self._wakeup.clear()
+            self.compact()
+
+    def compact(self) -> None:
+        """
+        Vuelca el estado actual al snapshot Excel y vacía la bitácora.
+        """
+        with self._compact_lock:
+            with self._lock:
+                if not self._pending_ops:
+                    return
+                df = self.load()
+                # La bitácora vigente se conserva como ".old" hasta que el
+                # snapshot nuevo esté completo en disco; mientras tanto las
+                # escrituras siguen yendo a una bitácora nueva.
+                self._journal.close()
+                self._rotate_journal()
+                self._journal = open(self.journal_path, "a", encoding="utf-8")
+                self._pending_ops = 0
+            df.insert(0, self.RID_COLUMN, df.index)
+            atomic_write_excel(df, self.snapshot_path, index=False)
+            write_snapshot(df, self.snapshot_path)
+            if os.path.exists(self.journal_path + ".old"):
+                os.remove(self.journal_path + ".old")
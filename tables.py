@@ -0,0 +1,273 @@
+"""
+Registro de tablas de CandApp.
+
+LOTO y SIMOPS se describen con un ``TableSpec`` (columnas, esquema, índices,
+motor y archivo Excel de intercambio) y se abren a través de un único
+``TableRegistry``. Así la carga inicial, la importación desde Excel, el
+tipado, la persistencia y la exportación son el mismo código para todas las
+tablas, y cualquier mejora en ese camino les llega a todas.
+
+Las tablas de sólo lectura que vienen de un Excel mantenido fuera de la app
+(el itembook) se registran como ``ReferenceTable``: se leen una vez por
+proceso y se vuelven a leer sólo cuando cambia el archivo.
+"""
+import os
+import threading
+
+import pandas as pd
+
+from dataset import SharedDataset
+from schema import apply_schema
+from snapshot import read_excel_snapshot, write_snapshot
+from storage import VERSION_COLUMN, JournalTable, SQLiteTable, atomic_write_excel
+
+
+class TableSpec:
+    """
+    Descripción de una tabla.
+
+    ``excel_path`` es el archivo de intercambio (y el snapshot en el motor
+    ``"journal"``); ``db_path`` la base del motor ``"sqlite"``. En el primer
+    arranque, si el Excel existe se importa (pasando por ``on_import``) y si
+    no se genera con ``seed()``.
+
+    ``preload`` son las columnas que se cargan al abrir la tabla (por defecto
+    todas, y siempre ``_version`` si existe); las demás se leen del motor la
+    primera vez que una pantalla las pide.
+
+    ``legacy_columns`` son columnas de versiones anteriores: si el motor
+    todavía las tiene, al abrirlo se pasan una vez por ``on_import`` (que las
+    convierte a las columnas actuales) y después se borran.
+    """
+
+    def __init__(self, name, columns, excel_path, db_path=None, schema=None,
+                 indexes=(), backend="sqlite", seed=None, on_import=None, preload=None,
+                 legacy_columns=()):
+        if backend not in ("sqlite", "journal"):
+            raise ValueError(f"Motor de persistencia no soportado: {backend}")
+        self.name = name
+        self.columns = list(columns)
+        self.excel_path = excel_path
+        self.db_path = db_path or os.path.splitext(excel_path)[0] + ".db"
+        self.schema = schema or {}
+        self.indexes = list(indexes)
+        self.backend = backend
+        self.seed = seed
+        self.on_import = on_import
+        self.legacy_columns = list(legacy_columns)
+        if preload is None:
+            self.preload = list(self.columns)
+        else:
+            self.preload = [c for c in self.columns if c in preload or c == VERSION_COLUMN]
+
+
+class ReferenceTable:
+    """
+    Tabla de sólo lectura cargada desde el Excel ``path`` y compartida por
+    todas las sesiones.
+
+    ``transform(df)`` normaliza lo leído (nombres de columna, tipos) y
+    ``schema`` se aplica después. Se indexa por ``key`` (búsqueda de una fila
+    por clave) y por cada columna de ``group_by`` (filas de un grupo sin
+    recorrer la tabla). En cada acceso se compara el mtime/tamaño del archivo
+    y, si cambió, se recarga; ``version`` aumenta con cada recarga.
+    ``reader(path, **read_kwargs)`` lee el Excel (p. ej. ``ExcelCache.read``).
+    """
+
+    def __init__(self, name, path, key, columns=(), group_by=(), schema=None,
+                 transform=None, reader=read_excel_snapshot, **read_kwargs):
+        self.name = name
+        self.path = path
+        self.key = key
+        self.reader = reader
+        self.columns = list(columns)
+        self.group_by = list(group_by)
+        self.schema = schema or {}
+        self.transform = transform
+        self.read_kwargs = read_kwargs
+        self.version = 0
+        self._stamp = None
+        self._df = None
+        self._positions = None
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """Tabla vigente (referencia compartida, no modificar)."""
+        self._refresh()
+        return self._df
+
+    def get(self, key):
+        """Fila (Series) con clave ``key`` o ``None`` si no existe."""
+        self._refresh()
+        pos = self._positions.index.get_indexer([key])[0]
+        return None if pos < 0 else self._df.iloc[self._positions.iloc[pos]]
+
+    def groups(self, column) -> list:
+        """Valores distintos de la columna indexada ``column``, ordenados."""
+        self._refresh()
+        return sorted(self._groups[column], key=str)
+
+    def group(self, column, value) -> pd.DataFrame:
+        """Filas cuyo ``column`` (una de ``group_by``) vale ``value``."""
+        self._refresh()
+        positions = self._groups[column].get(value)
+        if positions is None:
+            return self._df.iloc[0:0]
+        return self._df.iloc[positions]
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _refresh(self) -> None:
+        stamp = self._stat()
+        if self._df is not None and stamp == self._stamp:
+            return
+        with self._lock:
+            if self._df is not None and stamp == self._stamp:
+                return
+            if stamp is None:
+                df = pd.DataFrame(columns=self.columns)
+            else:
+                df = self.reader(self.path, **self.read_kwargs)
+                if self.transform is not None:
+                    df = self.transform(df)
+            df = apply_schema(df.reset_index(drop=True), self.schema)
+            # clave -> posición; con claves repetidas get() devuelve la primera
+            positions = pd.Series(range(len(df)), index=df[self.key])
+            self._positions = positions[~positions.index.duplicated()]
+            self._groups = {
+                col: df.groupby(col, observed=True, sort=False).indices for col in self.group_by
+            }
+            self._df, self._stamp = df, stamp
+            self.version += 1
+
+
+class TableRegistry:
+    """
+    Abre (una vez por proceso) el motor y el ``SharedDataset`` de cada tabla
+    registrada y guarda las tablas de referencia (``references``).
+    ``writer`` es la cola de escritura diferida compartida; las opciones
+    ``compact_*`` se usan en las tablas con motor ``"journal"``.
+    ``reader(path)`` lee los Excel a importar (p. ej. ``ExcelCache.read``),
+    ``changelog`` anota los cambios de los datasets para los respaldos y
+    ``feed`` los publica como eventos (ver :mod:`cdc`).
+    """
+
+    def __init__(self, specs, references=(), writer=None, compact_every=200,
+                 compact_interval=60.0, reader=read_excel_snapshot, changelog=None,
+                 feed=None):
+        self.specs = {spec.name: spec for spec in specs}
+        self.references = {ref.name: ref for ref in references}
+        self.writer = writer
+        self.reader = reader
+        self.changelog = changelog
+        self.feed = feed
+        self.compact_every = compact_every
+        self.compact_interval = compact_interval
+        self._stores = {}
+        self._datasets = {}
+        self._lock = threading.RLock()
+
+    def store(self, name):
+        """Motor de persistencia de la tabla ``name``."""
+        with self._lock:
+            if name not in self._stores:
+                store = self._open_store(self.specs[name])
+                self._migrate_legacy(self.specs[name], store)
+                self._stores[name] = store
+            return self._stores[name]
+
+    def dataset(self, name) -> SharedDataset:
+        """``SharedDataset`` de la tabla ``name`` (se carga la primera vez)."""
+        with self._lock:
+            if name not in self._datasets:
+                spec = self.specs[name]
+                store = self.store(name)
+                self._import_initial(spec, store)
+                seq = store.change_seq()  # antes de leer: traer de más en sync() es inocuo
+                self._datasets[name] = SharedDataset(
+                    store, self.load(name, spec.preload), schema=spec.schema,
+                    writer=self.writer, name=name, changelog=self.changelog,
+                    feed=self.feed, columns=spec.columns, seq=seq,
+                )
+            return self._datasets[name]
+
+    def reference(self, name) -> ReferenceTable:
+        """Tabla de referencia (sólo lectura) ``name``."""
+        return self.references[name]
+
+    def load(self, name, columns=None):
+        """
+        Lee la tabla ``name`` (completa o sólo ``columns``) desde su motor,
+        ya tipada. Si el motor está vacío, primero importa el Excel o genera
+        los datos de ejemplo.
+        """
+        spec = self.specs[name]
+        store = self.store(name)
+        self._import_initial(spec, store)
+        return apply_schema(store.load(columns), spec.schema)
+
+    def export(self, name, df=None) -> None:
+        """
+        Exporta la tabla ``name`` a su Excel de intercambio (y actualiza el
+        snapshot columnar). En el motor ``"journal"`` el Excel es el snapshot,
+        así que se fuerza una compactación.
+        """
+        spec = self.specs[name]
+        store = self.store(name)
+        if spec.backend == "journal":
+            store.compact()
+            return
+        if df is None:
+            df = self.dataset(name).table()
+        atomic_write_excel(df, spec.excel_path, index=False)
+        write_snapshot(df, spec.excel_path)
+
+    def _open_store(self, spec):
+        if spec.backend == "journal":
+            return JournalTable(spec.excel_path, spec.columns,
+                                compact_every=self.compact_every,
+                                compact_interval=self.compact_interval)
+        return SQLiteTable(spec.db_path, spec.name, spec.columns, indexes=spec.indexes,
+                           track_changes=True)
+
+    def _migrate_legacy(self, spec, store) -> None:
+        """
+        Migración única de las ``legacy_columns`` que queden en el motor:
+        ``on_import`` completa las columnas actuales a partir de ellas, las
+        filas que cambiaron se reescriben y las columnas viejas se borran.
+        Se puede repetir sin efecto si se interrumpe a mitad de camino.
+        """
+        legacy = [c for c in store.extra_columns() if c in spec.legacy_columns]
+        if not legacy:
+            return
+        if spec.on_import is not None and not store.is_empty():
+            df = store.load(spec.columns + legacy)
+            migrated = spec.on_import(df.copy()).reindex(columns=spec.columns)
+            current = df[spec.columns]
+            if not (migrated.isna() & current.isna() | (migrated == current)).all(axis=None):
+                store.replace_all(migrated)
+        store.drop_columns(legacy)
+
+    def _import_initial(self, spec, store) -> None:
+        if store.is_empty():
+            df = self._initial_data(spec)
+            if df is not None and not df.empty:
+                store.insert_many(df)
+
+    def _initial_data(self, spec):
+        if os.path.exists(spec.excel_path):
+            df = self.reader(spec.excel_path)
+            # el lector puede devolver un DataFrame compartido: on_import trabaja sobre una copia
+            return spec.on_import(df.copy()) if spec.on_import else df
+        if spec.seed is None:
+            return None
+        df = spec.seed()
+        atomic_write_excel(df, spec.excel_path, index=False)
+        return df
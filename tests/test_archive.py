@@ -0,0 +1,44 @@
+import pandas as pd
+
+from archive import PartitionedArchive
+from dataset import SharedDataset
+from schema import apply_schema
+from storage import SQLiteTable
+
+COLUMNS = ["NoCandado", "Estado", "Fecha", "_version"]
+SCHEMA = {"Fecha": "datetime64[ns]", "_version": "int64"}
+
+
+def test_archive_then_delete_moves_only_rows_that_still_qualify(tmp_path):
+    store = SQLiteTable(str(tmp_path / "candados.db"), "candados", COLUMNS)
+    dataset = SharedDataset(store, apply_schema(store.load(), SCHEMA), schema=SCHEMA)
+    archive = PartitionedArchive(str(tmp_path / "archivo"), "candados", COLUMNS)
+    old = [dataset.insert({"NoCandado": f"A{i}", "Estado": "Inactivo", "Fecha": f"2023-0{i + 1}-15"})
+           for i in range(3)]
+    active = dataset.insert({"NoCandado": "B1", "Estado": "Activo", "Fecha": "2023-01-20"})
+
+    def qualifies(rows):
+        return rows["Estado"] == "Inactivo"
+
+    df = dataset.project(["Estado"])
+    candidates = df[qualifies(df)].index
+    dataset.update(old[0], {"Estado": "Activo"})  # reactivado entre la lectura y el archivo
+    moved = dataset.delete_many(candidates, check=qualifies, before_delete=archive.archive)
+
+    assert moved == old[1:]
+    assert archive.partitions() == ["2023-02", "2023-03"]
+    archived = archive.load_range("2023-01-01", "2023-12-31")
+    assert sorted(archived.index) == old[1:]
+    assert sorted(store.load().index) == [old[0], active]
+    # Ninguna fila queda en los dos lados ni se pierde
+    assert set(archived.index).isdisjoint(store.load().index)
+
+
+def test_load_range_only_returns_rows_in_the_window(tmp_path):
+    archive = PartitionedArchive(str(tmp_path / "archivo"), "candados", COLUMNS)
+    archive.archive(pd.DataFrame({"NoCandado": ["A", "B", "C"], "Estado": "Inactivo",
+                                  "Fecha": ["2023-01-31", "2023-02-01", "2023-03-01"]},
+                                 index=[1, 2, 3]))
+
+    assert archive.load_range("2023-01-15", "2023-02-01").index.tolist() == [1, 2]
+    assert archive.load_range("2024-01-01", "2024-12-31").empty
@@ -0,0 +1,59 @@
+import pytest
+
+from backup import BackupManager
+from changelog import ChangeLog
+from dataset import SharedDataset
+from storage import SQLiteTable
+
+COLUMNS = ["NoCandado", "Estado"]
+
+
+class Clock:
+    """Reloj manual para anotar cambios y respaldos en instantes conocidos."""
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(100.0)
+    monkeypatch.setattr("time.time", clock)
+    return clock
+
+
+def test_restore_to_a_timestamp_replays_changes_up_to_it(tmp_path, clock):
+    store = SQLiteTable(str(tmp_path / "candados.db"), "candados", COLUMNS)
+    changelog = ChangeLog(str(tmp_path / "cambios.db"))
+    dataset = SharedDataset(store, store.load(), changelog=changelog, name="candados")
+    backups = BackupManager(str(tmp_path / "respaldos"), changelog,
+                            {"candados": (store.load, COLUMNS)}, full_every=10_000)
+
+    a = dataset.insert({"NoCandado": "A1", "Estado": "Activo"})
+    clock.now = 150.0
+    backups.backup("candados")  # completo: sólo A1
+    clock.now = 200.0
+    b = dataset.insert({"NoCandado": "B1", "Estado": "Activo"})
+    clock.now = 300.0
+    dataset.update(a, {"Estado": "Inactivo"})
+    clock.now = 400.0
+    dataset.delete(b)
+    clock.now = 450.0
+    backups.backup("candados")  # incremental: segmento con los tres cambios
+    clock.now = 500.0
+    dataset.update(a, {"Estado": "Activo"})  # sólo en el registro vivo
+
+    def at(ts):
+        return backups.restore("candados", ts).to_dict("index")
+
+    assert at(150) == {a: {"NoCandado": "A1", "Estado": "Activo"}}
+    assert at(250) == {a: {"NoCandado": "A1", "Estado": "Activo"},
+                       b: {"NoCandado": "B1", "Estado": "Activo"}}
+    assert at(300)[a]["Estado"] == "Inactivo"
+    assert list(at(400)) == [a]
+    assert at(600)[a]["Estado"] == "Activo"
+    with pytest.raises(ValueError):
+        backups.restore("candados", 120)
@@ -0,0 +1,43 @@
+import io
+
+import pandas as pd
+import pytest
+
+from bulk_import import ImportValidationError, iter_chunks, validate_chunk
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-8-sig", "cp1252"])
+def test_csv_is_read_in_utf8_or_spanish_excel_encoding(encoding):
+    data = "NoCandado,Área\nA1,Compresión\n".encode(encoding)
+
+    chunks = list(iter_chunks(io.BytesIO(data), "inventario.csv"))
+
+    assert chunks[0].columns.tolist() == ["NoCandado", "Área"]
+    assert chunks[0].at[0, "Área"] == "Compresión"
+
+
+def test_excel_is_read_in_chunks_numbered_by_data_row(tmp_path):
+    path = str(tmp_path / "inventario.xlsx")
+    pd.DataFrame({"NoCandado": [f"C{i}" for i in range(5)]}).to_excel(path, index=False)
+
+    chunks = list(iter_chunks(path, path, chunk_size=2))
+
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    assert chunks[-1].index.tolist() == [4]
+    assert chunks[-1].at[4, "NoCandado"] == "C4"
+
+
+def test_validate_chunk_reports_excel_row_numbers():
+    raw = pd.DataFrame({"NoCandado": ["A1", None, "A3"], "Estado": ["activo", "Activo", "Roto"],
+                        "Valor": ["10", "x", "5"]})
+
+    valid, errors = validate_chunk(raw, ["NoCandado", "Estado", "Valor", "Fecha"])
+
+    assert valid["NoCandado"].tolist() == ["A1"]
+    assert valid.at[0, "Estado"] == "Activo"
+    assert errors == [(3, "NoCandado vacío"), (4, "Estado debe ser Activo o Inactivo")]
+
+
+def test_invalid_column_set_fails_before_any_row():
+    with pytest.raises(ImportValidationError):
+        validate_chunk(pd.DataFrame({"Area": ["Tanques"]}), ["NoCandado", "Area"])
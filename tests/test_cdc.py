@@ -0,0 +1,27 @@
+from cdc import ChangeFeed
+
+
+def test_reader_resumes_from_its_cursor(tmp_path):
+    feed = ChangeFeed(str(tmp_path))
+    feed.record_many("candados", [("insert", 1, {"NoCandado": "A1"}), ("upsert", 1, {"Estado": "Inactivo"})])
+
+    events, cursor = feed.read()
+    feed.record_many("candados", [("delete", 1, None)])
+    more, _ = feed.read(cursor)
+
+    assert [e["op"] for e in events] == ["insert", "update"]
+    assert events[0]["data"] == {"NoCandado": "A1"}
+    assert more == [{"ts": more[0]["ts"], "table": "candados", "op": "delete", "rid": 1}]
+
+
+def test_old_segments_are_dropped_and_stale_cursors_skip_ahead(tmp_path):
+    feed = ChangeFeed(str(tmp_path), max_bytes=1, keep_segments=2)
+    stale = feed.start_cursor()
+    for rid in range(1, 5):
+        feed.record_many("simops", [("insert", rid, {"SIMOPS_ID": rid})])
+
+    events, cursor = feed.read(stale)
+
+    assert [e["rid"] for e in events] == [3, 4]
+    assert feed.read(cursor) == ([], cursor)
+    assert feed.read(feed.end_cursor())[0] == []
@@ -0,0 +1,301 @@
+import pandas as pd
+import pytest
+
+from dataset import SessionView, SharedDataset
+from schema import apply_schema
+from storage import ConflictError, SQLiteTable
+
+COLUMNS = ["NoCandado", "Area", "Estado", "_version"]
+SCHEMA = {"Estado": "category", "_version": "int64"}
+
+
+class ManualQueue:
+    """Cola diferida mínima: persiste sólo en ``flush``/``flush_key``."""
+
+    def __init__(self):
+        self.pending = {}
+
+    def submit(self, key, payload, apply, merge=None):
+        if key in self.pending and merge is not None:
+            payload = merge(self.pending[key][0], payload)
+        self.pending[key] = (payload, apply)
+
+    def flush_key(self, key):
+        if key in self.pending:
+            payload, apply = self.pending.pop(key)
+            apply(payload)
+
+    def flush(self):
+        for key in list(self.pending):
+            self.flush_key(key)
+
+
+def open_dataset(db_path, writer=None, name="candados"):
+    """Un ``SharedDataset`` como el de un proceso de Streamlit."""
+    store = SQLiteTable(db_path, "candados", COLUMNS, track_changes=True)
+    seq = store.change_seq()
+    return SharedDataset(store, apply_schema(store.load(), SCHEMA), schema=SCHEMA,
+                         writer=writer, name=name, seq=seq)
+
+
+def lazy_dataset(db_path):
+    """Dos candados guardados, con sólo ``NoCandado`` en memoria."""
+    store = SQLiteTable(db_path, "candados", COLUMNS, track_changes=True)
+    store.insert_many(pd.DataFrame({"NoCandado": ["A1", "A2"], "Area": ["Tanques", "Pozos"],
+                                    "Estado": "Activo", "_version": 1}))
+    seq = store.change_seq()
+    return SharedDataset(store, apply_schema(store.load(["NoCandado"]), SCHEMA),
+                         schema=SCHEMA, columns=COLUMNS, seq=seq)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "candados.db")
+
+
+def test_processes_get_distinct_rids_between_syncs(db_path):
+    writer_a, writer_b = ManualQueue(), ManualQueue()
+    a = open_dataset(db_path, writer_a)
+    b = open_dataset(db_path, writer_b)
+
+    rid_a = a.insert({"NoCandado": "A1", "Estado": "Activo"})
+    rid_b = b.insert({"NoCandado": "B1", "Estado": "Activo"})
+    writer_b.flush()
+    writer_a.flush()
+
+    assert rid_a != rid_b
+    assert a.sync() and b.sync()
+    assert sorted(a.df["NoCandado"]) == sorted(b.df["NoCandado"]) == ["A1", "B1"]
+
+
+def test_bulk_import_does_not_overwrite_other_process_rows(db_path):
+    writer = ManualQueue()
+    a = open_dataset(db_path, writer)
+    b = open_dataset(db_path)
+
+    a.insert({"NoCandado": "A1", "Estado": "Activo"})
+    writer.flush()
+    b.insert_chunks([pd.DataFrame({"NoCandado": ["B1", "B2"], "Estado": "Activo"})])
+
+    assert sorted(a.store.load()["NoCandado"]) == ["A1", "B1", "B2"]
+
+
+def test_insert_chunks_saves_nothing_when_a_chunk_fails(db_path):
+    dataset = open_dataset(db_path)
+
+    def chunks():
+        yield pd.DataFrame({"NoCandado": ["A1"], "Estado": "Activo"})
+        raise ValueError("fila inválida")
+
+    with pytest.raises(ValueError):
+        dataset.insert_chunks(chunks())
+
+    assert dataset.store.is_empty()
+    assert len(dataset.df) == 0
+
+
+def test_edit_of_queued_insert_persists_both(db_path):
+    writer = ManualQueue()
+    dataset = open_dataset(db_path, writer)
+    rid = dataset.insert({"NoCandado": "A1", "Estado": "Activo"})
+
+    dataset.update(rid, {"Estado": "Inactivo"})
+
+    row = dataset.store.load().loc[rid]
+    assert (row["NoCandado"], row["Estado"], row["_version"]) == ("A1", "Inactivo", 2)
+
+
+def test_conflicting_edit_from_other_process_is_rejected(db_path):
+    a, b = open_dataset(db_path), open_dataset(db_path)
+    rid = a.insert({"NoCandado": "A1", "Estado": "Activo"})
+    b.sync()
+    view_a, view_b = SessionView(a), SessionView(b)
+    view_a.begin_edit(rid)
+    view_b.begin_edit(rid)
+
+    view_a.stage(rid, {"Estado": "Inactivo"})
+    view_a.commit(rid)
+    view_b.stage(rid, {"Area": "Tanques"})
+    with pytest.raises(ConflictError):
+        view_b.commit(rid)
+
+    # La fila perdedora se releyó del motor: la edición de A queda visible en B
+    row = b.df.loc[rid]
+    assert (row["Estado"], row["_version"]) == ("Inactivo", 2)
+    assert a.store.load().loc[rid, "Area"] is None
+
+
+def test_edit_of_row_deleted_by_other_process_is_rejected(db_path):
+    a, b = open_dataset(db_path), open_dataset(db_path)
+    rid = a.insert({"NoCandado": "A1", "Estado": "Activo"})
+    b.sync()
+
+    a.delete(rid)
+    with pytest.raises(ConflictError):
+        b.update(rid, {"Estado": "Inactivo"})
+
+    assert a.store.is_empty()
+    assert rid not in b.df.index
+
+
+def test_sessions_merge_edits_of_different_columns(db_path):
+    dataset = open_dataset(db_path)
+    rid = dataset.insert({"NoCandado": "A1", "Area": "Tanques", "Estado": "Activo"})
+    first, second = SessionView(dataset), SessionView(dataset)
+    first.begin_edit(rid)
+    second.begin_edit(rid)
+
+    first.stage(rid, {"Estado": "Inactivo"})
+    first.commit(rid)
+    second.stage(rid, {"Area": "Sala Compresores", "Estado": "Activo"})  # Estado sin tocar
+    second.commit(rid)
+
+    row = dataset.store.load().loc[rid]
+    assert (row["Area"], row["Estado"], row["_version"]) == ("Sala Compresores", "Inactivo", 3)
+
+
+def test_sessions_editing_same_column_conflict(db_path):
+    dataset = open_dataset(db_path)
+    rid = dataset.insert({"NoCandado": "A1", "Estado": "Activo"})
+    first, second = SessionView(dataset), SessionView(dataset)
+    first.begin_edit(rid)
+    second.begin_edit(rid)
+
+    first.stage(rid, {"Estado": "Inactivo"})
+    first.commit(rid)
+    second.stage(rid, {"Estado": "Retirado"})
+    with pytest.raises(ConflictError) as err:
+        second.commit(rid)
+
+    assert err.value.columns == ["Estado"]
+    assert dataset.store.load().loc[rid, "Estado"] == "Inactivo"
+
+
+def test_rows_reads_unloaded_columns_only_for_those_rows(db_path):
+    dataset = lazy_dataset(db_path)
+
+    row = dataset.rows([2], ["NoCandado", "Area"])
+
+    assert row.to_dict("records") == [{"NoCandado": "A2", "Area": "Pozos"}]
+    assert dataset.loaded_columns == ["NoCandado"]
+
+
+def test_second_delete_of_same_row_is_a_no_op(db_path):
+    writer = ManualQueue()
+    dataset = open_dataset(db_path, writer)
+    rid = dataset.insert({"NoCandado": "A1", "Estado": "Activo"})
+
+    assert dataset.delete(rid) is True
+    assert dataset.delete(rid) is False
+    writer.flush()
+
+    assert dataset.store.is_empty()
+    assert len(dataset) == 0
+
+
+def test_editing_a_deleted_row_reports_it_without_raising(db_path):
+    dataset = open_dataset(db_path)
+    rid = dataset.insert({"NoCandado": "A1", "Estado": "Activo"})
+    view, other = SessionView(dataset), SessionView(dataset)
+    view.begin_edit(rid)
+    view.stage(rid, {"Estado": "Inactivo"})
+
+    other.delete(rid)
+
+    assert view.begin_edit(rid) is None
+    assert view.base(rid) is None
+    assert view.dirty_rows() == []
+
+
+
+def test_edit_of_unloaded_column_does_not_load_it(db_path):
+    dataset = lazy_dataset(db_path)
+    view = SessionView(dataset)
+    view.begin_edit(1)
+    view.stage(1, {"Area": "Sala Compresores"})
+    view.commit(1)
+
+    assert dataset.loaded_columns == ["NoCandado"]
+    row = dataset.store.load().loc[1]
+    assert (row["Area"], row["_version"]) == ("Sala Compresores", 2)
+
+
+def test_table_reads_missing_columns_without_keeping_them(db_path):
+    dataset = lazy_dataset(db_path)
+
+    df = dataset.table()
+
+    assert df.columns.tolist() == COLUMNS
+    assert df["Area"].tolist() == ["Tanques", "Pozos"]
+    assert dataset.loaded_columns == ["NoCandado"]
+
+
+def test_insert_chunks_writes_each_chunk_as_it_arrives(db_path):
+    dataset = open_dataset(db_path)
+    other = SQLiteTable(db_path, "candados", COLUMNS, track_changes=True)
+    seen = []
+
+    def chunks():
+        yield pd.DataFrame({"NoCandado": ["A1", "A2"], "Estado": "Activo"})
+        # El bloque anterior ya está en memoria y el motor admite otras escrituras
+        seen.append(len(dataset))
+        other.insert({"NoCandado": "B1", "_version": 1})
+        yield pd.DataFrame({"NoCandado": ["A3"], "Estado": "Activo"})
+
+    assert dataset.insert_chunks(chunks()) == 3
+    assert seen == [2]
+    assert sorted(dataset.store.load()["NoCandado"]) == ["A1", "A2", "A3", "B1"]
+
+
+def test_delete_many_rechecks_rows_under_the_lock(db_path):
+    dataset = open_dataset(db_path)
+    rids = [dataset.insert({"NoCandado": f"A{i}", "Estado": "Inactivo"}) for i in range(3)]
+    candidates = dataset.project(["Estado"]).index
+
+    # Entre la lectura y el borrado: uno se reactiva y otro lo borra otra sesión
+    dataset.update(rids[0], {"Estado": "Activo"})
+    dataset.delete(rids[1])
+    archived = []
+    deleted = dataset.delete_many(candidates, check=lambda rows: rows["Estado"] == "Inactivo",
+                                  before_delete=archived.append)
+
+    assert deleted == [rids[2]]
+    assert archived[0].index.tolist() == [rids[2]]
+    assert dataset.store.load().index.tolist() == [rids[0]]
+
+
+def test_delete_many_deletes_nothing_if_before_delete_fails(db_path):
+    dataset = open_dataset(db_path)
+    rid = dataset.insert({"NoCandado": "A1", "Estado": "Inactivo"})
+
+    def fail(rows):
+        raise OSError("archivo lleno")
+
+    with pytest.raises(OSError):
+        dataset.delete_many([rid], before_delete=fail)
+    assert dataset.store.load().index.tolist() == [rid]
+    assert len(dataset) == 1
+
+
+def test_failed_commit_keeps_the_staged_edit_for_a_retry(db_path):
+    dataset = open_dataset(db_path)
+    rid = dataset.insert({"NoCandado": "A1", "Estado": "Activo"})
+    first, second = SessionView(dataset), SessionView(dataset)
+    first.begin_edit(rid)
+    second.begin_edit(rid)
+    first.stage(rid, {"Estado": "Inactivo"})
+    first.commit(rid)
+
+    second.stage(rid, {"Estado": "Retirado", "Area": "Tanques"})
+    with pytest.raises(ConflictError):
+        second.commit(rid)
+    assert second.dirty_rows() == [rid]
+
+    # Tras releer la fila, el borrador muestra lo propio encima de lo ajeno
+    second.begin_edit(rid)
+    assert second.draft(rid)["Estado"] == "Retirado"
+    second.commit(rid)
+
+    assert second.dirty_rows() == []
+    row = dataset.store.load().loc[rid]
+    assert (row["Estado"], row["Area"]) == ("Retirado", "Tanques")
@@ -0,0 +1,18 @@
+import pandas as pd
+
+from excelcache import ExcelCache
+
+
+def test_read_options_get_their_own_entry_and_snapshot(tmp_path):
+    path = str(tmp_path / "itembook.xlsx")
+    rows = [["Itembook", None], ["tag", "SISTEMA"], ["T-1", "S-1"]]
+    pd.DataFrame(rows).to_excel(path, index=False, header=False)
+
+    first = ExcelCache()
+    assert first.read(path, header=1).columns.tolist() == ["tag", "SISTEMA"]
+    assert first.read(path).columns.tolist()[0] == "Itembook"
+
+    # Otro proceso: lee de los snapshots que dejó el primero
+    second = ExcelCache()
+    assert second.read(path).columns.tolist()[0] == "Itembook"
+    assert second.read(path, header=1).columns.tolist() == ["tag", "SISTEMA"]
@@ -0,0 +1,60 @@
+import pandas as pd
+
+from indexes import ActivityRollups, LockCounters, PostingIndex, SortedIndex
+
+
+def frame(**columns):
+    return pd.DataFrame(columns, index=range(1, len(next(iter(columns.values()))) + 1))
+
+
+def test_sorted_index_range_is_low_inclusive_high_exclusive():
+    index = SortedIndex("Fecha")
+    index.reset(frame(Fecha=pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-03", None])))
+
+    assert index.range(pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-03")) == [1, 2]
+    assert index.range(pd.Timestamp("2024-01-02")) == [2, 3]
+    assert index.range(high=pd.Timestamp("2024-01-02")) == [4, 1]  # NaT primero sin límite inferior
+    assert index.range(pd.Timestamp("2023-12-31"), pd.Timestamp("2024-01-01")) == []
+
+
+def test_sorted_index_follows_edits_and_pages_newest_first():
+    index = SortedIndex("Valor")
+    index.reset(frame(Valor=[30, 10, 20]))
+
+    index.apply(removed=frame(Valor=[30]), added=frame(Valor=[5]))
+
+    assert index.range() == [1, 2, 3]
+    assert index.page(0, 2) == [3, 2]
+    assert index.page(2, 2) == [1]
+
+
+def test_posting_index_and_counters_track_only_changed_rows():
+    postings, counters = PostingIndex("Estado"), LockCounters(alert_threshold=100)
+    df = frame(Estado=["Activo", "Activo", "Inactivo"], Valor=[50, 150, 300])
+    postings.reset(df)
+    counters.reset(df)
+
+    before, after = df.loc[[2]], df.loc[[2]].assign(Estado="Inactivo", Valor=50)
+    postings.apply(before, after)
+    counters.apply(before, after)
+
+    assert postings.lookup(["Inactivo"]) == {2, 3}
+    assert postings.values() == ["Activo", "Inactivo"]
+    assert counters.snapshot() == {"total": 3, "active": 1, "alerts": 1}
+
+
+def test_rollups_count_locks_by_registration_period_and_current_state():
+    rollups = ActivityRollups()
+    df = frame(Estado=["Activo", "Activo", "Inactivo"],
+               Fecha=pd.to_datetime(["2024-01-01", "2024-01-03", "2024-02-10"]))
+    rollups.reset(df)
+
+    # Desactivar un candado lo mueve de serie en el período en que se registró
+    rollups.apply(df.loc[[1]], df.loc[[1]].assign(Estado="Inactivo"))
+
+    months = rollups.frame("M")
+    assert months.loc["2024-01-01"].tolist() == [1, 1]
+    assert months.loc["2024-02-01"].tolist() == [0, 1]
+    weeks = rollups.frame("W", start="2024-01-03")
+    assert weeks.index[0] == pd.Timestamp("2024-01-01")  # la semana que contiene start
+    assert rollups.bounds() == (pd.Timestamp("2024-01-01"), pd.Timestamp("2024-02-10"))
@@ -0,0 +1,147 @@
+import os
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from storage import ConflictError, JournalTable, SQLiteTable
+
+COLUMNS = ["NoCandado", "Estado", "_version"]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "candados.db")
+
+
+def make_table(db_path, cls=SQLiteTable):
+    return cls(db_path, "candados", COLUMNS, track_changes=True)
+
+
+def test_reserve_rids_is_shared_between_connections(db_path):
+    first, second = make_table(db_path), make_table(db_path)
+    first.insert_many(pd.DataFrame({"NoCandado": ["A", "B"]}))
+
+    a = first.reserve_rids(3)
+    b = second.reserve_rids(2)
+    c = first.reserve_rids(1)
+
+    assert a == 3
+    assert b == 6
+    assert c == 8
+
+
+def test_reserved_rids_are_not_reused_after_delete(db_path):
+    table = make_table(db_path)
+    rid = table.insert({"NoCandado": "A"}, rid=table.reserve_rids())
+    table.delete(rid)
+
+    assert table.reserve_rids() > rid
+
+
+def test_insert_with_existing_rid_does_not_replace(db_path):
+    table = make_table(db_path)
+    rid = table.insert({"NoCandado": "A", "_version": 1}, rid=table.reserve_rids())
+
+    with pytest.raises(sqlite3.IntegrityError):
+        table.insert({"NoCandado": "B", "_version": 1}, rid=rid)
+    with pytest.raises(sqlite3.IntegrityError):
+        table.insert_chunks([pd.DataFrame({"NoCandado": ["C"]}, index=[rid])])
+
+    assert table.load()["NoCandado"].tolist() == ["A"]
+
+
+def test_update_checks_version(db_path):
+    table = make_table(db_path)
+    rid = table.insert({"NoCandado": "A", "Estado": "Activo", "_version": 1})
+
+    table.update(rid, {"Estado": "Inactivo", "_version": 2}, version=1)
+    with pytest.raises(ConflictError):
+        table.update(rid, {"Estado": "Activo", "_version": 2}, version=1)
+
+    row = table.load().loc[rid]
+    assert row["Estado"] == "Inactivo"
+    assert row["_version"] == 2
+
+
+def test_update_of_deleted_row_does_not_resurrect_it(db_path):
+    table = make_table(db_path)
+    rid = table.insert({"NoCandado": "A", "_version": 1})
+    table.delete(rid)
+
+    with pytest.raises(ConflictError):
+        table.update(rid, {"Estado": "Inactivo", "_version": 2}, version=1)
+    with pytest.raises(ConflictError):
+        table.update(rid, {"Estado": "Inactivo"})
+
+    assert table.is_empty()
+
+
+def test_changes_since_sees_other_connections(db_path):
+    reader, writer = make_table(db_path), make_table(db_path)
+    seq = reader.change_seq()
+    stamp = reader.data_version()
+
+    a = writer.insert({"NoCandado": "A"})
+    b = writer.insert({"NoCandado": "B"})
+    writer.delete(a)
+
+    assert reader.data_version() != stamp
+    rids, new_seq = reader.changes_since(seq)
+    assert sorted(rids) == [a, b]
+    assert reader.changes_since(new_seq) == ([], new_seq)
+    assert reader.load_rows(rids).index.tolist() == [b]
+
+
+def test_changes_since_reports_pruned_history(db_path):
+    class ShortHistory(SQLiteTable):
+        CHANGE_HISTORY = 10
+
+    table = make_table(db_path, ShortHistory)
+    table.insert_many(pd.DataFrame({"NoCandado": [f"C{i}" for i in range(1000)]}))
+
+    # Las entradas 1..990 se podaron: hay que releer la tabla
+    assert table.changes_since(0) is None
+    rids, seq = table.changes_since(995)
+    assert seq == 1000
+    assert sorted(rids) == list(range(996, 1001))
+
+
+def test_changes_since_limit(db_path):
+    table = make_table(db_path)
+    table.insert_many(pd.DataFrame({"NoCandado": ["A", "B", "C"]}))
+
+    assert table.changes_since(0, limit=2) is None
+    assert sorted(table.changes_since(0, limit=3)[0]) == [1, 2, 3]
+
+
+def test_journal_update_checks_version_and_existence(tmp_path):
+    table = JournalTable(str(tmp_path / "candados.xlsx"), COLUMNS, compact_interval=3600)
+    rid = table.insert({"NoCandado": "A", "_version": 1}, rid=table.reserve_rids())
+
+    with pytest.raises(ConflictError):
+        table.update(rid, {"Estado": "Inactivo", "_version": 3}, version=2)
+    with pytest.raises(ConflictError):
+        table.update(rid + 1, {"Estado": "Inactivo"})
+    table.update(rid, {"Estado": "Inactivo", "_version": 2}, version=1)
+
+    assert table.load().loc[rid, "Estado"] == "Inactivo"
+    assert table.load().index.tolist() == [rid]
+    assert table.reserve_rids() == rid + 1
+
+
+def test_journal_insert_chunks_saves_nothing_when_a_chunk_fails(tmp_path):
+    table = JournalTable(str(tmp_path / "candados.xlsx"), COLUMNS, compact_interval=3600)
+    rid = table.reserve_rids(2)
+
+    def chunks():
+        yield pd.DataFrame({"NoCandado": ["A"]}, index=[rid])
+        raise ValueError("bloque inválido")
+
+    with pytest.raises(ValueError):
+        table.insert_chunks(chunks())
+    assert table.is_empty()
+
+    assert table.insert_chunks([pd.DataFrame({"NoCandado": ["A", "B"]}, index=[rid, rid + 1])]) == 2
+    assert table.load()["NoCandado"].tolist() == ["A", "B"]
+    assert os.listdir(tmp_path) == ["candados.xlsx.journal"]
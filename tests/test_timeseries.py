@@ -0,0 +1,32 @@
+import numpy as np
+
+from timeseries import lttb, pick_resolution
+
+
+def test_lttb_keeps_endpoints_and_returns_threshold_points():
+    x = np.arange(1000)
+    y = np.sin(x / 20.0)
+
+    keep = lttb(x, y, 100)
+
+    assert len(keep) == 100
+    assert keep[0] == 0 and keep[-1] == 999
+    assert (np.diff(keep) > 0).all()
+
+
+def test_lttb_keeps_a_lone_peak():
+    y = np.zeros(500)
+    y[123] = 10.0
+
+    assert 123 in lttb(np.arange(500), y, 50)
+
+
+def test_lttb_returns_everything_when_there_is_nothing_to_reduce():
+    assert lttb(np.arange(10), np.arange(10), 10).tolist() == list(range(10))
+    assert lttb(np.arange(10), np.arange(10), 2).tolist() == list(range(10))
+
+
+def test_resolution_grows_with_the_window():
+    assert pick_resolution("2024-01-01", "2024-03-01") == "D"
+    assert pick_resolution("2024-01-01", "2025-06-01") == "W"
+    assert pick_resolution("2020-01-01", "2024-01-01") == "M"
@@ -0,0 +1,119 @@
+import time
+
+import pytest
+
+from writer import WriteBehindQueue
+
+
+class Conflict(Exception):
+    retryable = False
+
+
+class ManualQueue(WriteBehindQueue):
+    """Cola sin hilo escritor: sólo persiste en ``flush``/``flush_key``."""
+
+    def _run(self):
+        pass
+
+
+def merge(old, new):
+    return {**old, **new}
+
+
+def test_pending_writes_with_same_key_are_merged():
+    queue, applied = ManualQueue(), []
+    queue.submit("fila", {"a": 1}, applied.append, merge)
+    queue.submit("fila", {"b": 2}, applied.append, merge)
+    queue.submit("fila", {"a": 3}, applied.append, merge)
+    queue.submit("otra", {"c": 4}, applied.append, merge)
+    assert queue.lag()[0] == 2
+
+    queue.flush()
+
+    assert applied == [{"a": 3, "b": 2}, {"c": 4}]
+    assert queue.lag()[0] == 0
+
+
+def test_failed_write_is_kept_and_merged_with_newer_one():
+    queue, applied, fail = ManualQueue(), [], [True]
+
+    def apply(payload):
+        if fail.pop() if fail else False:
+            raise OSError("base bloqueada")
+        applied.append(payload)
+
+    queue.submit("fila", {"a": 1}, apply, merge)
+    queue.flush()
+    assert applied == []
+    assert queue.last_error_retryable is True
+    assert "base bloqueada" in queue.last_error
+
+    queue.submit("fila", {"a": 2, "b": 2}, apply, merge)
+    queue.flush()
+
+    assert applied == [{"a": 2, "b": 2}]
+    assert queue.last_error is None
+
+
+def test_non_retryable_write_is_dropped_and_reported():
+    queue, calls = ManualQueue(), []
+
+    def conflict(payload):
+        calls.append(payload)
+        raise Conflict("fila reescrita")
+
+    queue.submit("fila", "x", conflict)
+    queue.flush()
+    queue.flush()
+
+    assert calls == ["x"]
+    assert queue.lag()[0] == 0
+    assert queue.last_error_retryable is False
+    assert "fila reescrita" in queue.last_error
+
+
+def test_flush_key_applies_only_that_key():
+    queue, applied = ManualQueue(), []
+    queue.submit("a", 1, applied.append)
+    queue.submit("b", 2, applied.append)
+
+    queue.flush_key("a")
+    queue.flush_key("c")
+
+    assert applied == [1]
+    assert queue.lag()[0] == 1
+
+
+def test_flush_key_requeues_and_raises_on_failure():
+    queue, calls = ManualQueue(), []
+
+    def fail_once(payload):
+        calls.append(payload)
+        if len(calls) == 1:
+            raise OSError("sin espacio")
+
+    queue.submit("a", 1, fail_once)
+    with pytest.raises(OSError):
+        queue.flush_key("a")
+    assert queue.lag()[0] == 1
+
+    queue.flush()
+    assert calls == [1, 1]
+
+
+def test_writer_thread_retries_failed_writes():
+    queue, calls = WriteBehindQueue(), []
+    queue.RETRY_DELAY = 0.05
+
+    def flaky(payload):
+        calls.append(payload)
+        if len(calls) == 1:
+            raise OSError("disco lleno")
+
+    queue.submit("fila", "x", flaky)
+    deadline = time.time() + 5
+    while len(calls) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert calls == ["x", "x"]
+    assert queue.lag()[0] == 0
@@ -0,0 +1,50 @@
+"""
+Series de tiempo para los gráficos: elección de la resolución según la
+ventana visible y reducción de puntos con LTTB (Largest-Triangle-Three-
+Buckets), que conserva la forma de la curva (picos y valles) enviando al
+navegador sólo unos cientos de puntos.
+"""
+import numpy as np
+import pandas as pd
+
+# Resolución -> nombre para mostrar
+RESOLUTIONS = {"D": "día", "W": "semana", "M": "mes"}
+
+
+def pick_resolution(start, end) -> str:
+    """Resolución para una ventana ``[start, end]``: día hasta 4 meses, semana hasta 3 años, si no mes."""
+    if start is None or end is None:
+        return "M"
+    days = (pd.Timestamp(end) - pd.Timestamp(start)).days
+    if days <= 120:
+        return "D"
+    if days <= 3 * 365:
+        return "W"
+    return "M"
+
+
+def lttb(x, y, threshold) -> np.ndarray:
+    """
+    Posiciones de los ``threshold`` puntos de ``(x, y)`` que elige LTTB
+    (siempre el primero y el último). Con menos puntos que ``threshold``
+    devuelve todas. ``x`` debe ser numérico y creciente.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    every = (n - 2) / (threshold - 2)
+    keep = np.empty(threshold, dtype="int64")
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        stop = int((i + 1) * every) + 1
+        # Promedio del balde siguiente como tercer vértice del triángulo
+        nxt = slice(stop, min(int((i + 2) * every) + 1, n))
+        avg_x, avg_y = x[nxt].mean(), y[nxt].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        keep[i + 1] = a
+    return keep
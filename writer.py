@@ -0,0 +1,127 @@
+"""
+Persistencia diferida (write-behind) para los formularios de CandApp.
+
+Los formularios actualizan el estado en memoria y confirman al usuario en el
+acto; la escritura a disco se encola aquí y la realiza un único hilo en
+segundo plano. Las escrituras pendientes con la misma clave se fusionan, así
+que varias ediciones seguidas de una misma fila (o varios guardados de la
+misma tabla) terminan en una sola escritura.
+"""
+import atexit
+import threading
+import time
+
+
+class WriteBehindQueue:
+    """
+    Cola de escrituras pendientes atendida por un hilo escritor.
+
+    Cada escritura es ``(clave, payload, apply, merge)``: ``apply(payload)``
+    la persiste y, si ya había otra pendiente con la misma clave,
+    ``merge(anterior, nuevo)`` combina ambos payloads (por defecto gana el
+    último). Las escrituras que fallan se reintentan, salvo que la excepción
+    tenga ``retryable = False``: ésas se descartan y ``last_error_retryable``
+    queda en ``False`` para avisarlo. Al cerrar el proceso se vacía la cola.
+    """
+
+    RETRY_DELAY = 1.0  # segundos antes de reintentar una escritura fallida
+
+    def __init__(self):
+        self._pending = {}  # clave -> [payload, apply, merge, encolado_en]
+        self._cond = threading.Condition()
+        self._apply_lock = threading.Lock()
+        self._in_flight = 0
+        self.last_error = None
+        self.last_error_retryable = True
+        self.last_flush = None
+        self._thread = threading.Thread(target=self._run, name="candapp-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def submit(self, key, payload, apply, merge=None) -> None:
+        """Encola una escritura; vuelve de inmediato."""
+        with self._cond:
+            entry = self._pending.get(key)
+            if entry is not None:
+                if merge is not None:
+                    payload = merge(entry[0], payload)
+                self._pending[key] = [payload, apply, merge, entry[3]]
+            else:
+                self._pending[key] = [payload, apply, merge, time.time()]
+            self._cond.notify()
+
+    def lag(self):
+        """
+        Devuelve ``(pendientes, segundos)``: cantidad de escrituras sin
+        persistir y antigüedad de la más vieja.
+        """
+        with self._cond:
+            count = len(self._pending) + self._in_flight
+            oldest = min((e[3] for e in self._pending.values()), default=None)
+        return count, (time.time() - oldest) if oldest is not None else 0.0
+
+    def flush(self) -> None:
+        """Persiste en el hilo actual todo lo pendiente."""
+        self._drain()
+
+    def flush_key(self, key) -> None:
+        """
+        Persiste en el hilo actual lo pendiente con clave ``key`` (espera a
+        que termine la tanda en curso). Si falla, la escritura vuelve a la
+        cola y la excepción se propaga.
+        """
+        with self._apply_lock:
+            with self._cond:
+                entry = self._pending.pop(key, None)
+            if entry is None:
+                return
+            payload, apply, merge, queued_at = entry
+            try:
+                apply(payload)
+            except Exception:
+                self._requeue(key, payload, apply, merge, queued_at)
+                raise
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            if not self._drain():
+                time.sleep(self.RETRY_DELAY)
+
+    def _drain(self) -> bool:
+        with self._apply_lock:
+            with self._cond:
+                batch = self._pending
+                self._pending = {}
+                self._in_flight = len(batch)
+            ok = True
+            for key, (payload, apply, merge, queued_at) in batch.items():
+                try:
+                    apply(payload)
+                except Exception as exc:  # se reintenta en la próxima vuelta
+                    ok = False
+                    self.last_error = f"{key}: {exc}"
+                    self.last_error_retryable = getattr(exc, "retryable", True)
+                    if not self.last_error_retryable:
+                        continue  # reintentar no sirve: se descarta
+                    self._requeue(key, payload, apply, merge, queued_at)
+                finally:
+                    with self._cond:
+                        self._in_flight -= 1
+            if ok and batch:
+                self.last_error = None
+                self.last_error_retryable = True
+                self.last_flush = time.time()
+            return ok
+
+    def _requeue(self, key, payload, apply, merge, queued_at) -> None:
+        """Devuelve a la cola una escritura fallida, delante de la más nueva con su clave."""
+        with self._cond:
+            newer = self._pending.get(key)
+            if newer is None:
+                self._pending[key] = [payload, apply, merge, queued_at]
+            elif merge is not None:
+                newer[0] = merge(payload, newer[0])
+                newer[3] = queued_at